@@ -0,0 +1,121 @@
+"""
+Load-test the development and production configurations of ``vassar.app``.
+
+    python -m benchmarks.bench_app --seconds 10 --concurrency 64 --workers 4
+
+Each configuration is started as a real ``python -m vassar.app`` server (uvicorn,
+``VASSAR_WORKERS`` processes) and hammered over HTTP with ``--concurrency`` keep-alive
+connections spread over the static pages, which need no database. It reports
+requests per second, latency percentiles and page size. Development runs one worker
+with live reload and debug on; production turns both off and runs ``--workers``.
+Point ``NEO4J_URI`` at a database to include /tree/layout with ``--paths``.
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from vassar.components import TREE_PAGE_PATH
+
+CONFIGURATIONS = {
+    "development": dict(VASSAR_ENV="development", VASSAR_WORKERS="1"),
+    "production": dict(VASSAR_ENV="production"),
+}
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def start_server(environment: dict, port: int) -> subprocess.Popen:
+    env = dict(os.environ, VASSAR_PORT=str(port), VASSAR_HOST="127.0.0.1", **environment)
+    # Without a build production would refuse to start; serve the source assets instead.
+    env.setdefault("VASSAR_ASSETS", "auto")
+    env.setdefault("NEO4J_URI", "bolt://127.0.0.1:1")
+    return subprocess.Popen(
+        [sys.executable, "-m", "vassar.app"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(base_url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+async def load(base_url: str, paths, seconds: float, concurrency: int):
+    latencies, sizes, errors = [], {}, 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    deadline = time.monotonic() + seconds
+
+    async def user(client: httpx.AsyncClient, offset: int):
+        nonlocal errors
+        request = offset
+        while time.monotonic() < deadline:
+            path = paths[request % len(paths)]
+            request += 1
+            started = time.perf_counter()
+            try:
+                response = await client.get(path, headers={"accept-encoding": "gzip"})
+            except httpx.TransportError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+            sizes[path] = len(response.content)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(user(client, offset) for offset in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(latencies) / elapsed, latencies, sizes, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--paths", nargs="+", default=["/", "/history", TREE_PAGE_PATH])
+    args = parser.parse_args()
+
+    print(f"{'config':>12} {'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'errors':>7}  page bytes")
+    for name, environment in CONFIGURATIONS.items():
+        environment = dict(environment)
+        environment.setdefault("VASSAR_WORKERS", str(args.workers))
+        server = start_server(environment, args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            asyncio.run(wait_ready(base_url))
+            asyncio.run(load(base_url, args.paths, 1, args.concurrency))  # warm-up
+            rate, latencies, sizes, errors = asyncio.run(load(base_url, args.paths, args.seconds, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+        print(
+            f"{name:>12} {environment['VASSAR_WORKERS']:>7} {rate:>9.0f} "
+            f"{percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.9) * 1000:>8.1f} "
+            f"{percentile(latencies, 0.99) * 1000:>8.1f} {errors:>7}  "
+            + " ".join(f"{path}={size}" for path, size in sizes.items())
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Fan-out cost of the /tree/events broadcaster.
+
+    python -m benchmarks.bench_events --clients 10 100 1000 --changes 20
+
+For each client count this opens that many subscribers on one ``Broadcaster`` over a
+scripted graph, applies ``--changes`` incremental updates (a new child under a random
+person each) and reports the database polls made, the time to publish one refresh to
+every client, and how many clients received every message. Clients drain their
+queues concurrently, like real streams would; ``--slow`` of them never read, to show
+they are resynced instead of buffering without bound.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.fakes import KEYS, QUERY_NAMES, eager_result, query_text
+from vassar.database import install_drivers
+from vassar.events import Broadcaster
+from vassar.graphcache import GraphCache
+
+
+class ScriptedGraph:
+    """Answers the graph cache's queries from lists that the benchmark grows."""
+
+    def __init__(self, people: int):
+        self.people = [(person_id, f"Person {person_id}") for person_id in range(people)]
+        self.edges = []
+        self.changed = []
+        self.watermark = 0
+        self.polls = 0
+
+    @property
+    def version(self):
+        return (len(self.people), len(self.edges), None, self.watermark)
+
+    def add_child(self, rng: random.Random):
+        parent = rng.randrange(len(self.people))
+        child = len(self.people)
+        self.people.append((child, f"Person {child}"))
+        self.edges.append((parent, child))
+        children = [c for p, c in self.edges if p == parent]
+        parents = [p for p, c in self.edges if c == parent]
+        self.changed = [(child, f"Person {child}", [], [parent]), (parent, f"Person {parent}", children, parents)]
+        self.watermark += 1
+
+    async def execute_query(self, query, parameters=None, **kwargs):
+        name = QUERY_NAMES[query_text(query)]
+        if name == "GRAPH_VERSION_QUERY":
+            self.polls += 1
+            rows = [self.version + (self.watermark,)]  # the stamps are the clock
+        else:
+            rows = dict(
+                GRAPH_PEOPLE_QUERY=self.people, GRAPH_EDGES_QUERY=self.edges, CHANGED_PEOPLE_QUERY=self.changed
+            )[name]
+        return eager_result(KEYS[name], rows)
+
+
+async def run(clients: int, changes: int, slow: int, interval: float):
+    graph = ScriptedGraph(1000)
+    install_drivers(None, graph)
+    cache = GraphCache(refresh_seconds=interval, max_delta=1.0)
+    broadcaster = Broadcaster(cache, queue_size=8)
+    received = [0] * clients
+    publish_times = []
+
+    original = broadcaster.publish
+
+    def timed_publish(events):
+        started = time.perf_counter()
+        original(events)
+        publish_times.append(time.perf_counter() - started)
+
+    broadcaster.publish = timed_publish
+    subscribers = [broadcaster.join() for _ in range(clients)]
+
+    async def drain(index, subscriber):
+        while True:
+            message = await subscriber.queue.get()
+            if message is None:
+                return
+            received[index] += 1
+
+    readers = [
+        asyncio.create_task(drain(index, subscriber))
+        for index, subscriber in enumerate(subscribers)
+        if index >= slow
+    ]
+    await asyncio.sleep(interval * 2)  # baseline snapshot
+    rng = random.Random(0)
+    started = time.perf_counter()
+    for _ in range(changes):
+        graph.add_child(rng)
+        await asyncio.sleep(interval * 1.5)
+    elapsed = time.perf_counter() - started
+    await broadcaster.close()
+    await asyncio.gather(*readers)
+    complete = sum(1 for count in received[slow:] if count == broadcaster.stats["messages"])
+    publish_times.sort()
+    return graph.polls, elapsed, publish_times, complete, broadcaster.stats["resyncs"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--changes", type=int, default=20)
+    parser.add_argument("--slow", type=int, default=1)
+    parser.add_argument("--interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    print(f"{'clients':>8} {'polls':>6} {'polls/s':>8} {'publish p50 ms':>15} {'max ms':>8} {'complete':>9} {'resyncs':>8}")
+    for clients in args.clients:
+        polls, elapsed, times, complete, resyncs = asyncio.run(run(clients, args.changes, args.slow, args.interval))
+        print(
+            f"{clients:>8} {polls:>6} {polls / elapsed:>8.1f} {times[len(times) // 2] * 1000:>15.3f} "
+            f"{times[-1] * 1000:>8.3f} {complete:>9} {resyncs:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Throughput of the static pages with and without precompilation.
+
+    python -m benchmarks.bench_pages --requests 2000
+
+For every precompiled page this times one render of its component tree (building the
+FT objects and serializing them), then drives the app through Starlette's TestClient,
+once rendering on every request (``VASSAR_PAGE_CACHE=off``) and once serving the
+stored bytes, with and without ``Accept-Encoding: gzip``. TestClient runs the full
+ASGI stack in-process, so the numbers include routing and middleware but no network.
+"""
+
+import argparse
+import time
+
+from starlette.testclient import TestClient
+
+from benchmarks.bench_tree import best_of
+from vassar import pages as page_cache
+from vassar.app import Settings, create_app
+from vassar.components import TREE_PAGE_PATH
+from vassar.pages import render_document
+
+PAGES = (("/", "home"), ("/history", "history"), (TREE_PAGE_PATH, "tree_page"))
+
+
+def throughput(client: TestClient, path: str, requests: int, headers: dict) -> float:
+    client.get(path, headers=headers)
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get(path, headers=headers)
+    return requests / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    identity, gzipped = {"accept-encoding": "identity"}, {"accept-encoding": "gzip"}
+    print(
+        f"{'page':>10} {'bytes':>7} {'gzip':>6} {'render ms':>10} "
+        f"{'off req/s':>10} {'on req/s':>10} {'on+gzip req/s':>14}"
+    )
+    app = create_app(Settings())
+    for path, name in PAGES:
+        page = page_cache.pages[name]
+        render_seconds, body = best_of(args.repeat, lambda: render_document(page.render(), app.router))
+        client = TestClient(app)
+
+        page_cache.ENABLED = False
+        page.invalidate()
+        uncached = throughput(client, path, args.requests, identity)
+        page_cache.ENABLED = True
+        cached = throughput(client, path, args.requests, identity)
+        cached_gzip = throughput(client, path, args.requests, gzipped)
+
+        compiled = page.compiled()
+        print(
+            f"{name:>10} {len(body):>7} {len(compiled.gzip_body):>6} {render_seconds * 1000:>10.2f} "
+            f"{uncached:>10.0f} {cached:>10.0f} {cached_gzip:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
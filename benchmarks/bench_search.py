@@ -0,0 +1,91 @@
+"""
+Latency of person search from the in-process prefix index.
+
+    python -m benchmarks.bench_search --sizes 100000 1000000 --queries 5000
+
+For each size this generates a genealogy (``benchmarks.synthetic``, cached under
+``--data-dir``), builds the ``PrefixIndex`` from its snapshot and reports the build
+time and the memory the index holds (from a second, traced build). It then replays
+autocomplete queries typed from random people's names, one to six letters of the first
+name, optionally followed by the start of the surname, and reports per-query latency
+percentiles by query shape, plus one rename applied in place. The synthetic names repeat a few dozen first names and
+surnames, so every word range is large: a worst case for the scan.
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+from benchmarks.harness import percentile
+from benchmarks.suite import Data
+from vassar.search import PrefixIndex
+
+
+def typed_queries(names, count, rng):
+    shapes = {}
+    for _ in range(count):
+        first, _, last = rng.choice(names).partition(" ")
+        letters = rng.randint(1, 6)
+        if last and rng.random() < 0.4:
+            query, shape = f"{first} {last[:rng.randint(1, 4)]}", "first + surname prefix"
+        else:
+            query, shape = first[:letters], f"{min(letters, len(first))} letters" if letters < 4 else "4+ letters"
+        shapes.setdefault(shape, []).append(query)
+    return shapes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--data-dir", type=Path, default=Data.root)
+    args = parser.parse_args()
+    Data.root = args.data_dir
+
+    rng = random.Random(0)
+    for size in args.sizes:
+        snapshot = Data.of(size).graph.snapshot
+        gc.collect()
+        started = time.perf_counter()
+        index = PrefixIndex.build(snapshot)
+        build = time.perf_counter() - started
+        # A second build under tracemalloc, which would distort the timing above.
+        tracemalloc.start()
+        measured = PrefixIndex.build(snapshot)
+        held, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del measured
+        print(f"\n{size:,} people: index built in {build:.2f}s, {held / 2**20:.0f} MB, {len(index.words):,} words")
+
+        print(f"  {'query':<24} {'count':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        every = []
+        for shape, queries in sorted(typed_queries(snapshot.names, args.queries, rng).items()):
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                index.search(query, 10)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            every += timings
+            print(
+                f"  {shape:<24} {len(timings):>6} {percentile(timings, 0.5) * 1000:>8.3f} "
+                f"{percentile(timings, 0.9) * 1000:>8.3f} {percentile(timings, 0.99) * 1000:>8.3f} "
+                f"{timings[-1] * 1000:>8.3f}"
+            )
+        every.sort()
+        print(
+            f"  {'all':<24} {len(every):>6} {percentile(every, 0.5) * 1000:>8.3f} "
+            f"{percentile(every, 0.9) * 1000:>8.3f} {percentile(every, 0.99) * 1000:>8.3f} {every[-1] * 1000:>8.3f}"
+        )
+
+        person_id = snapshot.ids[len(snapshot.ids) // 2]
+        started = time.perf_counter()
+        index.put(person_id, "Zebulon Quackenbush")
+        print(f"  rename in place: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
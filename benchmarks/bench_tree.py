@@ -0,0 +1,97 @@
+"""
+Compare the original name-keyed ``format_graph_data`` with the person-id-keyed builder.
+
+    python -m benchmarks.bench_tree --sizes 1000 100000 1000000 --depth 20000
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from benchmarks.synthetic import family, graph_data_result, legacy_graph_data_result, lineage
+from vassar.tree import dumps_tree, format_graph_data
+
+
+def legacy_format_graph_data(data):
+    """``format_graph_data`` as it was before the rewrite, kept for comparison."""
+    nodes = {}
+    for record in data.records:
+        parent = record["p"]
+        descendant = record["descendant"]
+        if parent["name"] not in nodes:
+            nodes[parent["name"]] = {"name": parent["name"], "children": []}
+        if descendant["name"] not in nodes:
+            nodes[descendant["name"]] = {"name": descendant["name"], "children": []}
+        nodes[parent["name"]]["children"].append(nodes[descendant["name"]])
+    root_candidates = set(nodes.keys()) - {record["descendant"]["name"] for record in data.records}
+    roots = [nodes[name] for name in root_candidates]
+    if len(roots) == 1:
+        return roots[0]
+    return {"name": "Tree", "children": roots}
+
+
+def best_of(repeat, function, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        value = function(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, value
+
+
+def count_people(root):
+    seen, stack = set(), [root]
+    while stack:
+        node = stack.pop()
+        if node.get("id") is not None:
+            seen.add(node["id"])
+        stack.extend(node["children"])
+    return len(seen)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--depth", type=int, default=20_000, help="Generations in the deep-lineage case")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    # The original builder merges namesakes, so it is also timed on uniquely named
+    # people, where it has to build as many nodes as the new one.
+    print(
+        f"{'people':>10} {'rows before':>12} {'rows after':>11} {'legacy ms':>10} "
+        f"{'legacy(uniq) ms':>16} {'new ms':>8} {'speedup':>8} {'legacy nodes':>13} {'new nodes':>10}"
+    )
+    for size in args.sizes:
+        persons, edges = family(size)
+        unique = [(person_id, f"{name} #{person_id}") for person_id, name in persons]
+        legacy_data = legacy_graph_data_result(persons, edges)
+        data = graph_data_result(persons, edges)
+        legacy_seconds, _ = best_of(args.repeat, legacy_format_graph_data, legacy_data)
+        unique_seconds, _ = best_of(args.repeat, legacy_format_graph_data, legacy_graph_data_result(unique, edges))
+        seconds, root = best_of(args.repeat, format_graph_data, data)
+        legacy_nodes = len({record["p"]["name"] for record in legacy_data.records}
+                           | {record["descendant"]["name"] for record in legacy_data.records})
+        print(
+            f"{size:>10} {len(legacy_data.records):>12} {len(data.records):>11} {legacy_seconds * 1000:>10.1f} "
+            f"{unique_seconds * 1000:>16.1f} {seconds * 1000:>8.1f} {unique_seconds / seconds:>7.1f}x "
+            f"{legacy_nodes:>13} {count_people(root):>10}"
+        )
+
+    persons, edges = lineage(args.depth)
+    root = format_graph_data(graph_data_result(persons, edges))
+    seconds, payload = best_of(args.repeat, dumps_tree, root)
+    try:
+        json.dumps(root)
+        stdlib = "ok"
+    except RecursionError:
+        stdlib = "RecursionError"
+    print(
+        f"lineage depth {args.depth}: dumps_tree {seconds * 1000:.1f} ms ({len(payload)} bytes), "
+        f"json.dumps {stdlib} (recursion limit {sys.getrecursionlimit()})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare the size and encode/decode time of the nested and columnar /tree encodings.
+
+    python -m benchmarks.bench_wire --sizes 1000 100000 1000000
+
+The nested document repeats a child's subtree under each of its parents, so it grows
+much faster than the number of people; past ``--nested-limit`` expanded nodes it is
+only counted, not encoded. Decode times are Python's (``json.loads`` /
+``decode_binary``); the browser's ``JSON.parse`` scales the same way, while it reads
+the binary buffer through typed-array views with no per-node parsing.
+"""
+
+import argparse
+import gzip
+import json
+
+from benchmarks.bench_tree import best_of
+from benchmarks.synthetic import family, graph_data_result
+from vassar.columnar import columnar_graph, decode_binary, encode_binary, encode_columnar
+from vassar.tree import encode_tree, format_graph_data
+
+
+def expanded_nodes(root: dict) -> int:
+    """Nodes in the nested document, counting shared subtrees once per parent."""
+    sizes = {}
+    stack = [(root, False)]
+    while stack:
+        node, done = stack.pop()
+        if done:
+            sizes[id(node)] = 1 + sum(sizes[id(child)] for child in node["children"])
+        elif id(node) not in sizes:
+            stack.append((node, True))
+            stack.extend((child, False) for child in node["children"] if id(child) not in sizes)
+    return sizes[id(root)] - (root["id"] is None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--nested-limit", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    print(
+        f"{'people':>10} {'format':>9} {'nodes':>12} {'bytes':>12} {'gzip bytes':>11} "
+        f"{'encode ms':>10} {'decode ms':>10}"
+    )
+    for size in args.sizes:
+        persons, edges = family(size)
+        data = graph_data_result(persons, edges)
+        root = format_graph_data(data)
+        nodes = expanded_nodes(root)
+        encoders = (
+            ("nested", nodes, lambda: encode_tree(root), json.loads),
+            ("columnar", size, lambda: encode_columnar(columnar_graph(data)), json.loads),
+            ("binary", size, lambda: encode_binary(columnar_graph(data)), decode_binary),
+        )
+        for name, rows, encode, decode in encoders:
+            if name == "nested" and rows > args.nested_limit:
+                print(f"{size:>10} {name:>9} {rows:>12} {'(skipped)':>12}")
+                continue
+            encode_seconds, body = best_of(args.repeat, encode)
+            decode_seconds, _ = best_of(args.repeat, decode, body)
+            compressed = len(gzip.compress(body, compresslevel=6))
+            print(
+                f"{size:>10} {name:>9} {rows:>12} {len(body):>12} {compressed:>11} "
+                f"{encode_seconds * 1000:>10.1f} {decode_seconds * 1000:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Randomized correctness checks for the fast paths the benchmarks time: each one compares
+an optimized implementation with a slow, obvious one on seeded random inputs.
+
+    python -m benchmarks.checks                       # every check, 200 rounds each
+    python -m benchmarks.checks --filter snapshot --rounds 1000 --seed 7
+
+Every round gets its own ``random.Random``; a failure prints the check, the round and
+its seed so it can be replayed with ``--seed`` and ``--rounds 1``. Checks without random
+inputs, like the precompiled pages against fasthtml's own rendering, run once. Exits
+with status 1 when any check fails.
+"""
+
+import argparse
+import random
+import re
+import sys
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from starlette.testclient import TestClient
+
+from benchmarks.synthetic import family
+from vassar import layout
+from vassar import pages as page_cache
+from vassar.app import Settings, create_app
+from vassar.graphcache import Snapshot
+from vassar.kinship import KinshipIndex, relate
+
+CHECKS: Dict[str, Callable[[random.Random], None]] = {}
+# Checks that don't draw random inputs run once.
+ONCE = set()
+
+
+def check(name: str, once: bool = False):
+    def decorator(function):
+        CHECKS[name] = function
+        if once:
+            ONCE.add(name)
+        return function
+
+    return decorator
+
+
+def _adjacency(snapshot: Snapshot) -> Dict[int, tuple]:
+    """``{person_id: (name, child_ids, parent_ids)}`` read back out of the CSR arrays."""
+    ids = snapshot.ids
+    return {
+        ids[row]: (
+            snapshot.names[row],
+            sorted(ids[child] for child in snapshot.children(row)),
+            sorted(ids[parent] for parent in snapshot.parents(row)),
+        )
+        for row in range(len(ids))
+    }
+
+
+@check("graphcache.Snapshot.apply")
+def check_snapshot_apply(rng: random.Random):
+    """Patching a snapshot with changed rows gives the snapshot a full build would."""
+    persons, edges = family(rng.randint(2, 60), seed=rng.randrange(1 << 30))
+    snapshot = Snapshot.build(persons, edges)
+    names = dict(persons)
+    links = set(edges)
+    for _ in range(rng.randint(1, 4)):  # several refreshes, each applied to the last
+        changed = set()
+        for _ in range(rng.randint(1, 8)):
+            people = list(names)
+            operation = rng.choice(("rename", "add person", "add edge", "remove edge"))
+            if operation == "rename":
+                person_id = rng.choice(people)
+                names[person_id] = f"Renamed {rng.randrange(1000)}"
+                changed.add(person_id)
+            elif operation == "add person":
+                person_id = max(people) + 1
+                names[person_id] = f"New {person_id}"
+                changed.add(person_id)
+                for parent_id in rng.sample(people, rng.randint(0, min(2, len(people)))):
+                    links.add((parent_id, person_id))
+                    if rng.random() < 0.5:  # the other end may or may not be stamped
+                        changed.add(parent_id)
+            else:
+                if operation == "add edge":
+                    edge = tuple(rng.sample(people, 2))
+                    links.add(edge)
+                elif links:
+                    edge = rng.choice(sorted(links))
+                    links.discard(edge)
+                else:
+                    continue
+                changed.update(rng.choice((edge, edge[:1], edge[1:])))
+        rows = [
+            (
+                person_id,
+                names[person_id],
+                [child for parent, child in links if parent == person_id],
+                [parent for parent, child in links if child == person_id],
+            )
+            for person_id in rng.sample(sorted(changed), len(changed))
+        ]
+        patched = snapshot.apply(rows, (), None)
+        expected = Snapshot.build(names.items(), sorted(links))
+        assert patched is not None, rows
+        assert _adjacency(patched) == _adjacency(expected), rows
+        assert patched.edges == expected.edges == len(links)
+        assert list(patched.child_offsets) == sorted(patched.child_offsets)
+        assert list(patched.parent_offsets) == sorted(patched.parent_offsets)
+        snapshot = patched
+
+
+def _ancestor_depths(snapshot: Snapshot, row: int) -> Dict[int, int]:
+    """Every ancestor of ``row`` (and ``row`` itself) with the fewest generations up to them."""
+    depths = {row: 0}
+    frontier = [row]
+    level = 0
+    while frontier:
+        level += 1
+        frontier = {parent for child in frontier for parent in snapshot.parents(child) if parent not in depths}
+        depths.update((parent, level) for parent in frontier)
+    return depths
+
+
+@check("kinship.relate")
+def check_kinship_relate(rng: random.Random):
+    """The bidirectional search agrees with comparing both people's full ancestor sets."""
+    persons, edges = family(rng.randint(2, 200), seed=rng.randrange(1 << 30), max_children=rng.randint(1, 5))
+    # Marriages across generations make cousins who are also great-aunts; parents always
+    # have smaller ids than their children, so the graph stays acyclic.
+    extra = {tuple(sorted(rng.sample(range(1, len(persons) + 1), 2))) for _ in range(len(persons) // 10)}
+    edges = sorted(set(edges) | extra)
+    snapshot = Snapshot.build(persons, edges)
+    index = KinshipIndex(snapshot)
+    ids = snapshot.ids
+    for _ in range(20):
+        # Walk up and back down from a so most pairs are close relatives, not strangers.
+        row = first = rng.randrange(len(ids))
+        for step in (snapshot.parents, snapshot.children):
+            for _ in range(rng.randint(0, 4)):
+                relatives = step(row)
+                if relatives:
+                    row = rng.choice(relatives)
+        a, b = ids[first], ids[row]
+        kinship = relate(snapshot, a, b, max_generations=len(ids), index=index)
+        if a == b:
+            assert kinship.relationship == "self", (a, b, kinship)
+            continue
+        depth_a = _ancestor_depths(snapshot, snapshot.index[a])
+        depth_b = _ancestor_depths(snapshot, snapshot.index[b])
+        common = depth_a.keys() & depth_b.keys()
+        if not common:
+            assert not kinship.related, (a, b, kinship)
+            continue
+        best = min(depth_a[row] + depth_b[row] for row in common)
+        meetings = sorted(
+            (row for row in common if depth_a[row] + depth_b[row] == best),
+            key=lambda row: (abs(depth_a[row] - depth_b[row]), ids[row]),
+        )
+        generations = depth_a[meetings[0]], depth_b[meetings[0]]
+        shared = sorted(ids[row] for row in meetings if (depth_a[row], depth_b[row]) == generations)
+        assert kinship.generations == generations, (a, b, kinship, generations)
+        assert sorted(kinship.common_ancestors) == shared, (a, b, kinship, shared)
+        assert kinship.half == (min(generations) > 0 and len(shared) < 2), (a, b, kinship)
+        path = [snapshot.index[person["id"]] for person in kinship.path]
+        assert len(path) == sum(generations) + 1 and ids[path[0]] == a and ids[path[-1]] == b, kinship
+        up, down = path[: generations[0] + 1], path[generations[0] :]
+        assert all(parent in snapshot.parents(child) for child, parent in zip(up, up[1:])), kinship
+        assert all(parent in snapshot.parents(child) for parent, child in zip(down, down[1:])), kinship
+
+
+def _random_tree(rng: random.Random) -> dict:
+    """A nested tree like ``vassar.subtree`` builds: a long lineage, a random bush or a wide fan."""
+    nodes = [dict(id=0, name="Person 0", children=[])]
+    shape = rng.choice(("lineage", "bush", "fan"))
+    for person_id in range(1, rng.randint(1, 1000)):
+        if shape == "lineage":
+            parent = nodes[-1] if rng.random() < 0.8 else rng.choice(nodes)
+        elif shape == "bush":
+            parent = rng.choice(nodes)
+        else:  # few generations, wide enough for the NumPy second walk
+            parent = rng.choice(nodes[:20])
+        parent["children"].append(dict(id=person_id, name=f"Person {person_id}", children=[]))
+        nodes.append(parent["children"][-1])
+    return nodes[0]
+
+
+@check("layout.tidy_layout")
+def check_tidy_layout(rng: random.Random):
+    """Nodes on a level never overlap and every parent is centred over its children."""
+    root = _random_tree(rng)
+    drawn = layout.tidy_layout(root)
+    ids, parents, x = drawn.ids, drawn.parents, drawn.x
+    tolerance = 0.11  # x is rounded to one decimal, so a midpoint may be off by 0.1
+    levels: Dict[int, List[int]] = {}
+    for row, depth in enumerate(drawn.depth):
+        assert drawn.y[row] == depth * layout.LEVEL_SPACING, (ids[row], drawn.y[row])
+        levels.setdefault(depth, []).append(row)  # preorder keeps each level left to right
+    for rows in levels.values():
+        for left, right in zip(rows, rows[1:]):
+            gap = layout.SIBLING_GAP if parents[left] == parents[right] else layout.COUSIN_GAP
+            assert x[right] - x[left] >= gap * layout.NODE_SPACING - tolerance, (ids[left], ids[right])
+    children: Dict[int, List[int]] = {}
+    for row, parent in enumerate(parents):
+        children.setdefault(parent, []).append(row)
+    for parent, kids in children.items():
+        if parent >= 0:
+            midpoint = (x[kids[0]] + x[kids[-1]]) / 2
+            assert abs(x[parent] - midpoint) <= tolerance, (ids[parent], x[parent], midpoint)
+    assert min(x) == 0.0
+    if layout.numpy is not None:
+        numpy, layout.numpy = layout.numpy, None
+        try:
+            plain = layout.tidy_layout(root)
+        finally:
+            layout.numpy = numpy
+        assert all(abs(a - b) <= tolerance for a, b in zip(plain.x, x)) and plain.y == drawn.y
+
+
+@check("pages.StaticPage", once=True)
+def check_static_pages(rng: random.Random):
+    """Precompiled pages are byte for byte what fasthtml sends for the same components."""
+    for live in (False, True):
+        app = create_app(Settings(live=live, debug=False))
+        for name, page in page_cache.pages.items():
+            app.route(f"/checks/{name}", methods=["get"])(page.render)  # served by fasthtml itself
+        client = TestClient(app)  # no lifespan: nothing here needs the database
+        for name, page in page_cache.pages.items():
+            for variant, headers in (("document", {}), ("fragment", {"hx-request": "1"})):
+                expected = client.get(f"/checks/{name}", headers=headers)
+                assert expected.status_code == 200, (name, variant, expected.status_code)
+                assert page.compiled(variant).body == expected.content, (name, variant, live)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the randomized correctness checks.")
+    parser.add_argument("--filter", default="", help="regular expression selecting check names")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first round")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for name, function in CHECKS.items():
+        if not re.search(args.filter, name):
+            continue
+        rounds = 1 if name in ONCE else args.rounds
+        for seed in range(args.seed, args.seed + rounds):
+            try:
+                function(random.Random(seed))
+            except Exception:
+                traceback.print_exc()
+                print(f"FAILED {name} at --seed {seed}", file=sys.stderr)
+                failed += 1
+                break
+        else:
+            print(f"ok     {name} ({rounds} round{'s' if rounds != 1 else ''})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
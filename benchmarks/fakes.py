@@ -0,0 +1,228 @@
+"""
+In-process stand-ins for the Neo4j driver, so web, tree and loader code can be
+benchmarked without a database.
+
+- ``FakeGraph`` answers the registered genealogy queries from an in-memory
+  ``Snapshot`` of generated people, with ``EagerResult``/``Record`` objects shaped
+  exactly like the driver's
+- ``RecordingDriver`` wraps a real driver and saves every result it returns, and
+  ``FakeGraph.replay`` serves such a recording back, for queries (or data) the
+  synthetic graph can't stand in for
+- ``FakeDriver``/``FakeAsyncDriver`` expose either through ``execute_query`` and
+  ``session().execute_write``/``run`` (counting the rows written), which covers what
+  ``vassar.database``, ``vassar.introspection`` and ``load_data.Neo4jLoader`` call
+
+    graph = FakeGraph.from_family(persons, edges)
+    install_drivers(FakeDriver(graph), FakeAsyncDriver(graph))
+"""
+
+import json
+import time
+from itertools import islice
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Sequence
+
+from neo4j import EagerResult, Record
+
+from vassar.graphcache import Snapshot
+from vassar.queries import QUERIES
+
+QUERY_NAMES = {named.text: name for name, named in QUERIES.items()}
+
+# Result columns of the queries the fake graph answers.
+KEYS = {
+    "GRAPH_DATA_QUERY": ("id", "name", "children"),
+    "GRAPH_VERSION_QUERY": ("people", "edges", "version", "updated_at", "now"),
+    "GRAPH_PEOPLE_QUERY": ("id", "name"),
+    "GRAPH_EDGES_QUERY": ("parent", "child"),
+    "CHILDREN_OF_QUERY": ("id", "relatives"),
+    "PARENTS_OF_QUERY": ("id", "relatives"),
+    "HAS_CHILDREN_QUERY": ("id", "has_more"),
+    "HAS_PARENTS_QUERY": ("id", "has_more"),
+    "PERSON_NAME_QUERY": ("name",),
+    "ROOT_PEOPLE_QUERY": ("id", "name"),
+    "CHANGED_PEOPLE_QUERY": ("id", "name", "children", "parents"),
+    "SCHEMA_FINGERPRINT_QUERY": ("labels", "types", "keys"),
+    "NODE_QUERY": ("nodes_schema",),
+    "RELATIONSHIP_QUERY": ("relationships_schema",),
+    "PERSON_SEARCH_QUERY": ("id", "name", "birthplace", "score"),
+}
+
+PERSON_PROPERTIES = (
+    ("person_id", ["Long"]),
+    ("name", ["String"]),
+    ("birthdate", ["Date"]),
+    ("gender", ["String"]),
+    ("birthplace", ["String"]),
+    ("updated_at", ["Long"]),
+)
+
+
+def eager_result(keys: Sequence[str], rows) -> EagerResult:
+    keys = list(keys)
+    return EagerResult([Record(zip(keys, row)) for row in rows], None, keys)
+
+
+def query_text(query) -> str:
+    """The Cypher text of a string or ``neo4j.Query``, without a leading ``EXPLAIN``."""
+    text = getattr(query, "text", query)
+    return text[len("EXPLAIN "):] if text.startswith("EXPLAIN ") else text
+
+
+def _replay_key(name: str, parameters: Optional[dict]) -> str:
+    return name + json.dumps(parameters or {}, sort_keys=True, default=str)
+
+
+class FakeGraph:
+    def __init__(self, snapshot: Snapshot, recordings: Optional[Dict[str, EagerResult]] = None):
+        self.snapshot = snapshot
+        self.recordings = recordings or {}
+        self.calls: Dict[str, int] = {}
+        self.written_rows = 0
+
+    @classmethod
+    def from_family(cls, persons, edges) -> "FakeGraph":
+        version = (len(persons), len(edges), None, None)
+        return cls(Snapshot.build(persons, edges, version, watermark=None))
+
+    @classmethod
+    def replay(cls, path: Path, snapshot: Optional[Snapshot] = None) -> "FakeGraph":
+        """Serve the results saved by ``RecordingDriver.save`` (ahead of the snapshot, if any)."""
+        recordings = {
+            entry["key"]: eager_result(entry["keys"], entry["records"])
+            for entry in json.loads(Path(path).read_text())
+        }
+        return cls(snapshot or Snapshot.build([], [], (0, 0, None, None)), recordings)
+
+    def answer(self, query, parameters: Optional[dict] = None) -> EagerResult:
+        text = query_text(query)
+        name = QUERY_NAMES.get(text, text)
+        self.calls[name] = self.calls.get(name, 0) + 1
+        recorded = self.recordings.get(_replay_key(name, parameters))
+        if recorded is not None:
+            return recorded
+        if name not in KEYS:
+            raise NotImplementedError(f"the fake graph can't answer {name[:60]!r}; record it with RecordingDriver")
+        return eager_result(KEYS[name], self._rows(name, parameters or {}))
+
+    def _rows(self, name: str, parameters: dict) -> List[tuple]:
+        snapshot = self.snapshot
+        if name == "GRAPH_VERSION_QUERY":
+            return [snapshot.version + (int(time.time() * 1000),)]
+        if name == "GRAPH_PEOPLE_QUERY":
+            return list(zip(snapshot.ids, snapshot.names))
+        if name == "GRAPH_EDGES_QUERY":
+            ids = snapshot.ids
+            return [(ids[row], ids[child]) for row in range(len(ids)) for child in snapshot.children(row)]
+        if name == "CHANGED_PEOPLE_QUERY":
+            return []
+        if name == "SCHEMA_FINGERPRINT_QUERY":
+            return [(["Person"], ["PARENT_OF"], [key for key, _ in PERSON_PROPERTIES])]
+        if name == "NODE_QUERY":
+            nodes = [
+                dict(type=types, labels=["Person"], name=key, mandatory=False)
+                for key, types in PERSON_PROPERTIES
+            ]
+            return [(nodes,)]
+        if name == "RELATIONSHIP_QUERY":
+            return [([dict(type=":`PARENT_OF`", name=None, types=None, mandatory=False)],)]
+        if name == "PERSON_SEARCH_QUERY":
+            # A label scan standing in for the full-text index: every word must occur in the name.
+            words = [word.strip("+*").lower() for word in parameters["query"].split()]
+            found = (row for row, person in enumerate(snapshot.names) if all(w in person.lower() for w in words))
+            return [(snapshot.ids[row], snapshot.names[row], None, 1.0) for row in islice(found, parameters["limit"])]
+        return list(snapshot.run(name, parameters).records)
+
+
+class _Summary:
+    def __init__(self, rows: int):
+        self.counters = SimpleNamespace(nodes_created=rows, relationships_created=0, properties_set=0)
+        self.result_available_after = 0
+        self.result_consumed_after = 0
+
+
+class _WriteResult:
+    def __init__(self, rows: int):
+        self._rows = rows
+
+    def consume(self):
+        return _Summary(self._rows)
+
+
+class FakeSession:
+    """Accepts writes without doing them; ``rows`` parameters are counted."""
+
+    def __init__(self, graph: FakeGraph):
+        self.graph = graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def run(self, query, parameters: Optional[dict] = None, **kwargs):
+        rows = len((parameters or kwargs).get("rows", [None]))
+        self.graph.written_rows += rows
+        return _WriteResult(rows)
+
+    def execute_write(self, work: Callable, *args, **kwargs):
+        return work(self, *args, **kwargs)
+
+    execute_read = execute_write
+
+    def close(self):
+        pass
+
+
+class FakeDriver:
+    def __init__(self, graph: FakeGraph):
+        self.graph = graph
+
+    def execute_query(self, query, parameters: Optional[dict] = None, **kwargs) -> EagerResult:
+        return self.graph.answer(query, parameters)
+
+    def session(self, **kwargs) -> FakeSession:
+        return FakeSession(self.graph)
+
+    def verify_connectivity(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeAsyncDriver:
+    def __init__(self, graph: FakeGraph):
+        self.graph = graph
+
+    async def execute_query(self, query, parameters: Optional[dict] = None, **kwargs) -> EagerResult:
+        return self.graph.answer(query, parameters)
+
+    async def verify_connectivity(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class RecordingDriver:
+    """Wrap a real sync driver and keep every named query result for ``FakeGraph.replay``."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.entries: Dict[str, dict] = {}
+
+    def execute_query(self, query, parameters: Optional[dict] = None, **kwargs) -> EagerResult:
+        result = self.driver.execute_query(query, parameters, **kwargs)
+        text = query_text(query)
+        key = _replay_key(QUERY_NAMES.get(text, text), parameters)
+        self.entries[key] = dict(key=key, keys=list(result.keys), records=[record.values() for record in result.records])
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(list(self.entries.values()), default=str))
@@ -0,0 +1,162 @@
+"""
+A small pytest-benchmark style harness: repeated timed rounds, latency percentiles,
+throughput, peak memory, and a JSON baseline to compare against.
+
+A case is a function of the data size that does its setup and returns
+``(run, items)``: ``run`` is timed on its own, ``items`` is what one call processes
+(people, rows, requests) for the throughput column. Each case runs a warm-up round,
+then rounds until both ``min_rounds`` and ``min_seconds`` are reached. Peak memory is
+measured with ``tracemalloc`` in one extra round, so it doesn't slow the timed ones.
+
+A result regresses when its median is more than ``time_tolerance`` slower than the
+baseline's, or its peak memory more than ``memory_tolerance`` larger.
+"""
+
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Case = Callable[[int], Tuple[Callable[[], object], int]]
+
+
+@dataclass
+class Result:
+    name: str
+    size: int
+    rounds: int
+    items: int
+    min: float
+    median: float
+    p90: float
+    p99: float
+    mean: float
+    throughput: float  # items per second at the median
+    peak_bytes: int
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}[{self.size}]"
+
+
+@dataclass
+class Comparison:
+    result: Result
+    time_change: Optional[float] = None  # relative change of the median, +0.25 = 25% slower
+    memory_change: Optional[float] = None
+    regressions: List[str] = field(default_factory=list)
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def measure(name: str, size: int, case: Case, min_rounds: int = 5, min_seconds: float = 1.0) -> Result:
+    run, items = case(size)
+    run()  # warm-up: imports, caches, first allocations
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - started < min_seconds:
+        gc.collect()
+        round_started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - round_started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    median = percentile(timings, 0.5)
+    return Result(
+        name=name,
+        size=size,
+        rounds=len(timings),
+        items=items,
+        min=timings[0],
+        median=median,
+        p90=percentile(timings, 0.9),
+        p99=percentile(timings, 0.99),
+        mean=sum(timings) / len(timings),
+        throughput=items / median if median else float("inf"),
+        peak_bytes=peak,
+    )
+
+
+def compare(
+    results: Sequence[Result],
+    baseline: Dict[str, dict],
+    time_tolerance: float = 0.2,
+    memory_tolerance: float = 0.2,
+) -> List[Comparison]:
+    comparisons = []
+    for result in results:
+        comparison = Comparison(result)
+        previous = baseline.get(result.key)
+        if previous is not None:
+            comparison.time_change = result.median / previous["median"] - 1 if previous["median"] else None
+            if previous["peak_bytes"]:
+                comparison.memory_change = result.peak_bytes / previous["peak_bytes"] - 1
+            if comparison.time_change is not None and comparison.time_change > time_tolerance:
+                comparison.regressions.append(f"time +{comparison.time_change:.0%}")
+            if comparison.memory_change is not None and comparison.memory_change > memory_tolerance:
+                comparison.regressions.append(f"memory +{comparison.memory_change:.0%}")
+        comparisons.append(comparison)
+    return comparisons
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_baseline(path: Path) -> Dict[str, dict]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())["results"]
+
+
+def save_results(path: Path, results: Sequence[Result]) -> None:
+    document = dict(
+        machine=dict(python=sys.version.split()[0], platform=platform.platform(), processor=platform.processor()),
+        commit=_commit(),
+        created=time.strftime("%Y-%m-%dT%H:%M:%S"),
+        results={result.key: asdict(result) for result in results},
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(document, indent=2))
+
+
+def _change(value: Optional[float]) -> str:
+    return "" if value is None else f"{value:+.0%}"
+
+
+def report(comparisons: Sequence[Comparison]) -> str:
+    lines = [
+        f"{'benchmark':<32} {'size':>9} {'rounds':>6} {'median ms':>10} {'p90 ms':>9} {'p99 ms':>9} "
+        f"{'items/s':>12} {'peak MB':>8} {'time':>6} {'mem':>6}"
+    ]
+    for comparison in comparisons:
+        result = comparison.result
+        flag = "  REGRESSION: " + ", ".join(comparison.regressions) if comparison.regressions else ""
+        lines.append(
+            f"{result.name:<32} {result.size:>9} {result.rounds:>6} {result.median * 1000:>10.2f} "
+            f"{result.p90 * 1000:>9.2f} {result.p99 * 1000:>9.2f} {result.throughput:>12,.0f} "
+            f"{result.peak_bytes / 2**20:>8.1f} {_change(comparison.time_change):>6} "
+            f"{_change(comparison.memory_change):>6}{flag}"
+        )
+    return "\n".join(lines)
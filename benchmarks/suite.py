@@ -0,0 +1,276 @@
+"""
+The benchmark suite: tree building, the /tree routes, CSV loading, person search,
+Arrow export and schema introspection on synthetic genealogies, with no database.
+
+    python -m benchmarks.suite --sizes 1000 100000 1000000
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --save   # record a baseline
+    python -m benchmarks.suite --baseline benchmarks/baseline.json          # flag regressions
+
+Genealogies come from ``benchmarks.synthetic.write_genealogy`` (cached per size and
+seed under ``--data-dir``); queries are answered by ``benchmarks.fakes``. Results are
+printed and, with ``--output``, written as JSON. Comparing against ``--baseline`` exits
+with status 1 when any benchmark regressed, so the suite can gate a CI job.
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import re
+import sys
+import tempfile
+from dataclasses import replace
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from starlette.testclient import TestClient
+
+from benchmarks.fakes import FakeAsyncDriver, FakeDriver, FakeGraph
+from benchmarks.harness import compare, load_baseline, measure, report, save_results
+from benchmarks.synthetic import read_genealogy, write_genealogy
+from load_data import IMPORT_STEPS, ImportManifest, Neo4jLoader, file_hashes
+from vassar.app import Settings, create_app
+from vassar.database import install_drivers
+from vassar.introspection import SchemaService
+from vassar.search import PrefixIndex
+from vassar.sinks import ArrowSink, pyarrow
+from vassar.tree import format_graph_data, layout_cache, tree_cache
+
+STEPS = {step.name: step for step in IMPORT_STEPS}
+PERSON_STEP, RELATIONSHIP_STEP = STEPS["person"], STEPS["relationships"]
+
+
+class Data:
+    """Generated CSVs and the fake graph for one size, built once per run."""
+
+    directory: Path
+    graph: FakeGraph
+
+    _loaded: Dict[int, "Data"] = {}
+    root = Path(tempfile.gettempdir()) / "vassar-bench"
+    seed = 0
+
+    @classmethod
+    def of(cls, size: int) -> "Data":
+        if size not in cls._loaded:
+            data = cls()
+            data.directory = cls.root / f"{size}-{cls.seed}"
+            if not (data.directory / "relationships.csv").exists():
+                write_genealogy(data.directory, size, cls.seed)
+            data.graph = FakeGraph.from_family(*read_genealogy(data.directory))
+            cls._loaded = {size: data}  # keep one size in memory at a time
+        return cls._loaded[size]
+
+
+CASES: Dict[str, Callable] = {}
+# Cases that don't depend on the size of the graph run once.
+SIZE_INDEPENDENT = set()
+
+
+def case(name: str, size_independent: bool = False):
+    def decorator(function):
+        CASES[name] = function
+        if size_independent:
+            SIZE_INDEPENDENT.add(name)
+        return function
+
+    return decorator
+
+
+def _client(graph: FakeGraph) -> TestClient:
+    install_drivers(FakeDriver(graph), FakeAsyncDriver(graph))
+    return TestClient(create_app(Settings(environment="production", live=False, debug=False)))
+
+
+@case("tree.format_graph_data")
+def bench_format_graph_data(size: int):
+    data = Data.of(size).graph.answer("GRAPH_DATA_QUERY")
+    return (lambda: format_graph_data(data)), size
+
+
+@case("GET /tree cold")
+def bench_tree_cold(size: int):
+    client = _client(Data.of(size).graph)
+
+    def run():
+        tree_cache.invalidate()
+        assert client.get("/tree").status_code == 200
+
+    return run, size
+
+
+@case("GET /tree cached")
+def bench_tree_cached(size: int):
+    client = _client(Data.of(size).graph)
+    return (lambda: client.get("/tree")), 1
+
+
+@case("GET /tree/layout cold")
+def bench_layout_cold(size: int):
+    graph = Data.of(size).graph
+    client = _client(graph)
+    roots = [graph.snapshot.ids[row] for row in graph.snapshot.roots()[:200]]
+    url = "/tree/layout?expanded=" + ",".join(map(str, roots))
+    visible = len(client.get(url).json()["ids"])
+
+    def run():
+        layout_cache.invalidate()
+        assert client.get(url).status_code == 200
+
+    return run, visible
+
+
+def _loader(graph: FakeGraph) -> Neo4jLoader:
+    loader = Neo4jLoader.__new__(Neo4jLoader)
+    loader.driver, loader.database = FakeDriver(graph), None
+    return loader
+
+
+@case("loader.people")
+def bench_load_people(size: int):
+    data = Data.of(size)
+    loader = _loader(data.graph)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return loader.load_csv_batched(data.directory / "person.csv", PERSON_STEP.create)
+
+    return run, size
+
+
+@case("loader.relationships")
+def bench_load_relationships(size: int):
+    data = Data.of(size)
+    loader = _loader(data.graph)
+    edges = data.graph.snapshot.edges
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return loader.load_csv_batched(data.directory / "relationships.csv", RELATIONSHIP_STEP.create)
+
+    return run, edges
+
+
+@case("loader.people incremental 1%")
+def bench_load_people_incremental(size: int):
+    """Re-import person.csv after renaming one person in a hundred."""
+    data = Data.of(size)
+    loader = _loader(data.graph)
+    changed = data.directory / "person-renamed.csv"
+    if not changed.exists():
+        with open(data.directory / "person.csv", newline="") as source, open(changed, "w", newline="") as target:
+            writer = csv.writer(target)
+            for number, row in enumerate(csv.reader(source)):
+                if number and number % 100 == 0:
+                    row[1] += " Jr"
+                writer.writerow(row)
+    step = replace(PERSON_STEP, path=str(changed))
+    previous, _ = file_hashes(data.directory / "person.csv", step.keys)
+    manifest = ImportManifest(data.directory / "manifest.json")
+
+    def run():
+        manifest.steps = {step.name: dict(hashes=previous, copies={})}
+        with contextlib.redirect_stdout(io.StringIO()):
+            return loader.load_incremental(step, manifest)
+
+    return run, size
+
+
+@case("search.prefix")
+def bench_search_prefix(size: int):
+    """100 autocomplete queries: first-name prefixes and first name plus surname prefix."""
+    snapshot = Data.of(size).graph.snapshot
+    index = PrefixIndex.build(snapshot)
+    names = [snapshot.names[row] for row in range(0, len(snapshot), max(1, len(snapshot) // 50))][:50]
+    queries = [name[:3] for name in names] + [name.split()[0] + " " + name.split()[-1][:2] for name in names]
+
+    def run():
+        for query in queries:
+            index.search(query)
+
+    return run, len(queries)
+
+
+@case("sinks.arrow")
+def bench_arrow_sink(size: int):
+    """Export every person through ``ArrowSink`` in many batches, and read it back."""
+    snapshot = Data.of(size).graph.snapshot
+    # Birth years unknown for the first batch, so the column's type comes from a later one;
+    # generations are whole in the first batch and halves later, widening int64 to double.
+    rows = [
+        [person_id, name, None if row < 100 else 1800 + row % 200, row % 7 if row < 100 else row % 7 / 2]
+        for row, (person_id, name) in enumerate(zip(snapshot.ids, snapshot.names))
+    ]
+
+    def run():
+        stream = io.BytesIO()
+        sink = ArrowSink(stream, batch_size=100)
+        sink.begin(["id", "name", "born", "generation"])
+        for values in rows:
+            sink.write(values)
+        sink.close()
+        stream.seek(0)
+        table = pyarrow.ipc.open_stream(stream).read_all()
+        assert [list(row.values()) for row in table.to_pylist()] == rows
+
+    return run, size
+
+
+@case("introspection.schema cold", size_independent=True)
+def bench_schema_cold(size: int):
+    service = SchemaService(path=Data.root / "schema.json", ttl=0)
+    driver = FakeDriver(Data.of(size).graph)
+
+    def run():
+        service.invalidate()
+        return service.get(driver)
+
+    return run, 1
+
+
+@case("introspection.schema revalidate", size_independent=True)
+def bench_schema_revalidate(size: int):
+    service = SchemaService(path=Data.root / "schema-revalidate.json", ttl=0)
+    driver = FakeDriver(Data.of(size).graph)
+    service.get(driver)
+    return (lambda: service.get(driver)), 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the benchmark suite against synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--filter", default="", help="regular expression selecting benchmark names")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", type=Path, default=Data.root)
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--min-seconds", type=float, default=1.0)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--save", action="store_true", help="write the results to --baseline")
+    parser.add_argument("--output", type=Path, help="also write the results here")
+    parser.add_argument("--time-tolerance", type=float, default=0.2)
+    parser.add_argument("--memory-tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    Data.root, Data.seed = args.data_dir, args.seed
+    selected = [name for name in CASES if re.search(args.filter, name)]
+    results = []
+    for size in sorted(args.sizes):
+        for name in selected:
+            if name in SIZE_INDEPENDENT and size != min(args.sizes):
+                continue
+            results.append(measure(name, size, CASES[name], args.min_rounds, args.min_seconds))
+            print(f"  {name} [{size}] done", file=sys.stderr)
+
+    baseline = load_baseline(args.baseline) if args.baseline and not args.save else {}
+    comparisons = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    print(report(comparisons))
+    if args.output:
+        save_results(args.output, results)
+    if args.save and args.baseline:
+        save_results(args.baseline, results)
+        return 0
+    return 1 if any(comparison.regressions for comparison in comparisons) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Seeded synthetic family trees for benchmarks.
+
+Families grow generation by generation: people are paired into couples (a share of
+children have a single recorded parent), each couple gets a random number of children,
+and names are drawn from small pools so collisions are common, as in real genealogy
+exports.
+
+``family`` builds small trees in memory. ``write_genealogy`` streams a realistic export
+in the format of ``n4jdb/import/vassar`` (``person.csv`` and ``relationships.csv``) to
+disk, holding only one generation at a time, so 10M people fit in modest memory:
+
+    python -m benchmarks.synthetic --people 1000000 --out n4jdb/import/synthetic/1m
+"""
+
+import argparse
+import csv
+import random
+from datetime import date
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Tuple
+
+FIRST_NAMES = (
+    "Mary", "John", "James", "Alice", "Robert", "Carol", "William", "Elizabeth", "Henry",
+    "Martha", "George", "Sarah", "Charles", "Annie", "Thomas", "Lucy", "Samuel", "Ella",
+    "Joseph", "Minnie",
+)
+LAST_NAMES = ("Vassar", "Minges", "Taylor", "Doe", "Harrison", "Bassett", "Jones", "Smith")
+
+FEMALE_NAMES = (
+    "Mary", "Alice", "Carol", "Elizabeth", "Martha", "Sarah", "Annie", "Lucy", "Ella", "Minnie",
+    "Hattie", "Ida", "Bessie", "Cora", "Mattie", "Lula", "Willie Mae", "Della", "Rosa", "Emma",
+)
+MALE_NAMES = (
+    "John", "James", "Robert", "William", "Henry", "George", "Charles", "Thomas", "Samuel", "Joseph",
+    "Willie", "Eddie", "Jesse", "Walter", "Arthur", "Frank", "Albert", "Louis", "Clarence", "Moses",
+)
+BIRTHPLACES = (
+    "Athens, Alabama", "Birmingham, Alabama", "Huntsville, Alabama", "Decatur, Alabama",
+    "Montgomery, Alabama", "Nashville, Tennessee", "Chicago, Illinois", "Detroit, Michigan",
+    "Atlanta, Georgia", "New York, New York",
+)
+# Children per couple: many small families, a few very large ones, some with none recorded.
+FAN_OUT = (0, 1, 2, 3, 4, 5, 6, 8, 11)
+FAN_OUT_WEIGHTS = (8, 18, 24, 20, 12, 8, 5, 3, 2)
+
+Person = Tuple[int, str]
+Edge = Tuple[int, int]
+
+
+def family(people: int, seed: int = 0, max_children: int = 5, single_parent_ratio: float = 0.2):
+    """Return ``(persons, edges)`` for a family of exactly ``people`` people."""
+    rng = random.Random(seed)
+
+    def name():
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    founders = max(2, min(people, people // 50))
+    persons: List[Person] = [(person_id, name()) for person_id in range(1, founders + 1)]
+    edges: List[Edge] = []
+    generation = [person_id for person_id, _ in persons]
+    while len(persons) < people:
+        rng.shuffle(generation)
+        next_generation = []
+        for index in range(0, len(generation), 2):
+            if rng.random() < single_parent_ratio or index + 1 == len(generation):
+                parents = generation[index:index + 1]
+            else:
+                parents = generation[index:index + 2]
+            for _ in range(rng.randint(1, max_children)):
+                if len(persons) == people:
+                    break
+                child_id = len(persons) + 1
+                persons.append((child_id, name()))
+                edges.extend((parent_id, child_id) for parent_id in parents)
+                next_generation.append(child_id)
+        generation = next_generation or generation
+    return persons, edges
+
+
+def lineage(depth: int, seed: int = 0):
+    """A single line of descent ``depth`` generations deep."""
+    rng = random.Random(seed)
+    persons = [(person_id, f"{rng.choice(FIRST_NAMES)} Vassar") for person_id in range(1, depth + 1)]
+    edges = [(person_id, person_id + 1) for person_id in range(1, depth)]
+    return persons, edges
+
+
+def graph_data_result(persons: List[Person], edges: List[Edge]):
+    """Rows shaped like ``GRAPH_DATA_QUERY``: one per parent with collected children."""
+    names = dict(persons)
+    children = {}
+    for parent_id, child_id in edges:
+        children.setdefault(parent_id, []).append([child_id, names[child_id]])
+    records = [(parent_id, names[parent_id], kids) for parent_id, kids in children.items()]
+    return SimpleNamespace(records=records)
+
+
+def legacy_graph_data_result(persons: List[Person], edges: List[Edge]):
+    """Rows shaped like the original ``RETURN p, descendant`` query, one per edge."""
+    nodes = {person_id: {"person_id": person_id, "name": name} for person_id, name in persons}
+    records = [{"p": nodes[parent_id], "descendant": nodes[child_id]} for parent_id, child_id in edges]
+    return SimpleNamespace(records=records)
+
+
+def write_genealogy(
+    directory: Path,
+    people: int,
+    seed: int = 0,
+    single_parent_ratio: float = 0.15,
+    founding_year: int = 1820,
+) -> Tuple[int, int]:
+    """
+    Write ``person.csv`` and ``relationships.csv`` for exactly ``people`` people under
+    ``directory``; returns ``(people, relationships)``.
+
+    Founders are born around ``founding_year``. Each generation is paired into couples
+    (men with women, surnames passed down from the father), children are born 18 to 42
+    years after their mother and a share of them have only one recorded parent.
+    """
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    relationships = 0
+    with open(directory / "person.csv", "w", newline="") as person_file, open(
+        directory / "relationships.csv", "w", newline=""
+    ) as relationship_file:
+        persons = csv.writer(person_file)
+        edges = csv.writer(relationship_file)
+        persons.writerow(("person_id", "name", "birthdate", "gender", "birthplace"))
+        edges.writerow(("parent_id", "child_id"))
+        next_id = 1
+
+        def person(gender: str, surname: str, year: int):
+            nonlocal next_id
+            person_id = next_id
+            next_id += 1
+            first = rng.choice(FEMALE_NAMES if gender == "Female" else MALE_NAMES)
+            born = date(year, rng.randint(1, 12), rng.randint(1, 28))
+            persons.writerow((person_id, f"{first} {surname}", born.isoformat(), gender, rng.choice(BIRTHPLACES)))
+            return person_id, gender, surname, year
+
+        founders = max(2, min(people, people // 40))
+        generation = [
+            person(rng.choice(("Female", "Male")), rng.choice(LAST_NAMES), founding_year + rng.randint(-15, 15))
+            for _ in range(founders)
+        ]
+        while next_id <= people:
+            women = [member for member in generation if member[1] == "Female"]
+            men = [member for member in generation if member[1] == "Male"]
+            rng.shuffle(women)
+            rng.shuffle(men)
+            couples = [(mother, men[index] if index < len(men) else None) for index, mother in enumerate(women)]
+            couples += [(father, None) for father in men[len(women):]]
+            next_generation = []
+            for first, second in couples:
+                if second is not None and rng.random() < single_parent_ratio:
+                    second = None
+                parents = [member for member in (first, second) if member is not None]
+                father = next((member for member in parents if member[1] == "Male"), None)
+                surname = father[2] if father is not None else first[2]
+                children = rng.choices(FAN_OUT, FAN_OUT_WEIGHTS)[0]
+                for _ in range(children):
+                    if next_id > people:
+                        break
+                    year = max(member[3] for member in parents) + rng.randint(18, 42)
+                    child = person(rng.choice(("Female", "Male")), surname, min(year, 2020))
+                    for parent in parents:
+                        edges.writerow((parent[0], child[0]))
+                        relationships += 1
+                    next_generation.append(child)
+            # A generation without children would end the family; start a new branch instead.
+            generation = next_generation or [
+                person(rng.choice(("Female", "Male")), rng.choice(LAST_NAMES), founding_year)
+                for _ in range(min(founders, people - next_id + 1))
+            ]
+    return people, relationships
+
+
+def read_genealogy(directory: Path):
+    """``(persons, edges)`` from a ``write_genealogy`` (or ``n4jdb/import/vassar``) directory."""
+    with open(directory / "person.csv", newline="") as person_file:
+        persons = [(int(row["person_id"]), row["name"]) for row in csv.DictReader(person_file)]
+    with open(directory / "relationships.csv", newline="") as relationship_file:
+        edges = [(int(row["parent_id"]), int(row["child_id"])) for row in csv.DictReader(relationship_file)]
+    return persons, edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic genealogy as person/relationship CSVs.")
+    parser.add_argument("--people", type=int, default=1_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+    people, relationships = write_genealogy(args.out, args.people, args.seed)
+    print(f"Wrote {people:,} people and {relationships:,} relationships to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
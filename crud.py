@@ -1,13 +1,22 @@
 #!/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
 import json
+import sys
+import time
 
 import typer
 from rich.console import Console
 
 import vassar.database as db
-from vassar.llm import gen_cypher_query
+from vassar.graphcache import load_snapshot
+from vassar.guard import QUERY_TIMEOUT, ROW_BUDGET, QueryRejected, async_guard_query, guard_query
+from vassar.introspection import schema_service
+from vassar.kinship import MAX_GENERATIONS, relate
+from vassar.llm import cypher_prompt, gen_cypher_query
+from vassar.llm_cache import cypher_cache
+from vassar.sinks import SINKS, make_sink, stream_query
 
 console = Console()
 err_console = Console(stderr=True)
@@ -22,23 +31,159 @@ app = typer.Typer()
 
 
 @app.command()
-def adhoc_query(natural_language_query: str = "Who are the children of Mary Doe?"):
-    schema_json = db.database_schema()
-    query_str = f"""
-    Given the following Neo4j database schema
+def adhoc_query(
+    natural_language_query: str = "Who are the children of Mary Doe?",
+    refresh_schema: bool = typer.Option(False, help="Ignore the cached schema and introspect again."),
+    no_cache: bool = typer.Option(False, help="Always ask the LLM, even for a cached question."),
+    row_budget: int = typer.Option(ROW_BUDGET, help="Estimated rows above which a LIMIT is injected."),
+    timeout: float = typer.Option(QUERY_TIMEOUT, help="Transaction timeout in seconds."),
+    allow_hazards: bool = typer.Option(False, help="Run plans with cartesian products, full scans or unbounded expands."),
+    stream: bool = typer.Option(False, help="Stream records as they arrive instead of printing the whole result."),
+    output_format: str = typer.Option("jsonl", "--format", help=f"Streaming format: {', '.join(SINKS)}."),
+    output: str = typer.Option("-", help="Streaming destination; '-' writes stdout."),
+    fetch_size: int = typer.Option(1000, min=1, help="Records pulled from the server per round trip when streaming."),
+):
+    if stream and output_format not in SINKS:
+        raise typer.BadParameter(f"--format must be one of {', '.join(SINKS)}")
+    log = err_console if stream and output == "-" else console
+    if refresh_schema:
+        schema_service.invalidate()
+    schema = schema_service.get(db.shared_driver())
+    cypher_query = cypher_cache.get_or_generate(
+        natural_language_query,
+        schema.fingerprint,
+        lambda question: gen_cypher_query(cypher_prompt(schema.schema_json, question)),
+        bypass=no_cache,
+    )
+    driver = db.shared_driver()
+    try:
+        guarded = guard_query(driver, cypher_query, row_budget=row_budget, allow_hazards=allow_hazards)
+    except QueryRejected as exc:
+        err_console.print(f"REJECTED_QUERY:::: {cypher_query}\n{exc}")
+        raise typer.Exit(code=1)
+    log.log(f"QUERY_PLAN:::: {guarded.plan}")
+    if guarded.limited:
+        log.log(f"LIMIT_INJECTED:::: {row_budget}")
+    if stream:
+        return _stream_result(driver, guarded.query, output_format, output, fetch_size, timeout)
+    result = db.query(driver, guarded.query, timeout=timeout)
+    console.print(result)
+    return result
 
-    {schema_json}
 
-    generate a Cypher query that matches the following natural language query:
+def _stream_result(driver, cypher_query, output_format, output, fetch_size, timeout):
+    options = dict(fetch_size=fetch_size, timeout=timeout)
+    if output == "-":
+        rows = stream_query(driver, cypher_query, make_sink(output_format, sys.stdout), **options)
+    else:
+        mode = dict(mode="wb") if SINKS[output_format].binary else dict(mode="w", newline="")
+        with open(output, **mode) as stream:
+            rows = stream_query(driver, cypher_query, make_sink(output_format, stream), **options)
+    err_console.log(f"STREAMED_ROWS:::: {rows}")
+    return rows
 
-    {natural_language_query}
-    """
-    cypher_query = gen_cypher_query(query_str)
-    driver = db.get_driver()
-    result = db.query(driver, cypher_query)
-    console.print(result)
+
+async def _answer(index, question, schema, semaphore, no_cache, guard_options, timeout):
+    async with semaphore:
+        started = time.perf_counter()
+        line = dict(index=index, question=question)
+        try:
+            cypher_query = await asyncio.get_running_loop().run_in_executor(
+                None,
+                cypher_cache.get_or_generate,
+                question,
+                schema.fingerprint,
+                lambda q: gen_cypher_query(cypher_prompt(schema.schema_json, q)),
+                no_cache,
+            )
+            line["cypher"] = cypher_query
+            generated = time.perf_counter()
+            line["generate_ms"] = round((generated - started) * 1000, 1)
+            driver = db.shared_async_driver()
+            guarded = await async_guard_query(driver, cypher_query, **guard_options)
+            line["plan"] = guarded.plan.as_dict()
+            line["limited"] = guarded.limited
+            result = await db.async_query(driver, guarded.query, timeout=timeout)
+            line["execute_ms"] = round((time.perf_counter() - generated) * 1000, 1)
+            line["records"] = [record.data() for record in result.records]
+        except QueryRejected as exc:
+            line["plan"] = exc.plan.as_dict()
+            line["error"] = f"{type(exc).__name__}: {exc}"
+        except Exception as exc:
+            line["error"] = f"{type(exc).__name__}: {exc}"
+        line["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return line
+
+
+async def _adhoc_batch(questions, concurrency, output, no_cache, guard_options, timeout):
+    try:
+        schema = await schema_service.async_get(db.shared_async_driver())
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [
+            asyncio.create_task(
+                _answer(index, question, schema, semaphore, no_cache, guard_options, timeout)
+            )
+            for index, question in enumerate(questions)
+        ]
+        for finished in asyncio.as_completed(tasks):
+            output.write(json.dumps(await finished, default=str) + "\n")
+            output.flush()
+    finally:
+        await db.close_drivers()
+
+
+@app.command()
+def adhoc_batch(
+    questions: typer.FileText = typer.Argument("-", help="One question per line; '-' reads stdin."),
+    output: typer.FileTextWrite = typer.Option("-", help="JSONL destination; '-' writes stdout."),
+    concurrency: int = typer.Option(8, min=1, help="Questions generated and executed at once."),
+    no_cache: bool = typer.Option(False, help="Always ask the LLM, even for a cached question."),
+    row_budget: int = typer.Option(ROW_BUDGET, help="Estimated rows above which a LIMIT is injected."),
+    timeout: float = typer.Option(QUERY_TIMEOUT, help="Transaction timeout in seconds."),
+    allow_hazards: bool = typer.Option(False, help="Run plans with cartesian products, full scans or unbounded expands."),
+):
+    guard_options = dict(row_budget=row_budget, allow_hazards=allow_hazards)
+    lines = [line.strip() for line in questions]
+    batch = [line for line in lines if line and not line.startswith("#")]
+    started = time.perf_counter()
+    asyncio.run(_adhoc_batch(batch, concurrency, output, no_cache, guard_options, timeout))
+    err_console.log(f"Answered {len(batch)} questions in {time.perf_counter() - started:.2f}s")
+
+
+@app.command()
+def llm_cache(clear: bool = typer.Option(False, help="Drop every cached query.")):
+    if clear:
+        cypher_cache.clear()
+    console.print(cypher_cache.summary())
+
+
+@app.command()
+def kinship(
+    a: int = typer.Argument(..., help="person_id of the first person."),
+    b: int = typer.Argument(..., help="person_id of the second person."),
+    max_generations: int = typer.Option(MAX_GENERATIONS, help="Generations searched upwards from each person."),
+    as_json: bool = typer.Option(False, "--json", help="Print the result as JSON."),
+):
+    started = time.perf_counter()
+    snapshot = load_snapshot(db.shared_driver())
+    console.log(f"SNAPSHOT_LOADED:::: {len(snapshot)} people, {snapshot.edges} edges in {time.perf_counter() - started:.2f}s")
+    try:
+        result = relate(snapshot, a, b, max_generations=max_generations)
+    except KeyError as exc:
+        err_console.print(f"UNKNOWN_PERSON:::: {exc.args[0]}")
+        raise typer.Exit(code=1)
+    if as_json:
+        console.print_json(json.dumps(result.as_dict()))
+        return result
+    names = {row_id: snapshot.names[snapshot.index[row_id]] for row_id in (a, b)}
+    console.print(result.describe(names))
+    if result.path:
+        console.print(" -> ".join(f"{person['name']} ({person['id']})" for person in result.path))
     return result
 
 
 if __name__ == "__main__":
-    app()
+    try:
+        app()
+    finally:
+        db.close_driver()
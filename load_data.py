@@ -1,33 +1,702 @@
+import argparse
+import hashlib
+import json
 import os
 import csv
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Optional
+
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 
+from vassar.schema import KEY_PROPERTIES, ensure_schema, schema_statements
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_MANIFEST = "n4jdb/import-manifest.json"
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+PARAMETER_RE = re.compile(r"\$(\w+)")
+
+
+def convert_row(row):
+    # Convert string values to appropriate types
+    for key, value in row.items():
+        if key in ['publication_year', 'book_number']:
+            row[key] = int(value) if value else None
+        elif key == 'contribution_percentage':
+            row[key] = float(value) if value else None
+    return row
+
+
+def unwind_query(query):
+    """Rewrite a per-row query (``$name`` parameters) into its ``UNWIND $rows`` form."""
+    return "UNWIND $rows AS row " + PARAMETER_RE.sub(r"row.\1", query)
+
+
+def in_partition(value, partition):
+    index, count = partition
+    return zlib.crc32(value.encode()) % count == index
+
+
+def read_batches(file_path, batch_size, partition=None, column=None):
+    """
+    Yield converted rows in lists of ``batch_size``. With ``partition=(index, count)``
+    only the rows whose ``column`` hashes to ``index`` are read, so ``count`` readers
+    of the same file split it between them.
+    """
+    with open(file_path, 'r') as csvfile:
+        reader = csv.DictReader(csvfile)
+        if partition is not None:
+            reader = (row for row in reader if in_partition(row[column], partition))
+        while True:
+            batch = [convert_row(row) for row in islice(reader, batch_size)]
+            if not batch:
+                return
+            yield batch
+
+
+@dataclass(frozen=True)
+class ImportStep:
+    """
+    One CSV file and the per-row queries that load it.
+
+    ``create`` is used by a full load into an empty database; an incremental import
+    applies ``upsert`` (``MERGE``/``SET``) to new and changed rows, ``delete`` to the
+    keys that disappeared from the file, and checks ``count`` against the manifest.
+
+    ``reads`` and ``writes`` are the labels and relationship types the queries MATCH
+    on and create; ``run_plan`` orders the steps by them. A step with a
+    ``partition_by`` column can be split into partitions that load concurrently.
+    """
+
+    path: str
+    keys: tuple
+    create: str
+    upsert: str
+    delete: str
+    count: str
+    reads: tuple = ()
+    writes: tuple = ()
+    partition_by: Optional[str] = None
+
+    @property
+    def name(self):
+        return Path(self.path).stem
+
+
+IMPORT_STEPS = (
+    ImportStep(
+        path="n4jdb/import/books/series.csv",
+        keys=("series_id",),
+        create="CREATE (:Series {series_id: $series_id, name: $name})",
+        upsert="MERGE (s:Series {series_id: $series_id}) SET s.name = $name",
+        delete="MATCH (s:Series {series_id: $series_id}) DETACH DELETE s",
+        count="MATCH (s:Series) RETURN count(s) AS count",
+        writes=("Series",),
+    ),
+    ImportStep(
+        path="n4jdb/import/books/authors.csv",
+        keys=("author_id",),
+        create="CREATE (:Author {author_id: $author_id, name: $name, birthdate: $birthdate, nationality: $nationality})",
+        upsert=(
+            "MERGE (a:Author {author_id: $author_id}) "
+            "SET a.name = $name, a.birthdate = $birthdate, a.nationality = $nationality"
+        ),
+        delete="MATCH (a:Author {author_id: $author_id}) DETACH DELETE a",
+        count="MATCH (a:Author) RETURN count(a) AS count",
+        writes=("Author",),
+    ),
+    ImportStep(
+        path="n4jdb/import/books/books.csv",
+        keys=("book_id",),
+        create="CREATE (:Book {book_id: $book_id, title: $title, publication_year: $publication_year, ISBN: $ISBN, genre: $genre})",
+        upsert=(
+            "MERGE (b:Book {book_id: $book_id}) "
+            "SET b.title = $title, b.publication_year = $publication_year, b.ISBN = $ISBN, b.genre = $genre"
+        ),
+        delete="MATCH (b:Book {book_id: $book_id}) DETACH DELETE b",
+        count="MATCH (b:Book) RETURN count(b) AS count",
+        writes=("Book",),
+    ),
+    ImportStep(
+        path="n4jdb/import/books/wrote_relationship.csv",
+        keys=("author_id", "book_id"),
+        create="MATCH (a:Author {author_id: $author_id}), (b:Book {book_id: $book_id}) CREATE (a)-[:WROTE {role: $role, contribution_percentage: $contribution_percentage}]->(b)",
+        upsert=(
+            "MATCH (a:Author {author_id: $author_id}), (b:Book {book_id: $book_id}) "
+            "MERGE (a)-[w:WROTE]->(b) SET w.role = $role, w.contribution_percentage = $contribution_percentage"
+        ),
+        delete="MATCH (:Author {author_id: $author_id})-[w:WROTE]->(:Book {book_id: $book_id}) DELETE w",
+        count="MATCH ()-[w:WROTE]->() RETURN count(w) AS count",
+        reads=("Author", "Book"),
+        writes=("WROTE",),
+        partition_by="book_id",
+    ),
+    ImportStep(
+        path="n4jdb/import/books/belongs_to_series.csv",
+        keys=("book_id", "series_id"),
+        create="MATCH (b:Book {book_id: $book_id}), (s:Series {series_id: $series_id}) CREATE (b)-[:BELONGS_TO {book_number: $book_number}]->(s)",
+        upsert=(
+            "MATCH (b:Book {book_id: $book_id}), (s:Series {series_id: $series_id}) "
+            "MERGE (b)-[r:BELONGS_TO]->(s) SET r.book_number = $book_number"
+        ),
+        delete="MATCH (:Book {book_id: $book_id})-[r:BELONGS_TO]->(:Series {series_id: $series_id}) DELETE r",
+        count="MATCH ()-[r:BELONGS_TO]->() RETURN count(r) AS count",
+        reads=("Book", "Series"),
+        writes=("BELONGS_TO",),
+        partition_by="book_id",
+    ),
+    # Person writes stamp updated_at so the web app's graph cache refreshes only what moved.
+    ImportStep(
+        path="n4jdb/import/vassar/person.csv",
+        keys=("person_id",),
+        create="CREATE (:Person {person_id: toInteger($person_id), name: $name, birthdate: date($birthdate), gender: $gender, birthplace: $birthplace})",
+        upsert=(
+            "MERGE (p:Person {person_id: toInteger($person_id)}) "
+            "SET p.name = $name, p.birthdate = date($birthdate), p.gender = $gender, "
+            "p.birthplace = $birthplace, p.updated_at = timestamp()"
+        ),
+        delete="MATCH (p:Person {person_id: toInteger($person_id)}) DETACH DELETE p",
+        count="MATCH (p:Person) RETURN count(p) AS count",
+        writes=("Person",),
+        partition_by="person_id",
+    ),
+    ImportStep(
+        path="n4jdb/import/vassar/relationships.csv",
+        keys=("parent_id", "child_id"),
+        create="MATCH (parent:Person {person_id: toInteger($parent_id)}), (child:Person {person_id: toInteger($child_id)}) CREATE (parent)-[:PARENT_OF]->(child)",
+        upsert=(
+            "MATCH (parent:Person {person_id: toInteger($parent_id)}), (child:Person {person_id: toInteger($child_id)}) "
+            "MERGE (parent)-[:PARENT_OF]->(child) "
+            "SET parent.updated_at = timestamp(), child.updated_at = timestamp()"
+        ),
+        delete=(
+            "MATCH (parent:Person {person_id: toInteger($parent_id)})-[r:PARENT_OF]->"
+            "(child:Person {person_id: toInteger($child_id)}) "
+            "DELETE r SET parent.updated_at = timestamp(), child.updated_at = timestamp()"
+        ),
+        count="MATCH ()-[r:PARENT_OF]->() RETURN count(r) AS count",
+        reads=("Person",),
+        writes=("PARENT_OF",),
+        partition_by="child_id",
+    ),
+)
+
+
+def row_key(row, keys):
+    return "\x1f".join(row[key] for key in keys)
+
+
+def row_hash(row):
+    # Values in column order: reordering the CSV's columns marks every row changed.
+    return hashlib.blake2b("\x1f".join(row.values()).encode(), digest_size=12).hexdigest()
+
+
+class ImportManifest:
+    """
+    The row hashes of the last successful import, per step, in a JSON file:
+    ``{step: {"hashes": {key: hash}, "copies": {key: rows}}}``. ``copies`` lists the
+    keys a full load created more than once, because the file repeats them. Each step
+    is saved as soon as it is applied, so an interrupted run resumes from the first
+    step that didn't finish.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST):
+        self.path = Path(path)
+        self.steps = json.loads(self.path.read_text()) if self.path.exists() else {}
+        self._lock = threading.Lock()
+
+    def hashes(self, step):
+        return self.steps.get(step.name, {}).get("hashes", {})
+
+    def copies(self, step):
+        return self.steps.get(step.name, {}).get("copies", {})
+
+    def rows(self, step):
+        """The nodes or relationships the database should hold for ``step``."""
+        return len(self.hashes(step)) + sum(count - 1 for count in self.copies(step).values())
+
+    def store(self, step, hashes, copies=None):
+        with self._lock:
+            self.steps[step.name] = dict(hashes=hashes, copies=copies or {})
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            partial = self.path.with_suffix(".tmp")
+            partial.write_text(json.dumps(self.steps, separators=(",", ":")))
+            partial.replace(self.path)
+
+    def forget(self, step):
+        self.steps.pop(step.name, None)
+
+
+@dataclass
+class RowChanges:
+    inserted: list
+    updated: list
+    deleted: list
+    unchanged: int
+    hashes: dict
+
+    @property
+    def upserts(self):
+        return self.inserted + self.updated
+
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+
+def warn_duplicates(file_path, copies):
+    if copies:
+        shown = ", ".join(key.replace("\x1f", "/") for key in list(copies)[:3])
+        print(f"{file_path}: {len(copies)} keys are on more than one row ({shown}), the last row of each is used")
+
+
+def file_hashes(file_path, keys):
+    """The key -> hash map of a CSV file, and how many rows each repeated key has."""
+    hashes, copies = {}, {}
+    with open(file_path, 'r') as csvfile:
+        for row in csv.DictReader(csvfile):
+            key = row_key(row, keys)
+            if key in hashes:
+                copies[key] = copies.get(key, 1) + 1
+            hashes[key] = row_hash(row)
+    warn_duplicates(file_path, copies)
+    return hashes, copies
+
+
+def diff_rows(file_path, keys, previous):
+    """
+    Compare a CSV file with the ``previous`` key -> hash map of its last import. A key
+    repeated in the file counts once, with its last row, which is what ``MERGE`` leaves.
+    """
+    changed, hashes, copies = {}, {}, {}
+    with open(file_path, 'r') as csvfile:
+        for row in csv.DictReader(csvfile):
+            key = row_key(row, keys)
+            digest = row_hash(row)
+            if key in hashes:
+                copies[key] = copies.get(key, 1) + 1
+            hashes[key] = digest
+            if previous.get(key) == digest:
+                changed.pop(key, None)
+            else:
+                changed[key] = row
+    warn_duplicates(file_path, copies)
+    inserted = [convert_row(row) for key, row in changed.items() if key not in previous]
+    updated = [convert_row(row) for key, row in changed.items() if key in previous]
+    deleted = [convert_row(dict(zip(keys, key.split("\x1f")))) for key in previous.keys() - hashes.keys()]
+    return RowChanges(inserted, updated, deleted, len(hashes) - len(changed), hashes)
+
+
+def batches(rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        yield rows[start:start + batch_size]
+
+
+def step_dependencies(steps):
+    """
+    The earlier steps each step has to wait for: those that write a label it reads
+    (relationships need their nodes) or one it writes too. Steps that share nothing
+    run concurrently.
+    """
+    dependencies = {}
+    for index, step in enumerate(steps):
+        touches = set(step.reads) | set(step.writes)
+        dependencies[step.name] = {
+            earlier.name for earlier in steps[:index] if touches & set(earlier.writes)
+        }
+    return dependencies
+
+
+def partitions_for(step, partitions, keyed_labels):
+    """
+    Split a step only when every label it MATCHes on has a key constraint to seek on.
+    Partitions hold disjoint keys, so node partitions never touch the same node.
+    """
+    if partitions > 1 and step.partition_by and set(step.reads) <= keyed_labels:
+        return partitions
+    return 1
+
+
+class ImportProgress:
+    """
+    Row counts per step, safe to update from the worker threads. Prints each step as
+    it finishes, a running total every ``interval`` seconds and the end-to-end
+    throughput in ``summary``.
+    """
+
+    def __init__(self, interval=10.0):
+        self.interval = interval
+        self.rows = {}
+        self.started = {}
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def begin(self, step):
+        with self._lock:
+            self.rows[step.name] = 0
+            self.started[step.name] = time.perf_counter()
+
+    def add(self, step, rows):
+        with self._lock:
+            self.rows[step.name] += rows
+
+    def finish(self, step, partitions=1):
+        with self._lock:
+            rows = self.rows[step.name]
+            elapsed = time.perf_counter() - self.started.pop(step.name)
+        rate = rows / elapsed if elapsed else float('inf')
+        split = f" in {partitions} partitions" if partitions > 1 else ""
+        print(f"Finished {step.path}: {rows:,} rows{split}, {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+    def report(self):
+        with self._lock:
+            rows = sum(self.rows.values())
+            running = ", ".join(self.started)
+        elapsed = time.perf_counter() - self.started_at
+        print(f"[{elapsed:.0f}s] {rows:,} rows ({rows / elapsed:,.0f} rows/sec); running: {running or '-'}")
+
+    def summary(self):
+        rows = sum(self.rows.values())
+        elapsed = time.perf_counter() - self.started_at
+        rate = rows / elapsed if elapsed else float('inf')
+        print(f"Imported {rows:,} rows from {len(self.rows)} files in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+    def _report_periodically(self):
+        while not self._stopped.wait(self.interval):
+            self.report()
+
+    def __enter__(self):
+        if self.interval:
+            threading.Thread(target=self._report_periodically, name="import-progress", daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        return False
+
+
+def run_plan(steps, tasks, workers=DEFAULT_WORKERS, on_done=None):
+    """
+    Run every step of the plan on a pool of ``workers`` threads as soon as the steps
+    it depends on (``step_dependencies``) have finished. ``tasks(step)`` returns the
+    callables that make up a step, e.g. one per partition; ``on_done(step)`` is called
+    once all of them returned. The first failure cancels what hasn't started and is
+    re-raised.
+    """
+    dependencies = step_dependencies(steps)
+    waiting = list(steps)
+    finished = set()
+    remaining = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="import") as pool:
+
+        def submit_ready():
+            for step in list(waiting):
+                if dependencies[step.name] <= finished:
+                    waiting.remove(step)
+                    step_tasks = tasks(step)
+                    remaining[step.name] = len(step_tasks)
+                    for task in step_tasks:
+                        running[pool.submit(task)] = step
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                if future.exception() is not None:
+                    for other in running:
+                        other.cancel()
+                    raise future.exception()
+                remaining[step.name] -= 1
+                if not remaining[step.name]:
+                    finished.add(step.name)
+                    if on_done is not None:
+                        on_done(step)
+            submit_ready()
+
+
+def print_plan(steps, partitions, keyed_labels):
+    for step, waits_for in zip(steps, step_dependencies(steps).values()):
+        after = f"after {', '.join(sorted(waits_for))}" if waits_for else "immediately"
+        split = partitions_for(step, partitions, keyed_labels)
+        part = f", {split} partitions by {step.partition_by}" if split > 1 else ""
+        print(f"[dry-run] {step.path}: starts {after}{part}")
+
+
+def _write_batch(tx, query, rows):
+    result = tx.run(query, rows=rows)
+    return result.consume().counters
+
 
 class Neo4jLoader:
-    def __init__(self, uri, user, password, database):
-        self.driver = GraphDatabase.driver(uri, auth=(user, password))
+    def __init__(self, uri, user, password, database, max_transaction_retry_time=30.0):
+        self.driver = GraphDatabase.driver(
+            uri,
+            auth=(user, password),
+            max_transaction_retry_time=max_transaction_retry_time,
+        )
         self.database = database
 
     def close(self):
         self.driver.close()
 
-    def load_csv_to_neo4j(self, file_path, query):
+    def ensure_schema(self, dry_run=False):
+        if dry_run:
+            for statement in schema_statements():
+                print(f"[dry-run] {statement}")
+            return []
+        missing = ensure_schema(self.driver, self.database)
+        for line in missing:
+            print(f"Missing schema: {line}")
+        return missing
+
+    def load_csv_to_neo4j(self, file_path, query, batch_size=None, dry_run=False):
+        if batch_size:
+            return self.load_csv_batched(file_path, query, batch_size, dry_run=dry_run)
+        if dry_run:
+            return self._print_row_plan(file_path, query)
         with self.driver.session(database=self.database) as session:
             with open(file_path, 'r') as csvfile:
                 reader = csv.DictReader(csvfile)
+                rows = 0
                 for row in reader:
-                    # Convert string values to appropriate types
-                    for key, value in row.items():
-                        if key in ['publication_year', 'book_number']:
-                            row[key] = int(value) if value else None
-                        elif key == 'contribution_percentage':
-                            row[key] = float(value) if value else None
-                    session.run(query, **row)
+                    session.run(query, **convert_row(row))
+                    rows += 1
                 print(f"Loaded data from {file_path}")
+        return rows
+
+    def load_csv_batched(
+        self,
+        file_path,
+        query,
+        batch_size=DEFAULT_BATCH_SIZE,
+        dry_run=False,
+        partition=None,
+        column=None,
+        on_batch=None,
+    ):
+        """
+        Load a CSV file in chunks of ``batch_size`` rows, sending each chunk as a single
+        ``UNWIND`` write in a managed transaction. ``execute_write`` retries transient
+        failures (deadlocks, leader switches) until ``max_transaction_retry_time`` expires.
+
+        ``partition``/``column`` load one partition of the file (see ``read_batches``);
+        ``on_batch`` is called with the size of every batch written. Each call uses its
+        own session, so partitions can load from separate threads.
+        """
+        batched_query = unwind_query(query)
+        if dry_run:
+            return self._print_batch_plan(file_path, batched_query, batch_size)
+
+        rows = 0
+        batches = 0
+        started = time.perf_counter()
+        with self.driver.session(database=self.database) as session:
+            for batch in read_batches(file_path, batch_size, partition, column):
+                session.execute_write(_write_batch, batched_query, batch)
+                rows += len(batch)
+                batches += 1
+                if on_batch is not None:
+                    on_batch(len(batch))
+        elapsed = time.perf_counter() - started
+        rate = rows / elapsed if elapsed else float('inf')
+        part = f" [partition {partition[0] + 1}/{partition[1]}]" if partition else ""
+        print(
+            f"Loaded data from {file_path}{part}: {rows} rows in {batches} batches, "
+            f"{elapsed:.2f}s ({rate:,.0f} rows/sec)"
+        )
+        return rows
+
+    def count(self, step):
+        records, _, _ = self.driver.execute_query(step.count, database_=self.database)
+        return records[0]["count"]
+
+    def check_manifest(self, manifest, steps=IMPORT_STEPS):
+        """
+        Forget the steps whose row count in the database differs from the manifest,
+        e.g. after ``n4jdb/data`` was wiped. Runs before any step writes, since deleting
+        a node also removes its relationships.
+        """
+        for step in steps:
+            if manifest.hashes(step) and self.count(step) != manifest.rows(step):
+                print(f"{step.path}: database does not match {manifest.path}, merging every row")
+                manifest.forget(step)
+
+    def load_incremental(self, step, manifest, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, on_batch=None):
+        """
+        Apply only what changed in ``step``'s CSV since the import recorded in
+        ``manifest``: ``MERGE``/``SET`` new and changed rows, delete rows that are gone,
+        then record the new hashes. When the database doesn't hold what the manifest
+        says (see ``check_manifest``) every row is merged again, which is idempotent.
+        """
+        previous = manifest.hashes(step)
+        started = time.perf_counter()
+        changes = diff_rows(step.path, step.keys, previous)
+        summary = (
+            f"{step.path}: {len(changes.inserted)} new, {len(changes.updated)} changed, "
+            f"{len(changes.deleted)} removed, {changes.unchanged} unchanged"
+        )
+        if dry_run:
+            print(f"[dry-run] {summary}")
+            return changes
+
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        with self.driver.session(database=self.database) as session:
+            for query, rows in ((step.delete, changes.deleted), (step.upsert, changes.upserts)):
+                for batch in batches(rows, batch_size):
+                    session.execute_write(_write_batch, unwind_query(query), batch)
+                    if on_batch is not None:
+                        on_batch(len(batch))
+        # MERGE leaves the copies of a key a full load created, and never makes new ones.
+        copies = {key: count for key, count in manifest.copies(step).items() if key in changes.hashes}
+        manifest.store(step, changes.hashes, copies)
+        print(f"{summary} ({time.perf_counter() - started:.2f}s)")
+        return changes
+
+    def import_plan(
+        self,
+        steps=IMPORT_STEPS,
+        workers=DEFAULT_WORKERS,
+        partitions=None,
+        batch_size=DEFAULT_BATCH_SIZE,
+        manifest=None,
+        incremental=False,
+        keyed_labels=frozenset(),
+        progress_interval=10.0,
+    ):
+        """
+        Load every step of the plan concurrently where ``step_dependencies`` allows:
+        node files together, each relationship file once the labels it MATCHes on are
+        loaded. Steps with a ``partition_by`` column are split into ``partitions``
+        (default ``workers``) when all the labels they read are in ``keyed_labels``;
+        otherwise every partition would scan the whole label for each row. Row by row loading (``batch_size=0``) isn't
+        partitioned. ``manifest`` records what was loaded, see ``load_incremental``.
+        """
+        partitions = partitions or workers
+        progress = ImportProgress(progress_interval)
+
+        def split(step):
+            if incremental or not batch_size:
+                return 1
+            return partitions_for(step, partitions, keyed_labels)
+
+        loaded_hashes = {}
+
+        def tasks(step):
+            progress.begin(step)
+            count = lambda rows: progress.add(step, rows)  # noqa: E731
+            if incremental:
+                return [lambda: self.load_incremental(step, manifest, batch_size, on_batch=count)]
+            if split(step) == 1:
+                step_tasks = [lambda: self._load_step(step, batch_size, count)]
+            else:
+                step_tasks = [
+                    lambda index=index: self.load_csv_batched(
+                        step.path, step.create, batch_size,
+                        partition=(index, split(step)), column=step.partition_by, on_batch=count,
+                    )
+                    for index in range(split(step))
+                ]
+            if manifest is not None:
+                # Hash the file alongside the load; it is recorded once the whole step succeeded,
+                # so the next incremental run starts from this load.
+                step_tasks.append(lambda: loaded_hashes.update({step.name: file_hashes(step.path, step.keys)}))
+            return step_tasks
+
+        def on_done(step):
+            if step.name in loaded_hashes:
+                manifest.store(step, *loaded_hashes.pop(step.name))
+            progress.finish(step, split(step))
+
+        with progress:
+            run_plan(steps, tasks, workers, on_done)
+        progress.summary()
+        return progress.rows
+
+    def _load_step(self, step, batch_size, on_batch):
+        if batch_size:
+            return self.load_csv_batched(step.path, step.create, batch_size, on_batch=on_batch)
+        rows = self.load_csv_to_neo4j(step.path, step.create)
+        on_batch(rows)
+        return rows
+
+    @staticmethod
+    def _print_batch_plan(file_path, batched_query, batch_size):
+        sizes = [len(batch) for batch in read_batches(file_path, batch_size)]
+        rows = sum(sizes)
+        print(f"[dry-run] {file_path}: {rows} rows -> {len(sizes)} batches of <= {batch_size}")
+        print(f"[dry-run]   {batched_query}")
+        return rows
+
+    @staticmethod
+    def _print_row_plan(file_path, query):
+        with open(file_path, 'r') as csvfile:
+            rows = sum(1 for _ in csv.DictReader(csvfile))
+        print(f"[dry-run] {file_path}: {rows} rows -> {rows} auto-commit statements")
+        print(f"[dry-run]   {query}")
+        return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load the CSV exports under n4jdb/import into Neo4j.")
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Rows per UNWIND transaction; 0 loads row by row (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help="Print the batch plan for every file without writing anything",
+    )
+    parser.add_argument(
+        '--skip-schema',
+        action='store_true',
+        help="Do not create constraints and indexes before loading",
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Apply only the rows added, changed or removed since the last import (see --manifest)",
+    )
+    parser.add_argument(
+        '--manifest',
+        default=DEFAULT_MANIFEST,
+        help="Row hashes of the last incremental import (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="Files (or partitions) loaded at the same time; 1 loads them in order (default: %(default)s)",
+    )
+    parser.add_argument(
+        '--partitions',
+        type=int,
+        help="Partitions per relationship file (default: --workers)",
+    )
+    parser.add_argument(
+        '--progress-interval',
+        type=float,
+        default=10.0,
+        help="Seconds between progress reports; 0 turns them off (default: %(default)s)",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     load_dotenv()
     neo4j_uri = os.getenv("NEO4J_URI")
     neo4j_user = os.getenv("NEO4J_USER")
@@ -35,42 +704,30 @@ if __name__ == "__main__":
     neo4j_database = os.getenv("NEO4J_DATABASE", "neo4j")
 
     loader = Neo4jLoader(neo4j_uri, neo4j_user, neo4j_password, neo4j_database)
-    # Load series data
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/books/series.csv",
-        "CREATE (:Series {series_id: $series_id, name: $name})"
-    )
-
-    # Load authors data
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/books/authors.csv",
-        "CREATE (:Author {author_id: $author_id, name: $name, birthdate: $birthdate, nationality: $nationality})"
-    )
-
-    # Load books data
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/books/books.csv",
-        "CREATE (:Book {book_id: $book_id, title: $title, publication_year: $publication_year, ISBN: $ISBN, genre: $genre})"
-    )
-
-    # Load wrote relationship data
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/books/wrote_relationship.csv",
-        "MATCH (a:Author {author_id: $author_id}), (b:Book {book_id: $book_id}) CREATE (a)-[:WROTE {role: $role, contribution_percentage: $contribution_percentage}]->(b)"
-    )
-
-    # Load belongs to series data
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/books/belongs_to_series.csv",
-        "MATCH (b:Book {book_id: $book_id}), (s:Series {series_id: $series_id}) CREATE (b)-[:BELONGS_TO {book_number: $book_number}]->(s)"
-    )
-
-    # Add more data loading logic here
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/vassar/person.csv",
-        "CREATE (:Person {person_id: toInteger($person_id), name: $name, birthdate: date($birthdate), gender: $gender, birthplace: $birthplace})")
+    if not args.skip_schema and loader.ensure_schema(dry_run=args.dry_run):
+        loader.close()
+        raise SystemExit("Schema is not ONLINE; refusing to load relationships without key indexes")
 
-    loader.load_csv_to_neo4j(
-        "n4jdb/import/vassar/relationships.csv",
-        "MATCH (parent:Person {person_id: toInteger($parent_id)}), (child:Person {person_id: toInteger($child_id)}) CREATE (parent)-[:PARENT_OF]->(child)")
+    manifest = ImportManifest(args.manifest)
+    keyed_labels = set() if args.skip_schema else {key.label for key in KEY_PROPERTIES}
+    if args.dry_run:
+        print_plan(IMPORT_STEPS, args.partitions or args.workers, keyed_labels)
+        for step in IMPORT_STEPS:
+            if args.incremental:
+                loader.load_incremental(step, manifest, batch_size=args.batch_size, dry_run=True)
+            else:
+                loader.load_csv_to_neo4j(step.path, step.create, batch_size=args.batch_size, dry_run=True)
+    else:
+        if args.incremental:
+            loader.check_manifest(manifest)
+        loader.import_plan(
+            IMPORT_STEPS,
+            workers=args.workers,
+            partitions=args.partitions,
+            batch_size=args.batch_size,
+            manifest=manifest,
+            incremental=args.incremental,
+            keyed_labels=keyed_labels,
+            progress_interval=args.progress_interval,
+        )
     loader.close()
@@ -1,8 +1,4 @@
 document.addEventListener("DOMContentLoaded", async () => {
-    // Fetch the data from the backend
-    const response = await fetch("/tree");
-    const data = await response.json();
-
     const width = 1200;
     const height = 800;
     const margin = {top: 40, right: 120, bottom: 20, left: 120};
@@ -24,35 +20,46 @@ document.addEventListener("DOMContentLoaded", async () => {
         .append("g")
         .attr("transform", `translate(${margin.left},${margin.top})`);
 
-    const root = d3.hierarchy(data);
-    root.x0 = height / 2;
-    root.y0 = 0;
+    // The server lays the tree out (/tree/layout) for the set of expanded people;
+    // the page only draws the nodes where it is told to.
+    const expanded = new Set();
+    let root = "";
+    let nodes = [];
+
+    const fetchLayout = async () => {
+        const params = new URLSearchParams({root, expanded: [...expanded].join(",")});
+        const response = await fetch(`/tree/layout?${params}`);
+        const layout = await response.json();
+        const rows = [];
+        layout.ids.forEach((id, row) => {
+            const parent = layout.parents[row] >= 0 ? rows[layout.parents[row]] : null;
+            rows.push({
+                // A person shared by two parents is drawn once under each, so key on the path
+                key: parent ? `${parent.key}/${id}` : `${id}`,
+                id,
+                name: layout.names[row],
+                parent,
+                hasMore: layout.has_more[row],
+                x: layout.x[row],
+                y: layout.y[row],
+            });
+        });
+        return rows;
+    };
 
-    // Tree layout with increased separation between columns
-    const treeLayout = d3.tree()
-        .size([height, width - margin.left - margin.right])
-        .separation((a, b) => (a.parent === b.parent ? 2 : 3)); // Increase separation between sibling nodes
+    const position = new Map();
 
     const update = (source) => {
-        // Assign the new positions for the nodes
-        treeLayout(root);
-
-        const nodes = root.descendants();
-        const links = root.descendants().slice(1);
-
-        // Adjust y position to increase space between columns
-        nodes.forEach(d => {
-            d.y = d.depth * 250;  // Increase horizontal spacing by adjusting depth multiplier
-            d.x *= 1.5;  // Increase vertical spacing by scaling the x position
-        });
+        const origin = position.get(source.key) || source;
+        const links = nodes.filter(d => d.parent);
 
         // Update the nodes
         const node = svg.selectAll("g.node")
-            .data(nodes, d => d.id || (d.id = ++i));
+            .data(nodes, d => d.key);
 
         const nodeEnter = node.enter().append("g")
             .attr("class", "node")
-            .attr("transform", d => `translate(${source.y0},${source.x0})`)
+            .attr("transform", d => `translate(${origin.y},${origin.x})`)
             .on("click", click);
 
         nodeEnter.append("rect")
@@ -60,7 +67,7 @@ document.addEventListener("DOMContentLoaded", async () => {
             .attr("height", cardHeight)
             .attr("x", -cardWidth / 2)
             .attr("y", -cardHeight / 2)
-            .attr("fill", d => d._children ? "#9b3df4" : "#e1bcff")
+            .attr("fill", d => d.hasMore ? "#9b3df4" : "#e1bcff")
             .attr("stroke", "#e1bcff")
             .attr("stroke-width", "2px")
             .attr("rx", 10)
@@ -71,7 +78,7 @@ document.addEventListener("DOMContentLoaded", async () => {
             .attr("x", 0)
             .attr("text-anchor", "middle")
             .attr("fill", "#000")
-            .text(d => d.data.name);
+            .text(d => d.name);
 
         const nodeUpdate = nodeEnter.merge(node);
 
@@ -80,7 +87,7 @@ document.addEventListener("DOMContentLoaded", async () => {
             .attr("transform", d => `translate(${d.y},${d.x})`);
 
         nodeUpdate.select("rect")
-            .attr("fill", d => d._children ? "#9b3df4" : "#e1bcff");
+            .attr("fill", d => d.hasMore ? "#9b3df4" : "#e1bcff");
 
         nodeUpdate.select("text")
             .style("fill-opacity", 1);
@@ -99,12 +106,12 @@ document.addEventListener("DOMContentLoaded", async () => {
 
         // Update the links
         const link = svg.selectAll("path.link")
-            .data(links, d => d.id);
+            .data(links, d => d.key);
 
         const linkEnter = link.enter().insert("path", "g")
             .attr("class", "link")
             .attr("d", d => {
-                const o = {x: source.x0, y: source.y0};
+                const o = {x: origin.x, y: origin.y};
                 return diagonal({source: o, target: o});
             })
             .attr("fill", "none")
@@ -125,46 +132,38 @@ document.addEventListener("DOMContentLoaded", async () => {
             })
             .remove();
 
-        nodes.forEach(d => {
-            d.x0 = d.x;
-            d.y0 = d.y;
-        });
+        position.clear();
+        nodes.forEach(d => position.set(d.key, {x: d.x, y: d.y}));
     };
 
-    const click = (event, d) => {
-        if (d.children) {
-            d._children = d.children;
-            d.children = null;
-        } else {
-            d.children = d._children;
-            d._children = null;
-        }
-        update(d);
+    const refresh = async (source) => {
+        nodes = await fetchLayout();
+        update(nodes.find(d => d.key === source.key) || nodes[0]);
     };
 
-    const collapse = (d) => {
-        if (d.children) {
-            d._children = d.children;
-            d._children.forEach(collapse);
-            d.children = null;
+    const click = async (event, d) => {
+        if (expanded.has(d.id)) {
+            expanded.delete(d.id);
+        } else if (d.hasMore) {
+            expanded.add(d.id);
+        } else {
+            return;
         }
+        await refresh(d);
     };
 
-    const expandAll = () => {
-        root.each(d => {
-            if (d._children) {
-                d.children = d._children;
-                d._children = null;
-            }
+    // Opens one more generation under everything on screen
+    const expandAll = async () => {
+        nodes.forEach(d => {
+            if (d.hasMore) expanded.add(d.id);
         });
-        update(root);
-        document.querySelector("#expand-all").style.display = "none";
+        await refresh(nodes[0]);
         document.querySelector("#collapse-all").style.display = "block";
     };
 
-    const collapseAll = () => {
-        root.each(collapse);
-        update(root);
+    const collapseAll = async () => {
+        expanded.clear();
+        await refresh(nodes[0]);
         document.querySelector("#expand-all").style.display = "block";
         document.querySelector("#collapse-all").style.display = "none";
     }
@@ -176,9 +175,72 @@ document.addEventListener("DOMContentLoaded", async () => {
         .x(d => d.y)
         .y(d => d.x);
 
-    let i = 0;
-    root.children.forEach(collapse); // Start with all nodes collapsed
-    update(root);
+    // Start with the root open and everything below it collapsed
+    nodes = await fetchLayout();
+    if (nodes.length === 1 && nodes[0].hasMore) {
+        expanded.add(nodes[0].id);
+        nodes = await fetchLayout();
+    }
+    update(nodes[0]);
+
+    // Search (/search): picking a person redraws the tree from them, opened one level
+    const searchInput = document.querySelector("#person-search");
+    const searchResults = document.querySelector("#search-results");
+    let searchTimer = null;
+    const showResults = (results) => {
+        searchResults.replaceChildren(...results.map(person => {
+            const item = document.createElement("li");
+            item.className = "pa2 pointer light-gray hover-bg-dark-blue";
+            item.textContent = person.birthplace ? `${person.name} (${person.birthplace})` : person.name;
+            item.addEventListener("click", async () => {
+                searchResults.replaceChildren();
+                searchInput.value = person.name;
+                root = `${person.id}`;
+                expanded.clear();
+                expanded.add(person.id);
+                await refresh(nodes[0]);
+            });
+            return item;
+        }));
+    };
+    searchInput.addEventListener("input", () => {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(async () => {
+            const q = searchInput.value.trim();
+            if (!q) {
+                showResults([]);
+                return;
+            }
+            const response = await fetch(`/search?${new URLSearchParams({q})}`);
+            const body = await response.json();
+            // Ignore answers to what the user has typed over since
+            if (q === searchInput.value.trim()) showResults(body.results);
+        }, 80);
+    });
+
+    // Live updates: the server pushes compact change events (/tree/events). Refetch the
+    // layout when one touches someone on screen, or after a resync, at most every 250ms.
+    if (window.EventSource) {
+        const events = new EventSource("/tree/events");
+        let pending = null;
+        const scheduleRefresh = () => {
+            if (pending) return;
+            pending = setTimeout(async () => {
+                pending = null;
+                await refresh(nodes[0]);
+            }, 250);
+        };
+        events.addEventListener("changes", (message) => {
+            const visible = new Set(nodes.map(d => d.id));
+            // Under the synthetic root any new family can show up at the top level
+            const synthetic = nodes.length > 0 && nodes[0].id === null;
+            const changes = JSON.parse(message.data);
+            if (changes.some(e => synthetic || visible.has(e.id) || visible.has(e.parent) || visible.has(e.child))) {
+                scheduleRefresh();
+            }
+        });
+        events.addEventListener("resync", scheduleRefresh);
+    }
 });
 
 document.querySelector('.info-icon').addEventListener('mouseenter', () => {
@@ -0,0 +1,137 @@
+"""
+One ASGI app for the whole site: the home, history and family tree pages with the tree,
+live tree events, person search, kinship, metrics and admin endpoints.
+
+``create_app(settings)`` builds it. ``Settings.from_env`` turns fasthtml's live reload
+(a websocket route plus a script on every page) and Starlette's debug tracebacks on in
+development and off in production. Shared resources belong to the lifespan, which every
+worker process runs for itself: it renders the precompiled pages, opens the process'
+Neo4j drivers, warms the plan cache and starts the graph cache when it is enabled, and
+closes the drivers on shutdown. Nothing is opened at import, so forking servers
+(``gunicorn --preload``) don't share connections between workers.
+
+    python -m vassar.app                     # uvicorn with VASSAR_WORKERS processes
+    gunicorn 'vassar.app:create_app()' -k uvicorn.workers.UvicornWorker -w 4
+
+The following environment variables are optional:
+- VASSAR_ENV: "development" or "production" (default development)
+- VASSAR_LIVE_RELOAD: Override live reload (default on in development only)
+- VASSAR_DEBUG: Override debug tracebacks (default on in development only)
+- VASSAR_HOST: Interface ``python -m vassar.app`` binds to (default 0.0.0.0)
+- VASSAR_PORT: Port ``python -m vassar.app`` listens on (default 8000)
+- VASSAR_WORKERS: Worker processes for ``python -m vassar.app`` (default 1 in development, one per CPU in production)
+"""
+
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional
+
+import uvicorn
+from fasthtml.fastapp import fast_app
+from rich.console import Console
+
+from vassar.assets import asset_routes
+from vassar.components import TREE_PAGE_PATH
+from vassar.database import lifespan
+from vassar.history import history_routes
+from vassar.home import home_routes
+from vassar.kinship import kinship_routes
+from vassar.metrics import metrics_routes
+from vassar.pages import page_admin_routes, precompile
+from vassar.response_cache import cache_admin_routes
+from vassar.search import search_routes
+from vassar.tree import tree_routes
+
+console = Console()
+
+ENVIRONMENTS = ("development", "production")
+
+
+def _flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class Settings:
+    environment: str = "development"
+    live: bool = True
+    debug: bool = True
+    host: str = "0.0.0.0"
+    port: int = 8000
+    workers: int = 1
+
+    @property
+    def production(self) -> bool:
+        return self.environment == "production"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        environment = os.getenv("VASSAR_ENV", "development").lower()
+        if environment not in ENVIRONMENTS:
+            raise ValueError(f"VASSAR_ENV must be one of {', '.join(ENVIRONMENTS)}, not {environment!r}")
+        development = environment == "development"
+        return cls(
+            environment=environment,
+            live=_flag("VASSAR_LIVE_RELOAD", development),
+            debug=_flag("VASSAR_DEBUG", development),
+            host=os.getenv("VASSAR_HOST", "0.0.0.0"),
+            port=int(os.getenv("VASSAR_PORT", "8000")),
+            workers=int(os.getenv("VASSAR_WORKERS", "1" if development else str(os.cpu_count() or 1))),
+        )
+
+
+@asynccontextmanager
+async def app_lifespan(app):
+    # Pages render once per worker before it takes traffic; a missing asset fails startup here.
+    precompile()
+    async with lifespan(app):
+        console.log(f"WORKER_READY:::: pid {os.getpid()}")
+        yield
+
+
+def create_app(settings: Optional[Settings] = None):
+    settings = settings or Settings.from_env()
+    # fasthtml's default headers pull htmx, surreal and pico from unpinned CDN tags on every
+    # page. Nothing here uses them; what the pages need is vendored through assets.VENDOR.
+    app, _ = fast_app(live=settings.live, debug=settings.debug, lifespan=app_lifespan, default_hdrs=False)
+    app.state.settings = settings
+    asset_routes(app)
+    home_routes(app)
+    history_routes(app)
+    tree_routes(app, page_path=TREE_PAGE_PATH)
+    kinship_routes(app)
+    search_routes(app)
+    metrics_routes(app)
+    cache_admin_routes(app)
+    page_admin_routes(app)
+    return app
+
+
+def main():
+    settings = Settings.from_env()
+    console.log(
+        f"STARTING:::: {settings.environment} on {settings.host}:{settings.port} with "
+        f"{settings.workers} worker(s), live reload {'on' if settings.live else 'off'}, "
+        f"debug {'on' if settings.debug else 'off'}"
+    )
+    # With factory=True every worker imports this module and calls create_app itself.
+    uvicorn.run(
+        "vassar.app:create_app",
+        factory=True,
+        host=settings.host,
+        port=settings.port,
+        workers=settings.workers,
+        reload=settings.live and settings.workers == 1,
+        proxy_headers=settings.production,
+        access_log=not settings.production,
+        # Open /tree/events streams never finish by themselves; don't let them hold up a restart.
+        timeout_graceful_shutdown=5,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Static asset build step and the middleware that serves its output.
+
+``python -m vassar.assets`` vendors the third-party CSS/JS the pages used to pull from
+CDNs (tachyons, font-awesome with the web fonts its CSS refers to, d3) into
+``public/vendor``. Then it copies everything under ``public`` into the build directory:
+- every file gets a content hash in its name (``js/tree.3fa2c1d0e9.js``)
+- CSS ``url(...)`` references are rewritten to the hashed names
+- compressible files get ``.gz`` and, with the ``brotli`` package, ``.br`` variants
+- ``manifest.json`` maps each logical name (``js/tree.js``) to its build output
+
+``asset_routes`` loads the manifest when the app is created and fails right away if
+any file it names is missing. ``asset_url`` then turns logical names into hashed URLs;
+a page that asks for an asset the build doesn't have fails the same way when it is
+precompiled. ``AssetMiddleware`` serves the build from memory: brotli or gzip by
+``Accept-Encoding`` and ``Cache-Control: immutable``, since a hashed URL never changes.
+
+Without a build (``VASSAR_ASSETS=dev``, or ``auto`` with no manifest) ``asset_url``
+points at ``/public/...`` and the CDNs as before, but local files must still exist.
+
+The following environment variables are optional:
+- VASSAR_ASSETS: "manifest" to require a build, "dev" to ignore it, "auto" to use one if present
+  (default manifest when VASSAR_ENV=production, auto otherwise)
+- VASSAR_ASSET_SOURCE: Directory with the source assets (default public)
+- VASSAR_ASSET_BUILD_DIR: Directory the build step writes to (default build/assets)
+- VASSAR_ASSET_PREFIX: URL prefix the built assets are served under (default /assets)
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from rich.console import Console
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+console = Console()
+
+MODE = (os.getenv("VASSAR_ASSETS") or ("manifest" if os.getenv("VASSAR_ENV") == "production" else "auto")).lower()
+SOURCE_DIR = Path(os.getenv("VASSAR_ASSET_SOURCE", "public"))
+BUILD_DIR = Path(os.getenv("VASSAR_ASSET_BUILD_DIR", "build/assets"))
+PREFIX = os.getenv("VASSAR_ASSET_PREFIX", "/assets").rstrip("/")
+
+MANIFEST_NAME = "manifest.json"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Logical name under public/ -> where it is vendored from.
+VENDOR = {
+    "vendor/tachyons/tachyons.min.css": "https://cdnjs.cloudflare.com/ajax/libs/tachyons/4.11.1/tachyons.min.css",
+    "vendor/font-awesome/css/all.min.css": "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css",
+    "vendor/d3/d3.v6.min.js": "https://d3js.org/d3.v6.min.js",
+}
+
+# Already compressed formats aren't worth a .gz/.br next to them.
+COMPRESSIBLE = {".css", ".js", ".json", ".svg", ".html", ".txt", ".map", ".ttf", ".eot", ".otf"}
+
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("font/woff", ".woff")
+mimetypes.add_type("font/ttf", ".ttf")
+
+_CSS_URL_RE = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+
+class MissingAssets(RuntimeError):
+    def __init__(self, missing: List[str], where: str):
+        self.missing = missing
+        super().__init__(f"missing assets in {where}: {', '.join(missing)}")
+
+
+def _local_reference(reference: str) -> bool:
+    return not reference.startswith(("data:", "http:", "https:", "//", "/", "#"))
+
+
+def css_references(css: str, name: str) -> Iterator[Tuple[str, str, str]]:
+    """``(reference, logical target, suffix)`` for each relative ``url()`` in stylesheet ``name``."""
+    for match in _CSS_URL_RE.finditer(css):
+        reference = match.group(2).strip()
+        if not _local_reference(reference):
+            continue
+        path, suffix = re.match(r"([^?#]*)(.*)", reference).groups()
+        yield reference, posixpath.normpath(posixpath.join(posixpath.dirname(name), path)), suffix
+
+
+def rewrite_css(css: str, name: str, manifest: Dict[str, "Asset"]) -> str:
+    """Point the relative ``url()`` references of stylesheet ``name`` at their hashed files."""
+
+    def replace(match):
+        reference = match.group(2).strip()
+        if not _local_reference(reference):
+            return match.group(0)
+        path, suffix = re.match(r"([^?#]*)(.*)", reference).groups()
+        dependency = posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+        if dependency not in manifest:
+            raise MissingAssets([dependency], name)
+        relative = posixpath.relpath(manifest[dependency].path, posixpath.dirname(name) or ".")
+        return f"url({match.group(1)}{relative}{suffix}{match.group(1)})"
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def vendor(source: Path = SOURCE_DIR, fetch: Optional[Callable[[str], bytes]] = None) -> List[str]:
+    """
+    Download the ``VENDOR`` files that aren't in ``source`` yet, plus the fonts and
+    images their stylesheets refer to. Returns the logical names fetched.
+    """
+    fetch = fetch or (lambda url: urllib.request.urlopen(url, timeout=30).read())
+    pending = list(VENDOR.items())
+    fetched = []
+    while pending:
+        name, url = pending.pop()
+        target = source / name
+        if not target.exists():
+            console.log(f"VENDORING:::: {url}")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(fetch(url))
+            fetched.append(name)
+        if target.suffix == ".css":
+            for reference, dependency, _ in css_references(target.read_text("utf-8"), name):
+                pending.append((dependency, urljoin(url, reference.split("?")[0].split("#")[0])))
+    return fetched
+
+
+@dataclass(frozen=True)
+class Asset:
+    path: str  # hashed, relative to the build directory
+    size: int
+    encodings: Tuple[str, ...] = ()
+
+
+def _fingerprint(name: str, body: bytes) -> str:
+    root, extension = posixpath.splitext(name)
+    return f"{root}.{hashlib.blake2b(body, digest_size=5).hexdigest()}{extension}"
+
+
+def _compress(target: Path, body: bytes) -> Tuple[str, ...]:
+    encodings = []
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            target.with_name(target.name + ".br").write_bytes(compressed)
+            encodings.append("br")
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        target.with_name(target.name + ".gz").write_bytes(compressed)
+        encodings.append("gzip")
+    return tuple(encodings)
+
+
+def build(source: Path = SOURCE_DIR, output: Path = BUILD_DIR) -> Dict[str, Asset]:
+    """Fingerprint and precompress everything under ``source`` into ``output``; returns the manifest."""
+    names = sorted(path.relative_to(source).as_posix() for path in source.rglob("*") if path.is_file())
+    missing = sorted(name for name in VENDOR if name not in names)
+    if missing:
+        raise MissingAssets(missing, f"{source} (run the build with --vendor)")
+    if output.exists():
+        shutil.rmtree(output)
+    # Stylesheets go last, so the files they refer to already have their hashed names.
+    names.sort(key=lambda name: name.endswith(".css"))
+    manifest: Dict[str, Asset] = {}
+    for name in names:
+        body = (source / name).read_bytes()
+        if name.endswith(".css"):
+            body = rewrite_css(body.decode("utf-8"), name, manifest).encode("utf-8")
+        hashed = _fingerprint(name, body)
+        target = output / hashed
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(body)
+        compressible = posixpath.splitext(name)[1].lower() in COMPRESSIBLE
+        manifest[name] = Asset(hashed, len(body), _compress(target, body) if compressible else ())
+    (output / MANIFEST_NAME).write_text(
+        json.dumps({name: asdict(asset) for name, asset in manifest.items()}, indent=2)
+    )
+    return manifest
+
+
+def load_manifest(output: Path = BUILD_DIR) -> Dict[str, Asset]:
+    """Read ``manifest.json``; raises ``MissingAssets`` if any file it lists is gone."""
+    entries = json.loads((output / MANIFEST_NAME).read_text())
+    manifest = {
+        name: Asset(entry["path"], entry["size"], tuple(entry["encodings"])) for name, entry in entries.items()
+    }
+    missing = [
+        asset.path + suffix
+        for asset in manifest.values()
+        for suffix in ("", *(".br" if encoding == "br" else ".gz" for encoding in asset.encodings))
+        if not (output / (asset.path + suffix)).is_file()
+    ]
+    if missing:
+        raise MissingAssets(missing, str(output))
+    return manifest
+
+
+_manifest: Optional[Dict[str, Asset]] = None
+_loaded = False
+
+
+def current_manifest() -> Optional[Dict[str, Asset]]:
+    """The manifest in use, or ``None`` when serving the source assets directly."""
+    global _manifest, _loaded
+    if not _loaded:
+        if MODE == "manifest" or (MODE == "auto" and (BUILD_DIR / MANIFEST_NAME).is_file()):
+            if not (BUILD_DIR / MANIFEST_NAME).is_file():
+                raise MissingAssets([MANIFEST_NAME], f"{BUILD_DIR} (run python -m vassar.assets)")
+            _manifest = load_manifest(BUILD_DIR)
+            console.log(f"ASSET_MANIFEST:::: {len(_manifest)} assets from {BUILD_DIR}")
+        _loaded = True
+    return _manifest
+
+
+def asset_url(name: str) -> str:
+    """URL of the logical asset ``name`` (as under ``public/``); raises ``MissingAssets`` if there is none."""
+    manifest = current_manifest()
+    if manifest is not None:
+        if name not in manifest:
+            raise MissingAssets([name], str(BUILD_DIR / MANIFEST_NAME))
+        return f"{PREFIX}/{manifest[name].path}"
+    if (SOURCE_DIR / name).is_file():
+        return f"/{SOURCE_DIR.as_posix()}/{name}"
+    if name in VENDOR:
+        return VENDOR[name]
+    raise MissingAssets([name], str(SOURCE_DIR))
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> Dict[str, float]:
+    """Content codings from an ``Accept-Encoding`` header with their q-values."""
+    accepted = {}
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: Optional[str], available: Tuple[str, ...]) -> Optional[str]:
+    """Brotli over gzip, whichever the client accepts (``*`` counts for both)."""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+@dataclass(frozen=True)
+class _Served:
+    media_type: str
+    etag: str
+    bodies: Dict[Optional[str], bytes]
+
+
+class AssetMiddleware:
+    """
+    Serve the built assets under ``prefix`` from memory with immutable caching; every
+    other request goes on to the app. The build is small (a few MB with the fonts).
+    """
+
+    def __init__(self, app, directory: Path = BUILD_DIR, prefix: str = PREFIX, manifest=None):
+        self.app = app
+        self.prefix = prefix + "/"
+        manifest = manifest if manifest is not None else load_manifest(directory)
+        self.files: Dict[str, _Served] = {}
+        for asset in manifest.values():
+            bodies = {None: (directory / asset.path).read_bytes()}
+            for encoding in asset.encodings:
+                suffix = ".br" if encoding == "br" else ".gz"
+                bodies[encoding] = (directory / (asset.path + suffix)).read_bytes()
+            media_type = mimetypes.guess_type(asset.path)[0] or "application/octet-stream"
+            if media_type.startswith("text/") or media_type.endswith("javascript"):
+                media_type += "; charset=utf-8"
+            etag = '"' + posixpath.splitext(asset.path)[0].rsplit(".", 1)[-1] + '"'
+            self.files[self.prefix + asset.path] = _Served(media_type, etag, bodies)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.prefix):
+            return await self.app(scope, receive, send)
+        served = self.files.get(scope["path"])
+        if served is None or scope["method"] not in ("GET", "HEAD"):
+            status = 404 if served is None else 405
+            await send({"type": "http.response.start", "status": status, "headers": []})
+            return await send({"type": "http.response.body", "body": b""})
+        request_headers = dict(scope["headers"])
+        encoding = choose_encoding(
+            request_headers.get(b"accept-encoding", b"").decode("latin-1"), tuple(served.bodies)
+        )
+        etag = served.etag if encoding is None else served.etag[:-1] + "-" + encoding + '"'
+        headers = [
+            (b"cache-control", CACHE_CONTROL.encode()),
+            (b"vary", b"Accept-Encoding"),
+            (b"etag", etag.encode()),
+        ]
+        if etag.encode() in {tag.strip() for tag in request_headers.get(b"if-none-match", b"").split(b",")}:
+            await send({"type": "http.response.start", "status": 304, "headers": headers})
+            return await send({"type": "http.response.body", "body": b""})
+        body = served.bodies[encoding]
+        headers += [(b"content-type", served.media_type.encode()), (b"content-length", str(len(body)).encode())]
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding.encode()))
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+def asset_routes(app):
+    """
+    Serve the asset build on ``app``. Loading the manifest here makes a missing or
+    incomplete build fail when the app is created rather than on the first page view.
+    """
+    manifest = current_manifest()
+    if manifest is not None:
+        app.add_middleware(AssetMiddleware, directory=BUILD_DIR, prefix=PREFIX, manifest=manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vendor, fingerprint and precompress the static assets.")
+    parser.add_argument("--source", type=Path, default=SOURCE_DIR)
+    parser.add_argument("--output", type=Path, default=BUILD_DIR)
+    parser.add_argument("--vendor", action="store_true", help="download missing third-party assets first")
+    args = parser.parse_args()
+    if args.vendor:
+        vendor(args.source)
+    manifest = build(args.source, args.output)
+    compressed = sum(1 for asset in manifest.values() if asset.encodings)
+    console.log(
+        f"ASSETS_BUILT:::: {len(manifest)} assets ({compressed} precompressed"
+        f"{'' if brotli is not None else ', gzip only: brotli not installed'}) in {args.output}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Flat, columnar encodings of the family tree.
+
+The nested ``/tree`` document repeats ``"id"``, ``"name"`` and ``"children"`` at every
+node, and repeats a child's whole subtree under each of its parents. The columnar form
+has one row per person, in topological order (every parent before its children), as
+parallel columns:
+- ``ids`` and ``names``
+- ``parents``: row of the person's first parent, ``-1`` for a root
+- ``links``: flat ``[child_row, parent_row, ...]`` pairs for every further parent
+
+The binary form packs the same columns into one little-endian buffer the browser can
+view with typed arrays without parsing:
+
+    offset 0                 b"VTR1"
+    offset 4                 uint32  row count n
+    offset 8                 uint32  byte length of the names block
+    offset 12                uint32  link count m
+    offset 16                float64[n]  ids (exact up to 2**53)
+    offset 16 + 8n           int32[n]    parents
+    offset 16 + 12n          int32[2m]   links
+    offset 16 + 12n + 8m     utf-8 names joined by NUL (NUL characters are dropped,
+                             a null name decodes as "")
+"""
+
+import json
+import struct
+import sys
+from array import array
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+MAGIC = b"VTR1"
+HEADER = struct.Struct("<4sIII")
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.vassar.columnar+json"
+BINARY_MEDIA_TYPE = "application/vnd.vassar.columnar"
+
+FORMATS = ("json", "columnar", "binary")
+
+
+@dataclass
+class Columns:
+    ids: List[int] = field(default_factory=list)
+    names: List[str] = field(default_factory=list)
+    parents: List[int] = field(default_factory=list)
+    links: List[int] = field(default_factory=list)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def as_dict(self) -> dict:
+        return {"ids": self.ids, "names": self.names, "parents": self.parents, "links": self.links}
+
+
+def columnar_graph(data) -> Columns:
+    """
+    Build the columns from ``GRAPH_DATA_QUERY`` rows (one row per parent with its
+    ``[person_id, name]`` children) with Kahn's algorithm, so a person is only emitted
+    once all of their parents have rows. People caught in a ``PARENT_OF`` cycle, which
+    a family should never have, are appended at the end.
+    """
+    names = {}
+    children = {}
+    pending = {}
+    for parent_id, parent_name, kids in data.records:
+        names[parent_id] = parent_name
+        children[parent_id] = [child_id for child_id, _ in kids]
+        for child_id, child_name in kids:
+            names[child_id] = child_name
+            pending[child_id] = pending.get(child_id, 0) + 1
+
+    columns = Columns()
+    ids, parents, links = columns.ids, columns.parents, columns.links
+    rows = {}
+    first_parent = {}
+    queue = deque(person_id for person_id in names if person_id not in pending)
+    while True:
+        while queue:
+            person_id = queue.popleft()
+            row = rows[person_id] = len(ids)
+            ids.append(person_id)
+            parents.append(first_parent.get(person_id, -1))
+            for child_id in children.get(person_id, ()):
+                if child_id in first_parent or child_id in rows:
+                    links.append(child_id)  # replaced by the child's row below
+                    links.append(row)
+                else:
+                    first_parent[child_id] = row
+                pending[child_id] -= 1
+                if pending[child_id] == 0:
+                    queue.append(child_id)
+        stuck = [person_id for person_id in names if person_id not in rows]
+        if not stuck:
+            break
+        for person_id in stuck:
+            pending[person_id] = 0
+        queue.extend(stuck)
+
+    for index in range(0, len(links), 2):
+        links[index] = rows[links[index]]
+    columns.names = [names[person_id] for person_id in ids]
+    return columns
+
+
+def encode_columnar(columns: Columns) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(columns.as_dict())
+    return json.dumps(columns.as_dict(), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def encode_binary(columns: Columns) -> bytes:
+    ids = array("d", columns.ids)
+    parents = array("i", columns.parents)
+    links = array("i", columns.links)
+    if sys.byteorder == "big":  # pragma: no cover - the wire format is little-endian
+        for column in (ids, parents, links):
+            column.byteswap()
+    names = "\0".join((name or "").replace("\0", "") for name in columns.names).encode()
+    header = HEADER.pack(MAGIC, len(columns), len(names), len(links) // 2)
+    return b"".join((header, ids.tobytes(), parents.tobytes(), links.tobytes(), names))
+
+
+def decode_binary(body: bytes) -> Columns:
+    magic, count, names_length, link_count = HEADER.unpack_from(body)
+    if magic != MAGIC:
+        raise ValueError("Not a columnar tree buffer")
+    columns = []
+    offset = HEADER.size
+    for typecode, length in (("d", count), ("i", count), ("i", 2 * link_count)):
+        column = array(typecode)
+        column.frombytes(body[offset : offset + column.itemsize * length])
+        if sys.byteorder == "big":  # pragma: no cover
+            column.byteswap()
+        offset += column.itemsize * length
+        columns.append(column)
+    ids, parents, links = columns
+    names = body[offset : offset + names_length].decode().split("\0") if count else []
+    return Columns([int(person_id) for person_id in ids], names, parents.tolist(), links.tolist())
+
+
+def negotiate_format(format: Optional[str], accept: Optional[str]) -> str:
+    """Pick ``json``, ``columnar`` or ``binary`` from ``?format=`` first, then ``Accept``."""
+    if format:
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format {format!r}; expected one of {', '.join(FORMATS)}")
+        return format
+    media_types = {part.split(";")[0].strip() for part in (accept or "").split(",")}
+    if BINARY_MEDIA_TYPE in media_types or "application/octet-stream" in media_types:
+        return "binary"
+    if COLUMNAR_MEDIA_TYPE in media_types:
+        return "columnar"
+    return "json"
@@ -8,16 +8,20 @@ from fasthtml.components import (
     Div,
 )
 
+from vassar.assets import asset_url
+
+TREE_PAGE_PATH = "/family-tree"
+
 def page_header():
     return Head(
         Link(
             rel="stylesheet",
-            href="https://cdnjs.cloudflare.com/ajax/libs/tachyons/4.11.1/tachyons.min.css",
+            href=asset_url("vendor/tachyons/tachyons.min.css"),
             type="text/css",
         ),
         Link(
             rel="stylesheet",
-            href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css",
+            href=asset_url("vendor/font-awesome/css/all.min.css"),
         )
     )
 
@@ -29,7 +33,7 @@ def page_nav():
         ),
         Div(
             A("History", href="/history", cls="link dim light-gray f6 f5-ns dib mr3 common-font"),
-            A("Genealogical Map", href="/", cls="link dim light-gray f6 f5-ns dib mr3 common-font"),
+            A("Genealogical Map", href=TREE_PAGE_PATH, cls="link dim light-gray f6 f5-ns dib mr3 common-font"),
             A("Vassar Sisters", href="/", cls="link dim light-gray f6 f5-ns dib mr3 common-font"),
             cls="flex"
         ),
@@ -5,10 +5,20 @@ The following environment variables must be set:
 - NEO4J_URI: The URI of the Neo4j database
 - NEO4J_USER: The username for the Neo4j database
 - NEO4J_PASSWORD: The password for the Neo4j database
+
+Connection pooling can be tuned with:
+- NEO4J_MAX_POOL_SIZE: Maximum connections per server (default 100)
+- NEO4J_MAX_CONNECTION_LIFETIME: Seconds before a pooled connection is retired (default 3600)
+- NEO4J_CONNECTION_ACQUISITION_TIMEOUT: Seconds to wait for a free connection (default 60)
+
+The web app shares one sync and one async driver per process (see ``lifespan``); use
+``shared_driver``/``shared_async_driver`` instead of building a driver per request.
 """
 
-import json
 import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Callable, List, Optional
 
 from neo4j import (
     AsyncGraphDatabase,
@@ -16,9 +26,11 @@ from neo4j import (
     Driver,
     AsyncDriver,
     EagerResult,
+    Query,
 )
 
-from crud import console
+from vassar.metrics import log_query, query_metrics, register_collector
+from vassar.queries import async_warm_plan_cache, get_query
 
 
 # /path/to/project/.envrc
@@ -33,101 +45,172 @@ from crud import console
 # $ direnv edit
 
 
+def pool_config() -> dict:
+    return dict(
+        max_connection_pool_size=int(os.getenv("NEO4J_MAX_POOL_SIZE", "100")),
+        max_connection_lifetime=float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600")),
+        connection_acquisition_timeout=float(
+            os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "60")
+        ),
+    )
+
+
 def get_driver(database: str = None) -> Driver:
     database = database or os.getenv("NEO4J_DATABASE")
     uri = os.getenv("NEO4J_URI")
     auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-    return GraphDatabase.driver(uri=uri, auth=auth, database=database)
+    return GraphDatabase.driver(uri=uri, auth=auth, database=database, **pool_config())
 
 
 def get_async_driver(database: str = None) -> AsyncDriver:
     database = database or os.getenv("NEO4J_DATABASE")
     uri = os.getenv("NEO4J_URI")
     auth = (os.getenv("NEO4J_USER"), os.getenv("NEO4J_PASSWORD"))
-    return AsyncGraphDatabase.driver(uri=uri, auth=auth, database=database)
+    return AsyncGraphDatabase.driver(uri=uri, auth=auth, database=database, **pool_config())
+
+
+_shared_driver: Optional[Driver] = None
+_shared_async_driver: Optional[AsyncDriver] = None
+
+
+def shared_driver() -> Driver:
+    global _shared_driver
+    if _shared_driver is None:
+        _shared_driver = get_driver()
+    return _shared_driver
+
+
+def shared_async_driver() -> AsyncDriver:
+    global _shared_async_driver
+    if _shared_async_driver is None:
+        _shared_async_driver = get_async_driver()
+    return _shared_async_driver
+
+
+def install_drivers(driver: Optional[Driver] = None, async_driver: Optional[AsyncDriver] = None) -> None:
+    """Use ``driver``/``async_driver`` as the shared drivers, e.g. the benchmark stand-ins."""
+    global _shared_driver, _shared_async_driver
+    _shared_driver = driver
+    _shared_async_driver = async_driver
+
+
+def close_driver() -> None:
+    global _shared_driver
+    if _shared_driver is not None:
+        _shared_driver.close()
+        _shared_driver = None
+
+
+async def close_drivers() -> None:
+    global _shared_async_driver
+    close_driver()
+    if _shared_async_driver is not None:
+        await _shared_async_driver.close()
+        _shared_async_driver = None
+
+
+_lifespan_hooks: List[Callable] = []
 
 
-def query(driver: Driver, query: str) -> EagerResult:
-    console.log(f"EXECUTING_QUERY:::: {query}")
-    records = driver.execute_query(query)
+def register_lifespan(hook: Callable) -> None:
+    """Add an async context manager factory, called with the app, that runs inside ``lifespan``."""
+    _lifespan_hooks.append(hook)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    shared_driver()
+    await async_warm_plan_cache(shared_async_driver())
+    try:
+        async with AsyncExitStack() as stack:
+            for hook in _lifespan_hooks:
+                await stack.enter_async_context(hook(app))
+            yield
+    finally:
+        await close_drivers()
+
+
+def _pool_stats(driver) -> Optional[dict]:
+    # The driver has no public pool API; read the pool's connection table directly.
+    # Stand-in drivers (see install_drivers) have no pool.
+    pool = getattr(driver, "_pool", None)
+    if pool is None:
+        return None
+    stats = {}
+    for address, connections in list(pool.connections.items()):
+        in_use = sum(1 for connection in list(connections) if connection.in_use)
+        stats[str(address)] = dict(in_use=in_use, idle=len(connections) - in_use)
+    return dict(max_size=pool.pool_config.max_connection_pool_size, servers=stats)
+
+
+def pool_stats() -> dict:
+    return {
+        "sync": _pool_stats(_shared_driver),
+        "async": _pool_stats(_shared_async_driver),
+    }
+
+
+def _pool_metrics():
+    yield "# HELP vassar_neo4j_pool_connections Pooled Neo4j connections by state."
+    yield "# TYPE vassar_neo4j_pool_connections gauge"
+    for kind, stats in pool_stats().items():
+        for server, counts in (stats or {}).get("servers", {}).items():
+            for state in ("in_use", "idle"):
+                yield (
+                    f'vassar_neo4j_pool_connections{{driver="{kind}",server="{server}",state="{state}"}} '
+                    f"{counts[state]}"
+                )
+
+
+register_collector(_pool_metrics)
+
+
+def _with_timeout(query: str, timeout: Optional[float]):
+    return Query(query, timeout=timeout) if timeout else query
+
+
+def query(
+    driver: Driver,
+    query: str,
+    parameters: Optional[dict] = None,
+    timeout: Optional[float] = None,
+    **kwargs,
+) -> EagerResult:
+    log_query(query)
+    started = time.perf_counter()
+    try:
+        records = driver.execute_query(_with_timeout(query, timeout), parameters, **kwargs)
+    except Exception:
+        query_metrics.record(query, time.perf_counter() - started, error=True)
+        raise
+    query_metrics.record(query, time.perf_counter() - started, records)
     return records
 
 
-async def async_query(driver: AsyncDriver, query: str) -> EagerResult:
-    console.log(f"EXECUTING_QUERY:::: {query}")
-    results = await driver.execute_query(query)
+async def async_query(
+    driver: AsyncDriver,
+    query: str,
+    parameters: Optional[dict] = None,
+    timeout: Optional[float] = None,
+    **kwargs,
+) -> EagerResult:
+    log_query(query)
+    started = time.perf_counter()
+    try:
+        results = await driver.execute_query(_with_timeout(query, timeout), parameters, **kwargs)
+    except Exception:
+        query_metrics.record(query, time.perf_counter() - started, error=True)
+        raise
+    query_metrics.record(query, time.perf_counter() - started, results)
     return results
 
 
-SCHEMA_QUERY = """
-CALL db.schema.nodeTypeProperties() 
-YIELD nodeType, nodeLabels, propertyName, propertyTypes, mandatory 
-RETURN collect({
-    type: nodeType,
-    labels: nodeLabels,
-    name: propertyName,
-    type: propertyTypes,
-    mandatory: mandatory
-}) AS schema
-"""
-
-NODE_QUERY = """
-CALL db.schema.nodeTypeProperties() 
-YIELD nodeType, nodeLabels, propertyName, propertyTypes, mandatory 
-RETURN collect({
-    type: nodeType,
-    labels: nodeLabels,
-    name: propertyName,
-    type: propertyTypes,
-    mandatory: mandatory
-}) AS nodes_schema
-"""
+def named_query(driver: Driver, name: str, parameters: Optional[dict] = None, **kwargs) -> EagerResult:
+    return query(driver, get_query(name).text, parameters, **kwargs)
 
-RELATIONSHIP_QUERY = """
-MATCH ()-[r]->() 
-RETURN type(r) AS relationship_type, keys(r) AS properties 
-LIMIT 100  // Adjust as needed to avoid performance issue
-"""
 
+async def async_named_query(
+    driver: AsyncDriver, name: str, parameters: Optional[dict] = None, **kwargs
+) -> EagerResult:
+    return await async_query(driver, get_query(name).text, parameters, **kwargs)
 
-def database_schema():
-    driver = get_driver()
-    node_result = query(driver, NODE_QUERY)
-    relationship_result = query(driver, RELATIONSHIP_QUERY)
-    nodes = node_result.records[0][0]
-    relationships = relationship_result.records[0][0]
-    schema = dict(nodes=nodes, relationships=relationships)
-    schema_json = json.dumps(schema, indent=4)
-    return schema_json
-
-
-async def async_database_schema():
-    driver = get_async_driver()
-    node_result = await query(driver, NODE_QUERY)
-    relationship_result = await query(driver, RELATIONSHIP_QUERY)
-    nodes = node_result.records[0][0]
-    relationships = relationship_result.records[0][0]
-    schema = dict(nodes=nodes, relationships=relationships)
-    schema_json = json.dumps(schema, indent=4)
-    return schema_json
-
-
-# def database_schema():
-#     driver = get_driver()
-#     result = query(
-#         driver,
-#         SCHEMA_QUERY,
-#     )
-#     schema = result.records[0][0]
-#     schema_json = json.dumps(schema, indent=4)
-#     return schema_json
-
-# async def async_database_schema():
-#     driver = get_async_driver()
-#     result = await async_query(
-#         driver,
-#         SCHEMA_QUERY,
-#     )
-#     schema = result.records[0][0]
-#     schema_json = json.dumps(schema, indent=4)
-#     return schema_json
@@ -0,0 +1,196 @@
+"""
+Server-sent events for live family-tree updates at /tree/events.
+
+One ``Broadcaster`` per process fans the graph cache's change events out to every open
+viewer. While anyone is connected it keeps the snapshot fresh with one change poll per
+refresh interval (or just listens when ``VASSAR_GRAPH_CACHE`` already runs the
+background refresh), so a few hundred viewers cost the same single poll as one. Each
+refresh is encoded once into a ``changes`` message, a JSON list of compact events:
+
+    {"op": "node_added", "id": 42, "name": "Ada"}
+    {"op": "node_updated", "id": 42, "name": "Ada Lovelace"}
+    {"op": "edge_added", "parent": 7, "child": 42}
+    {"op": "edge_removed", "parent": 7, "child": 42}
+
+Every client has a bounded queue. A client that falls behind (a slow connection, a
+background tab) has its backlog dropped and replaced by a single ``resync`` message,
+telling it to refetch what it shows, so one slow reader never holds up the others or
+grows memory. ``resync`` is also sent after a full snapshot reload and to clients that
+reconnect with a ``Last-Event-ID`` from before a gap.
+
+The following environment variables are optional:
+- VASSAR_EVENTS_QUEUE_SIZE: Messages buffered per client before it is resynced (default 32)
+- VASSAR_EVENTS_HEARTBEAT_SECONDS: Seconds between keep-alive comments on idle streams (default 15)
+- VASSAR_EVENTS_MAX_CLIENTS: Open streams per process; more get a 503 (default 1000)
+"""
+
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional, Set
+
+from starlette.responses import JSONResponse, StreamingResponse
+
+from vassar.database import register_lifespan, shared_async_driver
+from vassar.graphcache import GraphCache, graph_cache
+from vassar.metrics import register_collector
+
+logger = logging.getLogger("vassar.events")
+
+QUEUE_SIZE = int(os.getenv("VASSAR_EVENTS_QUEUE_SIZE", "32"))
+HEARTBEAT_SECONDS = float(os.getenv("VASSAR_EVENTS_HEARTBEAT_SECONDS", "15"))
+MAX_CLIENTS = int(os.getenv("VASSAR_EVENTS_MAX_CLIENTS", "1000"))
+
+RESYNC = "event: resync\ndata: {}\n\n"
+KEEP_ALIVE = ": keep-alive\n\n"
+_CLOSE = None
+
+
+def encode_changes(sequence: int, events: List[dict]) -> str:
+    return f"id: {sequence}\nevent: changes\ndata: {json.dumps(events, separators=(',', ':'))}\n\n"
+
+
+class Subscriber:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.resyncs = 0
+
+    def offer(self, message: Optional[str]) -> None:
+        """Queue ``message`` without waiting; a full queue is swapped for one ``resync``."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_CLOSE if message is _CLOSE else RESYNC)
+            self.resyncs += 1
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        cache: GraphCache = graph_cache,
+        queue_size: int = QUEUE_SIZE,
+        heartbeat_seconds: float = HEARTBEAT_SECONDS,
+        max_clients: int = MAX_CLIENTS,
+    ):
+        self.cache = cache
+        self.queue_size = queue_size
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_clients = max_clients
+        self.subscribers: Set[Subscriber] = set()
+        self.sequence = 0
+        self.stats = dict(messages=0, events=0, resyncs=0, polls=0, poll_errors=0)
+        self._poller: Optional[asyncio.Task] = None
+
+    def publish(self, events: List[dict]) -> None:
+        """Graph cache listener: encode one refresh's events once and offer them to everyone."""
+        self.sequence += 1
+        if events == [dict(op="resync")]:
+            message = RESYNC
+        else:
+            message = encode_changes(self.sequence, events)
+            self.stats["events"] += len(events)
+        self.stats["messages"] += 1
+        for subscriber in list(self.subscribers):
+            before = subscriber.resyncs
+            subscriber.offer(message)
+            self.stats["resyncs"] += subscriber.resyncs - before
+
+    def join(self, last_event_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(self.queue_size)
+        if last_event_id is not None and last_event_id != str(self.sequence):
+            subscriber.offer(RESYNC)
+        if not self.subscribers:
+            self.cache.subscribe(self.publish)
+        self.subscribers.add(subscriber)
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        return subscriber
+
+    def leave(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+        if not self.subscribers:
+            self.cache.unsubscribe(self.publish)
+
+    async def _poll(self) -> None:
+        # Runs only while someone listens; the graph cache's own task makes it redundant.
+        driver = shared_async_driver()
+        while self.subscribers:
+            if self.cache.live is None:
+                try:
+                    await self.cache.current(driver)
+                    self.stats["polls"] += 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    self.stats["poll_errors"] += 1
+                    logger.warning("Change poll for /tree/events failed: %s", exc)
+            await asyncio.sleep(self.cache.refresh_seconds)
+
+    async def stream(self, subscriber: Subscriber):
+        try:
+            yield f"retry: {int(self.cache.refresh_seconds * 1000)}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield KEEP_ALIVE
+                    continue
+                if message is _CLOSE:
+                    return
+                yield message
+        finally:
+            self.leave(subscriber)
+
+    def respond(self, request):
+        if len(self.subscribers) >= self.max_clients:
+            return JSONResponse({"error": "too many event streams"}, status_code=503, headers={"Retry-After": "30"})
+        subscriber = self.join(request.headers.get("last-event-id"))
+        return StreamingResponse(
+            self.stream(subscriber),
+            media_type="text/event-stream",
+            # X-Accel-Buffering: stop nginx from holding events back in its buffer.
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    async def close(self) -> None:
+        for subscriber in list(self.subscribers):
+            subscriber.offer(_CLOSE)
+        if self._poller is not None:
+            self._poller.cancel()
+            try:
+                await self._poller
+            except asyncio.CancelledError:
+                pass
+            self._poller = None
+
+    def metrics(self) -> List[str]:
+        lines = [
+            "# HELP vassar_events_subscribers Open /tree/events streams.",
+            "# TYPE vassar_events_subscribers gauge",
+            f"vassar_events_subscribers {len(self.subscribers)}",
+            "# HELP vassar_events_total Change stream counters: messages and events published, "
+            "clients resynced after falling behind, change polls.",
+            "# TYPE vassar_events_total counter",
+        ]
+        for kind, count in self.stats.items():
+            lines.append(f'vassar_events_total{{kind="{kind}"}} {count}')
+        return lines
+
+
+broadcaster = Broadcaster()
+register_collector(broadcaster.metrics)
+
+
+@asynccontextmanager
+async def events_lifespan(app):
+    try:
+        yield
+    finally:
+        await broadcaster.close()
+
+
+register_lifespan(events_lifespan)
@@ -0,0 +1,551 @@
+"""
+In-memory snapshot of the genealogy: every Person and PARENT_OF edge in compact,
+array-backed CSR adjacency for both directions, with a person_id <-> index map.
+
+The snapshot is immutable. ``GraphCache.refresh`` polls ``GRAPH_VERSION_QUERY``. When
+the graph changed, it pulls only the people whose ``updated_at`` is at or past the
+watermark (with their current parents and children) and patches a new snapshot.
+``timestamp()`` stamps a write with the time its statement started, so a transaction
+can commit after a poll with a stamp older than that poll. The watermark is therefore
+the server's clock at the previous poll minus ``VASSAR_GRAPH_CACHE_OVERLAP_SECONDS``:
+people stamped inside that window are polled again until it has passed, and rows the
+snapshot already holds are dropped. A write transaction that stays open longer than
+the overlap can still be missed. It falls back to a full reload when the delta can't
+explain the change: deleted people or edges, writers that don't stamp ``updated_at``,
+or a bumped ``GraphVersion``. New
+snapshots are built in a worker thread and published with a single attribute
+assignment, so readers never block and never see a half-built snapshot. Reads can lag
+the database by up to one refresh interval.
+
+``cached_named_query`` answers the genealogy queries the tree routes use from the
+snapshot while the background task keeps one fresh, and from Neo4j otherwise. Readers
+that always need a snapshot (kinship) use ``GraphCache.current``. Listeners added with
+``GraphCache.subscribe`` get the change events of every refresh (see
+``Snapshot.change_events``), or a single ``resync`` after a full reload.
+
+The following environment variables are optional:
+- VASSAR_GRAPH_CACHE: Set to 1 to load the snapshot at startup and serve genealogy reads from memory (default off)
+- VASSAR_GRAPH_CACHE_REFRESH_SECONDS: Seconds between change polls (default 5)
+- VASSAR_GRAPH_CACHE_MAX_DELTA: Share of people changed above which a full reload is cheaper (default 0.1)
+- VASSAR_GRAPH_CACHE_OVERLAP_SECONDS: How long a write transaction may stay open and still be seen (default 30)
+"""
+
+import asyncio
+import copy
+import logging
+import os
+import time
+from array import array
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from neo4j import AsyncDriver, Driver
+
+from vassar.database import async_named_query, named_query, register_lifespan, shared_async_driver
+from vassar.metrics import register_collector
+
+logger = logging.getLogger("vassar.graphcache")
+
+ENABLED = os.getenv("VASSAR_GRAPH_CACHE", "").lower() in ("1", "true", "yes")
+REFRESH_SECONDS = float(os.getenv("VASSAR_GRAPH_CACHE_REFRESH_SECONDS", "5"))
+MAX_DELTA = float(os.getenv("VASSAR_GRAPH_CACHE_MAX_DELTA", "0.1"))
+OVERLAP_SECONDS = float(os.getenv("VASSAR_GRAPH_CACHE_OVERLAP_SECONDS", "30"))
+
+
+def _csr(size: int, sources: Sequence[int], targets: Sequence[int]) -> Tuple[array, array]:
+    """Counting sort of ``(source, target)`` pairs into ``offsets``/``targets`` arrays."""
+    offsets = array("q", bytes(8 * (size + 1)))
+    for source in sources:
+        offsets[source + 1] += 1
+    for node in range(size):
+        offsets[node + 1] += offsets[node]
+    cursor = offsets.tolist()
+    ordered = array("q", bytes(8 * len(targets)))
+    for source, target in zip(sources, targets):
+        ordered[cursor[source]] = target
+        cursor[source] += 1
+    return offsets, ordered
+
+
+def _patch_csr(offsets: array, targets: array, size: int, patch: Dict[int, List[int]]) -> Tuple[array, array]:
+    """
+    Copy a CSR structure, replacing the rows in ``patch`` and growing it to ``size``
+    rows. Untouched runs of rows are copied as array slices.
+    """
+    old_size = len(offsets) - 1
+    new_offsets = array("q", [0])
+    new_targets = array("q")
+    position = 0
+    for node in sorted(patch) + [size]:
+        stop = min(node, old_size)
+        if position < stop:
+            base = offsets[position]
+            moved = len(new_targets) - base
+            new_targets.extend(targets[base : offsets[stop]])
+            new_offsets.extend([offset + moved for offset in offsets[position + 1 : stop + 1]])
+            position = stop
+        while position < node:  # people added since the last load, without edges
+            new_offsets.append(len(new_targets))
+            position += 1
+        if node < size:
+            new_targets.extend(patch[node])
+            new_offsets.append(len(new_targets))
+            position = node + 1
+    return new_offsets, new_targets
+
+
+class Snapshot:
+    """One immutable, consistent view of the genealogy. Indexes are dense row numbers."""
+
+    def __init__(
+        self,
+        ids: array,
+        names: List[str],
+        child_offsets: array,
+        child_targets: array,
+        parent_offsets: array,
+        parent_targets: array,
+        version: tuple = (),
+        watermark=None,
+    ):
+        self.ids = ids
+        self.names = names
+        self.index: Dict[int, int] = {person_id: row for row, person_id in enumerate(ids)}
+        self.child_offsets = child_offsets
+        self.child_targets = child_targets
+        self.parent_offsets = parent_offsets
+        self.parent_targets = parent_targets
+        self.version = version
+        self.watermark = watermark
+        self.loaded_at = time.time()
+        self._roots: Optional[List[int]] = None
+
+    @classmethod
+    def build(cls, people: Iterable, edges: Iterable, version: tuple = (), watermark=None) -> "Snapshot":
+        ids = array("q")
+        names = []
+        for person_id, name in people:
+            ids.append(person_id)
+            names.append(name)
+        index = {person_id: row for row, person_id in enumerate(ids)}
+        sources, targets = array("q"), array("q")
+        for parent_id, child_id in edges:
+            sources.append(index[parent_id])
+            targets.append(index[child_id])
+        child_offsets, child_targets = _csr(len(ids), sources, targets)
+        parent_offsets, parent_targets = _csr(len(ids), targets, sources)
+        return cls(ids, names, child_offsets, child_targets, parent_offsets, parent_targets, version, watermark)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edges(self) -> int:
+        return len(self.child_targets)
+
+    def children(self, row: int) -> array:
+        return self.child_targets[self.child_offsets[row] : self.child_offsets[row + 1]]
+
+    def parents(self, row: int) -> array:
+        return self.parent_targets[self.parent_offsets[row] : self.parent_offsets[row + 1]]
+
+    def has_children(self, row: int) -> bool:
+        return self.child_offsets[row + 1] > self.child_offsets[row]
+
+    def has_parents(self, row: int) -> bool:
+        return self.parent_offsets[row + 1] > self.parent_offsets[row]
+
+    def _walk(self, person_id: int, depth: Optional[int], step) -> List[int]:
+        start = self.index.get(person_id)
+        if start is None:
+            return []
+        seen = {start}
+        frontier = [start]
+        found = []
+        level = 0
+        while frontier and (depth is None or level < depth):
+            level += 1
+            next_frontier = []
+            for row in frontier:
+                for relative in step(row):
+                    if relative not in seen:
+                        seen.add(relative)
+                        next_frontier.append(relative)
+            found.extend(next_frontier)
+            frontier = next_frontier
+        return [self.ids[row] for row in found]
+
+    def descendants(self, person_id: int, depth: Optional[int] = None) -> List[int]:
+        """person_ids of everyone below ``person_id``, generation by generation."""
+        return self._walk(person_id, depth, self.children)
+
+    def ancestors(self, person_id: int, depth: Optional[int] = None) -> List[int]:
+        """person_ids of everyone above ``person_id``, generation by generation."""
+        return self._walk(person_id, depth, self.parents)
+
+    def roots(self) -> List[int]:
+        """Rows of people with children but no parents, ordered by person_id."""
+        if self._roots is None:
+            roots = [row for row in range(len(self.ids)) if self.has_children(row) and not self.has_parents(row)]
+            self._roots = sorted(roots, key=self.ids.__getitem__)
+        return self._roots
+
+    def graph_data(self) -> List[tuple]:
+        """Rows shaped like ``GRAPH_DATA_QUERY``: ``(id, name, [[child_id, child_name], ...])``."""
+        ids, names = self.ids, self.names
+        return [
+            (ids[row], names[row], [[ids[child], names[child]] for child in self.children(row)])
+            for row in range(len(ids))
+            if self.has_children(row)
+        ]
+
+    def _relatives(self, parameters: dict, step) -> List[tuple]:
+        ids, names = self.ids, self.names
+        rows = []
+        for person_id in parameters["ids"]:
+            row = self.index.get(person_id)
+            if row is not None:
+                rows.append((person_id, [[ids[other], names[other]] for other in step(row)]))
+        return rows
+
+    def _flags(self, parameters: dict, test) -> List[tuple]:
+        return [
+            (person_id, test(self.index[person_id])) for person_id in parameters["ids"] if person_id in self.index
+        ]
+
+    def run(self, name: str, parameters: Optional[dict] = None):
+        """Answer a named genealogy query from memory, with records shaped like Neo4j's."""
+        parameters = parameters or {}
+        if name == "GRAPH_DATA_QUERY":
+            records = self.graph_data()
+        elif name == "CHILDREN_OF_QUERY":
+            records = self._relatives(parameters, self.children)
+        elif name == "PARENTS_OF_QUERY":
+            records = self._relatives(parameters, self.parents)
+        elif name == "HAS_CHILDREN_QUERY":
+            records = self._flags(parameters, self.has_children)
+        elif name == "HAS_PARENTS_QUERY":
+            records = self._flags(parameters, self.has_parents)
+        elif name == "PERSON_NAME_QUERY":
+            row = self.index.get(parameters["person_id"])
+            records = [] if row is None else [(self.names[row],)]
+        elif name == "ROOT_PEOPLE_QUERY":
+            page = self.roots()[parameters["skip"] : parameters["skip"] + parameters["limit"]]
+            records = [(self.ids[row], self.names[row]) for row in page]
+        else:
+            raise KeyError(f"{name} is not served from the graph cache")
+        return SimpleNamespace(records=records)
+
+    def change_events(self, changed: Sequence) -> List[dict]:
+        """
+        Compact events describing ``CHANGED_PEOPLE_QUERY`` rows relative to this snapshot:
+        ``node_added``/``node_updated`` with the name, then ``edge_added``/``edge_removed``
+        with ``parent`` and ``child`` person_ids, each edge once.
+        """
+        nodes, added, removed = [], set(), set()
+        for person_id, name, children, parents in changed:
+            row = self.index.get(person_id)
+            if row is None:
+                nodes.append(dict(op="node_added", id=person_id, name=name))
+                old_children, old_parents = set(), set()
+            else:
+                if self.names[row] != name:
+                    nodes.append(dict(op="node_updated", id=person_id, name=name))
+                old_children = {self.ids[child] for child in self.children(row)}
+                old_parents = {self.ids[parent] for parent in self.parents(row)}
+            for new, old, edge in (
+                (set(children), old_children, lambda child: (person_id, child)),
+                (set(parents), old_parents, lambda parent: (parent, person_id)),
+            ):
+                added.update(edge(relative) for relative in new - old)
+                removed.update(edge(relative) for relative in old - new)
+        return (
+            nodes
+            + [dict(op="edge_added", parent=parent, child=child) for parent, child in sorted(added)]
+            + [dict(op="edge_removed", parent=parent, child=child) for parent, child in sorted(removed)]
+        )
+
+    def holds(self, change: Sequence) -> bool:
+        """Whether a ``CHANGED_PEOPLE_QUERY`` row already matches this snapshot."""
+        person_id, name, children, parents = change
+        row = self.index.get(person_id)
+        return (
+            row is not None
+            and self.names[row] == name
+            and set(children) == {self.ids[child] for child in self.children(row)}
+            and set(parents) == {self.ids[parent] for parent in self.parents(row)}
+        )
+
+    def with_version(self, version: tuple, watermark) -> "Snapshot":
+        """This snapshot's data under a newer version and watermark, sharing every array."""
+        snapshot = copy.copy(self)
+        snapshot.version = version
+        snapshot.watermark = watermark
+        return snapshot
+
+    def apply(self, changed: Sequence, version: tuple, watermark) -> Optional["Snapshot"]:
+        """
+        A new snapshot with ``CHANGED_PEOPLE_QUERY`` rows applied, or ``None`` when a row
+        refers to someone this snapshot has never seen (a full reload is needed then).
+        """
+        ids = array("q", self.ids)
+        names = list(self.names)
+        index = dict(self.index)
+        for person_id, name, _, _ in changed:
+            if person_id in index:
+                names[index[person_id]] = name
+            else:
+                index[person_id] = len(ids)
+                ids.append(person_id)
+                names.append(name)
+
+        old_size = len(self.ids)
+        child_patch: Dict[int, List[int]] = {}
+        parent_patch: Dict[int, List[int]] = {}
+
+        def current(patch, row, step):
+            if row in patch:
+                return patch[row]
+            return list(step(row)) if row < old_size else []
+
+        def relink(patch, step, row, other, add):
+            relatives = current(patch, other, step)
+            if add and row not in relatives:
+                patch[other] = relatives + [row]
+            elif not add and row in relatives:
+                patch[other] = [relative for relative in relatives if relative != row]
+
+        try:
+            for person_id, _, children, parents in changed:
+                row = index[person_id]
+                for patch, mirror, step, mirror_step, relatives in (
+                    (child_patch, parent_patch, self.children, self.parents, children),
+                    (parent_patch, child_patch, self.parents, self.children, parents),
+                ):
+                    new = [index[relative] for relative in relatives]
+                    old = current(patch, row, step)
+                    patch[row] = new
+                    for other in set(old) - set(new):
+                        relink(mirror, mirror_step, row, other, add=False)
+                    for other in set(new) - set(old):
+                        relink(mirror, mirror_step, row, other, add=True)
+        except KeyError:
+            return None
+
+        size = len(ids)
+        child_offsets, child_targets = _patch_csr(self.child_offsets, self.child_targets, size, child_patch)
+        parent_offsets, parent_targets = _patch_csr(self.parent_offsets, self.parent_targets, size, parent_patch)
+        return Snapshot(
+            ids, names, child_offsets, child_targets, parent_offsets, parent_targets, version, watermark
+        )
+
+
+def graph_version_of(record) -> tuple:
+    """The version in a ``GRAPH_VERSION_QUERY`` record: ``(people, edges, version, updated_at)``."""
+    return (record["people"], record["edges"], record["version"], record["updated_at"])
+
+
+def settled_before(record, overlap_seconds: float = OVERLAP_SECONDS) -> int:
+    """The stamp below which every write had committed when ``record`` was read."""
+    return record["now"] - int(overlap_seconds * 1000)
+
+
+def load_snapshot(driver: Driver) -> Snapshot:
+    """Full synchronous load, for scripts and the CLI."""
+    record = named_query(driver, "GRAPH_VERSION_QUERY").records[0]
+    people = named_query(driver, "GRAPH_PEOPLE_QUERY").records
+    edges = named_query(driver, "GRAPH_EDGES_QUERY").records
+    return Snapshot.build(people, edges, graph_version_of(record), settled_before(record))
+
+
+class GraphCache:
+    def __init__(
+        self,
+        refresh_seconds: float = REFRESH_SECONDS,
+        max_delta: float = MAX_DELTA,
+        overlap_seconds: float = OVERLAP_SECONDS,
+    ):
+        self.snapshot: Optional[Snapshot] = None
+        self.refresh_seconds = refresh_seconds
+        self.max_delta = max_delta
+        self.overlap_seconds = overlap_seconds
+        self.stats = dict(full=0, incremental=0, unchanged=0, errors=0)
+        self._task: Optional[asyncio.Task] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[List[dict]], None]] = []
+
+    def subscribe(self, listener: Callable[[List[dict]], None]) -> None:
+        """Call ``listener`` with the change events of every refresh that changed the graph."""
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[List[dict]], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _publish(self, events: List[dict]) -> None:
+        for listener in list(self._listeners):
+            try:
+                listener(events)
+            except Exception as exc:
+                logger.warning("Graph change listener failed: %s", exc)
+
+    @property
+    def live(self) -> Optional[Snapshot]:
+        """The snapshot, if the background task is keeping it fresh; routes fall back to Neo4j otherwise."""
+        if self._task is None or self._task.done():
+            return None
+        return self.snapshot
+
+    async def current(self, driver: AsyncDriver) -> Snapshot:
+        """
+        The snapshot for readers that need one regardless, loaded on first use. Without the
+        background task it is refreshed on access once per refresh interval.
+        """
+        if self.snapshot is not None and (
+            self.live is not None or time.monotonic() - self._checked_at < self.refresh_seconds
+        ):
+            return self.snapshot
+        async with self._lock:
+            if self.snapshot is None or time.monotonic() - self._checked_at >= self.refresh_seconds:
+                await self.refresh(driver)
+            return self.snapshot
+
+    async def load(self, driver: AsyncDriver) -> Snapshot:
+        # Read the version first: anything written while loading is picked up again next poll.
+        record = (await async_named_query(driver, "GRAPH_VERSION_QUERY")).records[0]
+        people = (await async_named_query(driver, "GRAPH_PEOPLE_QUERY")).records
+        edges = (await async_named_query(driver, "GRAPH_EDGES_QUERY")).records
+        version, watermark = graph_version_of(record), settled_before(record, self.overlap_seconds)
+        loop = asyncio.get_running_loop()
+        snapshot = await loop.run_in_executor(None, Snapshot.build, people, edges, version, watermark)
+        previous, self.snapshot = self.snapshot, snapshot
+        self.stats["full"] += 1
+        logger.info("Loaded graph snapshot: %d people, %d edges", len(snapshot), snapshot.edges)
+        if previous is not None:
+            # A reload can't say what changed; listeners start over from the new snapshot.
+            self._publish([dict(op="resync")])
+        return snapshot
+
+    async def refresh(self, driver: AsyncDriver) -> Snapshot:
+        self._checked_at = time.monotonic()
+        snapshot = self.snapshot
+        if snapshot is None:
+            return await self.load(driver)
+        record = (await async_named_query(driver, "GRAPH_VERSION_QUERY")).records[0]
+        version = graph_version_of(record)
+        people, edges, counter, latest = version
+        # Unchanged only once every stamp is older than the watermark: a newer one may belong
+        # to a write that committed after the last poll without moving the version.
+        if version == snapshot.version and (latest is None or latest < snapshot.watermark):
+            self.stats["unchanged"] += 1
+            return snapshot
+        # Without stamps, or after an explicit GraphVersion bump, only a reload is safe.
+        if latest is None or counter != snapshot.version[2]:
+            return await self.load(driver)
+        watermark = max(snapshot.watermark, settled_before(record, self.overlap_seconds))
+        polled = (await async_named_query(driver, "CHANGED_PEOPLE_QUERY", {"since": snapshot.watermark})).records
+        changed = [row for row in polled if not snapshot.holds(row)]
+        if len(changed) > self.max_delta * max(len(snapshot), 1):
+            return await self.load(driver)
+        if changed:
+            loop = asyncio.get_running_loop()
+            updated = await loop.run_in_executor(None, snapshot.apply, changed, version, watermark)
+        elif version == snapshot.version:
+            # Only the poll position moved. Readers never look at the watermark, and keeping the
+            # same object spares the indexes keyed on it (kinship, search) a rebuild.
+            snapshot.watermark = watermark
+            updated = snapshot
+        else:
+            updated = snapshot.with_version(version, watermark)
+        # Counts that still disagree mean deletes or unstamped writes the delta can't see.
+        if updated is None or (len(updated), updated.edges) != (people, edges):
+            return await self.load(driver)
+        events = snapshot.change_events(changed) if changed and self._listeners else []
+        self.snapshot = updated
+        self.stats["incremental" if changed else "unchanged"] += 1
+        if events:
+            self._publish(events)
+        return updated
+
+    async def run(self, driver: AsyncDriver) -> None:
+        while True:
+            try:
+                await self.refresh(driver)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.stats["errors"] += 1
+                logger.warning("Graph snapshot refresh failed: %s", exc)
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self, driver: AsyncDriver) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run(driver))
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> List[str]:
+        snapshot = self.snapshot
+        lines = [
+            "# HELP vassar_graph_cache_refreshes_total Graph snapshot refreshes by outcome.",
+            "# TYPE vassar_graph_cache_refreshes_total counter",
+        ]
+        for outcome, count in self.stats.items():
+            lines.append(f'vassar_graph_cache_refreshes_total{{outcome="{outcome}"}} {count}')
+        if snapshot is not None:
+            lines += [
+                "# HELP vassar_graph_cache_people People in the graph snapshot.",
+                "# TYPE vassar_graph_cache_people gauge",
+                f"vassar_graph_cache_people {len(snapshot)}",
+                "# HELP vassar_graph_cache_edges PARENT_OF edges in the graph snapshot.",
+                "# TYPE vassar_graph_cache_edges gauge",
+                f"vassar_graph_cache_edges {snapshot.edges}",
+                "# HELP vassar_graph_cache_age_seconds Seconds since the snapshot was built.",
+                "# TYPE vassar_graph_cache_age_seconds gauge",
+                f"vassar_graph_cache_age_seconds {time.time() - snapshot.loaded_at:.3f}",
+            ]
+        return lines
+
+
+graph_cache = GraphCache()
+register_collector(graph_cache.metrics)
+
+MEMORY_QUERIES = {
+    "GRAPH_DATA_QUERY",
+    "CHILDREN_OF_QUERY",
+    "PARENTS_OF_QUERY",
+    "HAS_CHILDREN_QUERY",
+    "HAS_PARENTS_QUERY",
+    "PERSON_NAME_QUERY",
+    "ROOT_PEOPLE_QUERY",
+}
+
+
+async def cached_named_query(driver: AsyncDriver, name: str, parameters: Optional[dict] = None):
+    snapshot = graph_cache.live
+    if snapshot is not None and name in MEMORY_QUERIES:
+        return snapshot.run(name, parameters)
+    return await async_named_query(driver, name, parameters)
+
+
+@asynccontextmanager
+async def graph_cache_lifespan(app):
+    if ENABLED:
+        graph_cache.start(shared_async_driver())
+    try:
+        yield
+    finally:
+        await graph_cache.stop()
+
+
+register_lifespan(graph_cache_lifespan)
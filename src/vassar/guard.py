@@ -0,0 +1,192 @@
+"""
+EXPLAIN-based cost guard for generated Cypher.
+
+Before a generated query runs it is planned with ``EXPLAIN`` (nothing executes) and the
+plan is inspected:
+- ``CartesianProduct``, ``AllNodesScan`` and unbounded variable-length expands are
+  hazards and reject the query unless explicitly allowed
+- an estimated row count above the row budget gets a ``LIMIT`` injected (read-only
+  queries) or rejects the query (anything that writes)
+- any operator estimated above the reject threshold rejects the query outright
+
+Guarded queries should run with ``timeout`` so a bad estimate can't pin the server.
+
+The following environment variables are optional:
+- VASSAR_QUERY_ROW_BUDGET: Estimated result rows above which a LIMIT is injected (default 10000)
+- VASSAR_QUERY_REJECT_ROWS: Estimated rows for any operator above which a query is rejected (default 10000000)
+- VASSAR_QUERY_TIMEOUT: Transaction timeout in seconds for guarded queries (default 30)
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from neo4j import AsyncDriver, Driver
+
+from vassar.database import async_query, query
+
+ROW_BUDGET = int(os.getenv("VASSAR_QUERY_ROW_BUDGET", "10000"))
+REJECT_ROWS = float(os.getenv("VASSAR_QUERY_REJECT_ROWS", "10000000"))
+QUERY_TIMEOUT = float(os.getenv("VASSAR_QUERY_TIMEOUT", "30"))
+
+HAZARDOUS_OPERATORS = {"CartesianProduct", "AllNodesScan"}
+
+# ``*]``, ``*..]`` and ``*2..]`` have no upper bound; ``*3]`` and ``*1..3]`` do.
+_UNBOUNDED_EXPAND_RE = re.compile(r"\*(?:\s*\d*\s*\.\.)?\s*\]")
+_UNBOUNDED_REPEAT_RE = re.compile(r"\{\s*\d*\s*,\s*\*?\s*\}|\)[+*]")
+_TRAILING_LIMIT_RE = re.compile(r"\bLIMIT\s+(\d+)\s*$", re.IGNORECASE)
+_FINAL_RETURN_RE = re.compile(r"\bRETURN\b(?!.*\bRETURN\b)", re.IGNORECASE | re.DOTALL)
+_LIMIT_RE = re.compile(r"(?<![.$])\bLIMIT\b", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    def __init__(self, message: str, plan: "PlanSummary"):
+        super().__init__(f"{message} [{plan}]")
+        self.plan = plan
+
+
+@dataclass
+class PlanSummary:
+    estimated_rows: float = 0.0
+    max_estimated_rows: float = 0.0
+    operators: List[str] = field(default_factory=list)
+    hazards: List[str] = field(default_factory=list)
+    query_type: Optional[str] = None
+
+    def __str__(self):
+        hazards = ", ".join(self.hazards) or "none"
+        return (
+            f"estimated_rows={self.estimated_rows:.0f} max_operator_rows={self.max_estimated_rows:.0f} "
+            f"operators={'>'.join(self.operators)} hazards={hazards}"
+        )
+
+    def as_dict(self) -> dict:
+        return dict(
+            estimated_rows=self.estimated_rows,
+            max_estimated_rows=self.max_estimated_rows,
+            operators=self.operators,
+            hazards=self.hazards,
+            query_type=self.query_type,
+        )
+
+
+@dataclass
+class GuardedQuery:
+    query: str
+    plan: PlanSummary
+    limited: bool = False
+
+
+def summarize_plan(plan: dict, query_type: Optional[str] = None) -> PlanSummary:
+    summary = PlanSummary(
+        estimated_rows=float(plan.get("args", plan.get("arguments", {})).get("EstimatedRows", 0)),
+        query_type=query_type,
+    )
+    stack = [plan]
+    while stack:
+        operator = stack.pop()
+        arguments = operator.get("args", operator.get("arguments", {}))
+        name = operator.get("operatorType", "").split("@")[0]
+        details = str(arguments.get("Details", ""))
+        rows = float(arguments.get("EstimatedRows", 0))
+        summary.operators.append(name)
+        summary.max_estimated_rows = max(summary.max_estimated_rows, rows)
+        if name in HAZARDOUS_OPERATORS:
+            summary.hazards.append(name)
+        elif name.startswith("VarLengthExpand") and _UNBOUNDED_EXPAND_RE.search(details):
+            summary.hazards.append(f"unbounded {name}")
+        elif name.startswith("Repeat") and _UNBOUNDED_REPEAT_RE.search(details):
+            summary.hazards.append(f"unbounded {name}")
+        stack.extend(reversed(operator.get("children", [])))
+    return summary
+
+
+def _strip_trailing_comments(cypher: str) -> str:
+    """Drop ``//`` and ``/* */`` comments after the last clause, leaving string literals alone."""
+    while True:
+        cypher = cypher.rstrip().rstrip(";").rstrip()
+        if cypher.endswith("*/") and "/*" in cypher:
+            cypher = cypher[: cypher.rindex("/*")]
+            continue
+        line_start = cypher.rfind("\n") + 1
+        quote = None
+        position = line_start
+        while position < len(cypher):
+            character = cypher[position]
+            if quote:
+                if character == "\\":
+                    position += 1
+                elif character == quote:
+                    quote = None
+            elif character in "'\"`":
+                quote = character
+            elif cypher.startswith("//", position):
+                break
+            position += 1
+        if position >= len(cypher):
+            return cypher
+        cypher = cypher[:position]
+
+
+def inject_limit(cypher: str, limit: int) -> str:
+    """
+    Cap the rows of ``cypher`` at ``limit``: lower a literal ``LIMIT`` on the final
+    ``RETURN`` or append one. A final ``LIMIT`` that isn't an integer (``LIMIT $n``)
+    can't be compared and raises ``ValueError``, as a second ``LIMIT`` would be invalid.
+    """
+    cypher = _strip_trailing_comments(cypher)
+    existing = _TRAILING_LIMIT_RE.search(cypher)
+    if existing:
+        if int(existing.group(1)) <= limit:
+            return cypher
+        return cypher[: existing.start(1)] + str(limit)
+    final_return = _FINAL_RETURN_RE.search(cypher)
+    if final_return and _LIMIT_RE.search(cypher, final_return.end()):
+        raise ValueError("Query already ends with a LIMIT that is not a number")
+    return f"{cypher}\nLIMIT {limit}"
+
+
+def _review(
+    cypher: str,
+    plan: PlanSummary,
+    row_budget: int,
+    reject_rows: float,
+    allow_hazards: bool,
+) -> GuardedQuery:
+    if plan.hazards and not allow_hazards:
+        raise QueryRejected("Query plan contains " + ", ".join(plan.hazards), plan)
+    if plan.max_estimated_rows > reject_rows:
+        raise QueryRejected(f"Query is estimated to touch more than {reject_rows:.0f} rows", plan)
+    if plan.estimated_rows <= row_budget:
+        return GuardedQuery(cypher, plan)
+    if plan.query_type != "r" or re.search(r"\bUNION\b", cypher, re.IGNORECASE):
+        raise QueryRejected(f"Query returns more than {row_budget} rows and cannot be limited", plan)
+    try:
+        return GuardedQuery(inject_limit(cypher, row_budget), plan, limited=True)
+    except ValueError as exc:
+        raise QueryRejected(f"Query returns more than {row_budget} rows and cannot be limited: {exc}", plan)
+
+
+def guard_query(
+    driver: Driver,
+    cypher: str,
+    row_budget: int = ROW_BUDGET,
+    reject_rows: float = REJECT_ROWS,
+    allow_hazards: bool = False,
+) -> GuardedQuery:
+    explained = query(driver, "EXPLAIN " + cypher)
+    plan = summarize_plan(explained.summary.plan, explained.summary.query_type)
+    return _review(cypher, plan, row_budget, reject_rows, allow_hazards)
+
+
+async def async_guard_query(
+    driver: AsyncDriver,
+    cypher: str,
+    row_budget: int = ROW_BUDGET,
+    reject_rows: float = REJECT_ROWS,
+    allow_hazards: bool = False,
+) -> GuardedQuery:
+    explained = await async_query(driver, "EXPLAIN " + cypher)
+    plan = summarize_plan(explained.summary.plan, explained.summary.query_type)
+    return _review(cypher, plan, row_budget, reject_rows, allow_hazards)
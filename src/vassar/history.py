@@ -2,12 +2,11 @@ from fasthtml.components import Title, Main, H1, Article, Div, Header, P, A, H3,
     Cite
 
 from vassar.components import page_header, page_nav, page_footer
+from vassar.pages import static_page
 
 def history_routes(app):
-    rt = app.route
-
-    @rt("/history")
-    def get():
+    @static_page(app, "/history")
+    def history():
         return (
             Title("The Vassar Community Project"),
             page_header(),
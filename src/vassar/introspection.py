@@ -0,0 +1,134 @@
+"""
+Cached schema introspection for natural-language queries.
+
+The serialized schema is kept in memory and on disk. Within the TTL it is served without
+touching the database. After the TTL a cheap fingerprint query (the label, relationship
+type and property key sets) decides whether the cached copy is still valid. Only when
+the fingerprint changes are the node and relationship type properties fetched again,
+concurrently.
+
+The following environment variables are optional:
+- VASSAR_CACHE_DIR: Directory for on-disk caches (default ~/.cache/vassar)
+- VASSAR_SCHEMA_TTL: Seconds a cached schema is trusted without a fingerprint check (default 3600)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+from neo4j import AsyncDriver, Driver
+
+from vassar.database import (
+    async_named_query,
+    named_query,
+    shared_async_driver,
+    shared_driver,
+)
+
+
+def cache_dir() -> Path:
+    return Path(os.getenv("VASSAR_CACHE_DIR", Path.home() / ".cache" / "vassar"))
+
+
+@dataclass(frozen=True)
+class SchemaSnapshot:
+    schema_json: str
+    fingerprint: str
+    fetched_at: float
+
+
+def _fingerprint(result) -> str:
+    record = result.records[0]
+    parts = [sorted(record["labels"]), sorted(record["types"]), sorted(record["keys"])]
+    return hashlib.sha1(json.dumps(parts).encode()).hexdigest()[:16]
+
+
+def _serialize(node_result, relationship_result) -> str:
+    nodes = node_result.records[0][0]
+    relationships = relationship_result.records[0][0]
+    schema = dict(nodes=nodes, relationships=relationships)
+    return json.dumps(schema, indent=4)
+
+
+class SchemaService:
+    def __init__(self, path: Optional[Path] = None, ttl: Optional[float] = None):
+        self.path = path or cache_dir() / "schema.json"
+        self.ttl = ttl if ttl is not None else float(os.getenv("VASSAR_SCHEMA_TTL", "3600"))
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _cached(self) -> Optional[SchemaSnapshot]:
+        if self._snapshot is None and self.path.exists():
+            try:
+                self._snapshot = SchemaSnapshot(**json.loads(self.path.read_text()))
+            except (ValueError, TypeError):
+                self._snapshot = None
+        return self._snapshot
+
+    def _store(self, snapshot: SchemaSnapshot) -> SchemaSnapshot:
+        self._snapshot = snapshot
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(snapshot)))
+        tmp.replace(self.path)
+        return snapshot
+
+    def _is_fresh(self, snapshot: Optional[SchemaSnapshot]) -> bool:
+        return snapshot is not None and time.time() - snapshot.fetched_at < self.ttl
+
+    def _revalidated(self, snapshot: Optional[SchemaSnapshot], fingerprint: str):
+        if snapshot is not None and snapshot.fingerprint == fingerprint:
+            return self._store(replace(snapshot, fetched_at=time.time()))
+        return None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._snapshot = None
+            self.path.unlink(missing_ok=True)
+
+    def get(self, driver: Driver) -> SchemaSnapshot:
+        with self._lock:
+            snapshot = self._cached()
+            if self._is_fresh(snapshot):
+                return snapshot
+            fingerprint = _fingerprint(named_query(driver, "SCHEMA_FINGERPRINT_QUERY"))
+            revalidated = self._revalidated(snapshot, fingerprint)
+            if revalidated is not None:
+                return revalidated
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                nodes = pool.submit(named_query, driver, "NODE_QUERY")
+                relationships = pool.submit(named_query, driver, "RELATIONSHIP_QUERY")
+                schema_json = _serialize(nodes.result(), relationships.result())
+            return self._store(SchemaSnapshot(schema_json, fingerprint, time.time()))
+
+    async def async_get(self, driver: AsyncDriver) -> SchemaSnapshot:
+        snapshot = self._cached()
+        if self._is_fresh(snapshot):
+            return snapshot
+        fingerprint = _fingerprint(await async_named_query(driver, "SCHEMA_FINGERPRINT_QUERY"))
+        revalidated = self._revalidated(snapshot, fingerprint)
+        if revalidated is not None:
+            return revalidated
+        nodes, relationships = await asyncio.gather(
+            async_named_query(driver, "NODE_QUERY"),
+            async_named_query(driver, "RELATIONSHIP_QUERY"),
+        )
+        return self._store(SchemaSnapshot(_serialize(nodes, relationships), fingerprint, time.time()))
+
+
+schema_service = SchemaService()
+
+
+def database_schema() -> str:
+    return schema_service.get(shared_driver()).schema_json
+
+
+async def async_database_schema() -> str:
+    return (await schema_service.async_get(shared_async_driver())).schema_json
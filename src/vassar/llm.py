@@ -25,6 +25,18 @@ CYPHER_EXPERT_CTX = [
 ]
 
 
+def cypher_prompt(schema_json: str, natural_language_query: str) -> str:
+    return f"""
+    Given the following Neo4j database schema
+
+    {schema_json}
+
+    generate a Cypher query that matches the following natural language query:
+
+    {natural_language_query}
+    """
+
+
 @prompt(
     context=CYPHER_EXPERT_CTX,
     model=LLMModel.LLAMA3_70b,
@@ -0,0 +1,168 @@
+"""
+Persistent cache in front of ``gen_cypher_query``.
+
+Generated Cypher is keyed on the normalized question plus the schema fingerprint from
+``vassar.introspection``, so a schema change naturally misses. Lookups go through an
+in-memory LRU first, then a SQLite table under ``VASSAR_CACHE_DIR``; both tiers honour a
+TTL and a size bound.
+
+The following environment variables are optional:
+- VASSAR_LLM_CACHE_TTL: Seconds a generated query stays valid (default 604800, one week)
+- VASSAR_LLM_CACHE_MEMORY: Entries kept in the in-memory LRU (default 256)
+- VASSAR_LLM_CACHE_ROWS: Rows kept in the SQLite tier (default 10000)
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from vassar.introspection import cache_dir
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS cypher_cache (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    cypher TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+# Bumped when the key derivation changes, so entries stored under the old one miss.
+KEY_VERSION = "2"
+
+
+def normalize_question(question: str) -> str:
+    # Case is kept: names in the question become case-sensitive string literals in the Cypher.
+    return _WHITESPACE_RE.sub(" ", question).strip().rstrip("?.! ")
+
+
+def cache_key(question: str, fingerprint: str) -> str:
+    return hashlib.sha256(f"{KEY_VERSION}\0{fingerprint}\0{normalize_question(question)}".encode()).hexdigest()
+
+
+class CypherCache:
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        ttl: Optional[float] = None,
+        memory_size: Optional[int] = None,
+        disk_size: Optional[int] = None,
+    ):
+        self.path = path or cache_dir() / "cypher_cache.sqlite3"
+        self.ttl = ttl if ttl is not None else float(os.getenv("VASSAR_LLM_CACHE_TTL", "604800"))
+        self.memory_size = memory_size or int(os.getenv("VASSAR_LLM_CACHE_MEMORY", "256"))
+        self.disk_size = disk_size or int(os.getenv("VASSAR_LLM_CACHE_ROWS", "10000"))
+        self.stats = dict(memory_hits=0, disk_hits=0, misses=0, bypassed=0)
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(CREATE_TABLE)
+        return self._db
+
+    def _remember(self, key: str, cypher: str, created_at: float) -> None:
+        self._memory[key] = (cypher, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, question: str, fingerprint: str) -> Optional[str]:
+        key = cache_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+            row = self.db.execute(
+                "SELECT cypher, created_at FROM cypher_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                with self.db:
+                    self.db.execute(
+                        "UPDATE cypher_cache SET hits = hits + 1, last_used = ? WHERE key = ?",
+                        (now, key),
+                    )
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, question: str, fingerprint: str, cypher: str) -> None:
+        key = cache_key(question, fingerprint)
+        now = time.time()
+        with self._lock:
+            self._remember(key, cypher, now)
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO cypher_cache "
+                    "(key, question, fingerprint, cypher, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, normalize_question(question), fingerprint, cypher, now, now),
+                )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM cypher_cache WHERE created_at < ?", (now - self.ttl,))
+            self.db.execute(
+                "DELETE FROM cypher_cache WHERE key NOT IN "
+                "(SELECT key FROM cypher_cache ORDER BY last_used DESC LIMIT ?)",
+                (self.disk_size,),
+            )
+
+    def get_or_generate(
+        self,
+        question: str,
+        fingerprint: str,
+        generate: Callable[[str], str],
+        bypass: bool = False,
+    ) -> str:
+        """
+        Return the cached Cypher for ``question``, calling ``generate(question)`` on a miss.
+        ``bypass`` skips the lookup but still stores the fresh result.
+        """
+        if bypass:
+            self.stats["bypassed"] += 1
+        else:
+            cached = self.get(question, fingerprint)
+            if cached is not None:
+                return cached
+        cypher = generate(question)
+        self.put(question, fingerprint, cypher)
+        return cypher
+
+    def summary(self) -> dict:
+        with self._lock:
+            rows, hits = self.db.execute(
+                "SELECT count(*), coalesce(sum(hits), 0) FROM cypher_cache"
+            ).fetchone()
+            return dict(self.stats, memory_entries=len(self._memory), disk_entries=rows, disk_hits_total=hits)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            with self.db:
+                self.db.execute("DELETE FROM cypher_cache")
+
+
+cypher_cache = CypherCache()
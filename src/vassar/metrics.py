@@ -0,0 +1,228 @@
+"""
+Query instrumentation for ``vassar.database`` and the ``/metrics`` route.
+
+Every query is reduced to a fingerprint (literals replaced by ``?``, whitespace and
+comments collapsed) and timed. Per fingerprint we keep a cumulative latency histogram,
+a rolling window of recent latencies for quantiles, the driver's server-side
+``result_available_after``/``result_consumed_after`` and record counts. Everything is
+rendered in the Prometheus text format.
+
+The following environment variables are optional:
+- VASSAR_SLOW_QUERY_MS: Queries slower than this are written to the slow-query log (default 500)
+- VASSAR_SLOW_QUERY_LOG: File the slow-query log is appended to (default: logger only)
+- VASSAR_QUERY_LOG_SAMPLE: Fraction of queries logged at DEBUG level (default 0.01)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Optional
+
+from starlette.responses import PlainTextResponse
+
+logger = logging.getLogger("vassar.database")
+slow_query_logger = logging.getLogger("vassar.slow_query")
+
+SLOW_QUERY_SECONDS = float(os.getenv("VASSAR_SLOW_QUERY_MS", "500")) / 1000
+QUERY_LOG_SAMPLE = float(os.getenv("VASSAR_QUERY_LOG_SAMPLE", "0.01"))
+
+if os.getenv("VASSAR_SLOW_QUERY_LOG"):
+    slow_query_logger.addHandler(logging.FileHandler(os.getenv("VASSAR_SLOW_QUERY_LOG")))
+    slow_query_logger.setLevel(logging.WARNING)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RECENT_WINDOW = 1024
+QUANTILES = (0.5, 0.9, 0.99)
+
+_COMMENT_RE = re.compile(r"//[^\n]*")
+_LITERAL_RE = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    query = _COMMENT_RE.sub(" ", query)
+    query = _LITERAL_RE.sub("?", query)
+    return _WHITESPACE_RE.sub(" ", query).strip()
+
+
+def fingerprint(query: str) -> str:
+    return hashlib.sha1(normalize_query(query).encode()).hexdigest()[:12]
+
+
+def log_query(query: str) -> None:
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < QUERY_LOG_SAMPLE:
+        logger.debug("EXECUTING_QUERY:::: %s", query)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class QueryStats:
+    def __init__(self, text: str):
+        self.text = text
+        self.latency = Histogram()
+        self.recent = deque(maxlen=RECENT_WINDOW)
+        self.available_after = 0.0
+        self.consumed_after = 0.0
+        self.records = 0
+        self.errors = 0
+        self.slow = 0
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class QueryMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries: Dict[str, QueryStats] = {}
+
+    def _stats(self, query: str, key: str) -> QueryStats:
+        stats = self.queries.get(key)
+        if stats is None:
+            stats = self.queries[key] = QueryStats(normalize_query(query)[:500])
+        return stats
+
+    def record(
+        self,
+        query: str,
+        seconds: float,
+        result=None,
+        error: bool = False,
+        summary=None,
+        records: Optional[int] = None,
+    ) -> str:
+        """
+        Record one query. ``result`` is an ``EagerResult``; streamed queries pass their
+        ``summary`` and ``records`` count directly instead.
+        """
+        key = fingerprint(query)
+        if result is not None:
+            summary = result.summary
+            records = len(result.records)
+        records = records or 0
+        with self._lock:
+            stats = self._stats(query, key)
+            stats.latency.observe(seconds)
+            stats.recent.append(seconds)
+            stats.records += records
+            if error:
+                stats.errors += 1
+            if summary is not None:
+                stats.available_after += (summary.result_available_after or 0) / 1000
+                stats.consumed_after += (summary.result_consumed_after or 0) / 1000
+            if seconds >= SLOW_QUERY_SECONDS:
+                stats.slow += 1
+        if seconds >= SLOW_QUERY_SECONDS:
+            slow_query_logger.warning(
+                json.dumps(
+                    dict(
+                        fingerprint=key,
+                        ms=round(seconds * 1000, 1),
+                        records=records,
+                        error=error,
+                        query=query,
+                    )
+                )
+            )
+        return key
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queries.clear()
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self.queries.items())
+            lines = [
+                "# HELP vassar_query_duration_seconds Wall time of Neo4j queries.",
+                "# TYPE vassar_query_duration_seconds histogram",
+            ]
+            for key, stats in items:
+                cumulative = 0
+                for bound, count in zip(stats.latency.buckets + ("+Inf",), stats.latency.counts):
+                    cumulative += count
+                    lines.append(
+                        f'vassar_query_duration_seconds_bucket{{fingerprint="{key}",le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f'vassar_query_duration_seconds_sum{{fingerprint="{key}"}} {stats.latency.sum}')
+                lines.append(f'vassar_query_duration_seconds_count{{fingerprint="{key}"}} {stats.latency.count}')
+            lines += [
+                "# HELP vassar_query_recent_duration_seconds Latency quantiles over the last queries.",
+                "# TYPE vassar_query_recent_duration_seconds summary",
+            ]
+            for key, stats in items:
+                for q in QUANTILES:
+                    value = stats.quantile(q)
+                    if value is not None:
+                        lines.append(
+                            f'vassar_query_recent_duration_seconds{{fingerprint="{key}",quantile="{q}"}} {value}'
+                        )
+            counters = (
+                ("vassar_query_result_available_after_seconds_total", "available_after",
+                 "Server time until the first record was available."),
+                ("vassar_query_result_consumed_after_seconds_total", "consumed_after",
+                 "Server time until the result was consumed."),
+                ("vassar_query_records_total", "records", "Records returned."),
+                ("vassar_query_errors_total", "errors", "Queries that raised."),
+                ("vassar_query_slow_total", "slow", "Queries over the slow-query threshold."),
+            )
+            for name, attribute, help_text in counters:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for key, stats in items:
+                    lines.append(f'{name}{{fingerprint="{key}"}} {getattr(stats, attribute)}')
+            lines += [
+                "# HELP vassar_query_info Normalized text of each query fingerprint.",
+                "# TYPE vassar_query_info gauge",
+            ]
+            for key, stats in items:
+                lines.append(f'vassar_query_info{{fingerprint="{key}",query="{escape_label(stats.text)}"}} 1')
+        return lines
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+query_metrics = QueryMetrics()
+
+_collectors: List[Callable[[], Iterable[str]]] = []
+
+
+def register_collector(collector: Callable[[], Iterable[str]]) -> None:
+    """Add a callable whose Prometheus lines are appended to ``/metrics``."""
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    lines = query_metrics.render()
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def metrics_routes(app):
+    rt = app.route
+
+    @rt("/metrics")
+    def get():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,213 @@
+"""
+Precompiled pages for content that doesn't depend on the request.
+
+The home, history and tree pages are the same for every visitor, yet rebuilding their
+FT component trees and serializing them costs more than the rest of the request. A
+``StaticPage`` renders its component tree once, on first hit or when ``precompile`` is
+called at startup, exactly the way fasthtml would (the app's default headers and a
+``<title>`` in ``<head>``, or the bare fragment for htmx requests). The bytes, a
+content-hash ETag and a gzip variant are kept, so a request only picks a variant.
+
+Pages are dropped explicitly: ``invalidate()`` or ``POST /admin/pages/invalidate``
+(guarded by ``VASSAR_ADMIN_TOKEN`` like the response caches) re-renders on the next
+hit, which is what you want while editing components in dev without a restart.
+
+The following environment variables are optional:
+- VASSAR_PAGE_CACHE: Set to "off" to render pages on every request (default on)
+- VASSAR_PAGE_GZIP_LEVEL: Compression level of the stored gzip variants (default 9)
+"""
+
+import gzip
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from fasthtml.components import Body, Head, Title
+from fasthtml.core import flat_xt
+from fastcore.xml import Html, to_xml
+from starlette.responses import JSONResponse, Response
+
+from vassar.metrics import register_collector
+from vassar.response_cache import authorized, etag_for, etag_matches
+
+ENABLED = os.getenv("VASSAR_PAGE_CACHE", "on").lower() not in ("0", "off", "false", "no")
+GZIP_LEVEL = int(os.getenv("VASSAR_PAGE_GZIP_LEVEL", "9"))
+
+HEAD_TAGS = ("title", "meta", "link", "style", "base")
+MEDIA_TYPE = "text/html; charset=utf-8"
+
+
+@dataclass(frozen=True)
+class RenderedPage:
+    body: bytes
+    etag: str
+    gzip_body: bytes
+    gzip_etag: str
+
+
+def render_document(content, router) -> bytes:
+    """
+    Serialize ``content`` as fasthtml does for a full page request: head tags go into
+    ``<head>`` after the title, followed by the app's headers; the rest into ``<body>``.
+    """
+    if not isinstance(content, tuple):
+        content = (content,)
+    titles = [item for item in content if getattr(item, "tag", "") in HEAD_TAGS]
+    body = tuple(item for item in content if getattr(item, "tag", "") not in HEAD_TAGS)
+    if not titles:
+        titles = [Title("FastHTML page")]
+    document = Html(
+        Head(*titles, *flat_xt(router.hdrs)),
+        Body(body, *flat_xt(router.ftrs), **router.bodykw),
+        **router.htmlkw,
+    )
+    return to_xml(document).encode()
+
+
+def render_fragment(content) -> bytes:
+    """Serialize ``content`` as fasthtml does for an htmx request: no document around it."""
+    return to_xml(content).encode()
+
+
+def _compile(body: bytes) -> RenderedPage:
+    gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    etag = etag_for(body)
+    return RenderedPage(body, etag, gzip_body, etag[:-1] + '-gzip"')
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "").lower() not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class StaticPage:
+    """One request-independent page; ``render`` returns the FT components of the route."""
+
+    def __init__(self, name: str, render: Callable[[], object], router):
+        self.name = name
+        self.render = render
+        self.router = router
+        self.variants: Dict[str, RenderedPage] = {}
+        self.stats = dict(hit=0, render=0, not_modified=0)
+        self._lock = threading.Lock()
+
+    def compiled(self, variant: str = "document") -> RenderedPage:
+        page = self.variants.get(variant)
+        if page is not None and ENABLED:
+            self.stats["hit"] += 1
+            return page
+        with self._lock:
+            page = self.variants.get(variant)
+            if page is not None and ENABLED:
+                self.stats["hit"] += 1
+                return page
+            self.stats["render"] += 1
+            content = self.render()
+            if variant == "fragment":
+                page = _compile(render_fragment(content))
+            else:
+                page = _compile(render_document(content, self.router))
+            if ENABLED:
+                self.variants[variant] = page
+            return page
+
+    def precompile(self) -> None:
+        for variant in ("document", "fragment"):
+            self.compiled(variant)
+
+    def invalidate(self) -> None:
+        self.variants = {}
+
+    def respond(self, request) -> Response:
+        page = self.compiled("fragment" if "hx-request" in request.headers else "document")
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding, HX-Request"}
+        if accepts_gzip(request.headers.get("accept-encoding")):
+            body, headers["ETag"], headers["Content-Encoding"] = page.gzip_body, page.gzip_etag, "gzip"
+        else:
+            body, headers["ETag"] = page.body, page.etag
+        if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+            self.stats["not_modified"] += 1
+            headers.pop("Content-Encoding", None)
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type=MEDIA_TYPE, headers=headers)
+
+    def samples(self) -> Dict[str, List[str]]:
+        label = f'page="{self.name}"'
+        variants = list(self.variants.values())
+        return {
+            "vassar_page_requests_total": [
+                f'vassar_page_requests_total{{{label},outcome="{outcome}"}} {self.stats[outcome]}'
+                for outcome in ("hit", "render", "not_modified")
+            ],
+            "vassar_page_bytes": [
+                f'vassar_page_bytes{{{label},encoding="identity"}} {sum(len(page.body) for page in variants)}',
+                f'vassar_page_bytes{{{label},encoding="gzip"}} {sum(len(page.gzip_body) for page in variants)}',
+            ],
+        }
+
+
+METRICS = (
+    ("vassar_page_requests_total", "counter", "Precompiled page requests by outcome."),
+    ("vassar_page_bytes", "gauge", "Size of the stored page variants by content encoding."),
+)
+
+pages: Dict[str, StaticPage] = {}
+
+
+def page_metrics() -> List[str]:
+    samples = [page.samples() for page in list(pages.values())]
+    lines = []
+    for name, kind, help_text in METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for page_samples in samples:
+            lines.extend(page_samples[name])
+    return lines
+
+
+def static_page(app, path: str, name: Optional[str] = None):
+    """
+    Register the decorated function's components as a precompiled GET route at ``path``.
+    The page is named after the function unless ``name`` is given.
+    """
+
+    def decorator(render: Callable[[], object]):
+        page_name = name or render.__name__
+        if not pages:
+            register_collector(page_metrics)
+        page = pages[page_name] = StaticPage(page_name, render, app.router)
+
+        @app.route(path, methods=["get"], name=page_name)
+        def get(request):
+            return page.respond(request)
+
+        return render
+
+    return decorator
+
+
+def precompile() -> None:
+    """Render every registered page now instead of on its first hit."""
+    if ENABLED:
+        for page in list(pages.values()):
+            page.precompile()
+
+
+def invalidate(name: str = "") -> List[str]:
+    targets = [pages[name]] if name in pages else list(pages.values()) if not name else []
+    for page in targets:
+        page.invalidate()
+    return [page.name for page in targets]
+
+
+def page_admin_routes(app):
+    rt = app.route
+
+    @rt("/admin/pages/invalidate", methods=["post"])
+    def invalidate_pages(request, name: str = ""):
+        if not authorized(request):
+            return JSONResponse({"error": "forbidden"}, status_code=403)
+        return JSONResponse({"invalidated": invalidate(name)})
@@ -0,0 +1,239 @@
+"""
+Registry of named, pre-declared Cypher queries.
+
+Values are always passed as parameters, never interpolated into the text, so each query
+has exactly one plan in the server's plan cache. ``warm_plan_cache`` runs ``EXPLAIN`` for
+every registered query at startup, with example parameters of the right types, so the
+first real request doesn't pay for planning.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from neo4j import AsyncDriver, Driver
+
+logger = logging.getLogger("vassar.queries")
+
+
+@dataclass(frozen=True)
+class NamedQuery:
+    name: str
+    text: str
+    example: dict = field(default_factory=dict)
+
+
+QUERIES: Dict[str, NamedQuery] = {}
+
+
+def register(name: str, text: str, example: Optional[dict] = None) -> str:
+    QUERIES[name] = NamedQuery(name, text, example or {})
+    return text
+
+
+def get_query(name: str) -> NamedQuery:
+    try:
+        return QUERIES[name]
+    except KeyError:
+        raise KeyError(f"Unknown named query {name!r}") from None
+
+
+GRAPH_DATA_QUERY = register(
+    "GRAPH_DATA_QUERY",
+    """
+MATCH (p:Person)-[:PARENT_OF]->(child:Person)
+RETURN p.person_id AS id, p.name AS name, collect([child.person_id, child.name]) AS children
+""",
+)
+
+# Cheap change detector for caches of graph-derived data: the count-store totals, the
+# optional (:GraphVersion {version}) counter writers may bump, and the newest
+# Person.updated_at (an index-backed ORDER BY ... LIMIT 1). ``now`` is the server's
+# clock, which the updated_at stamps come from; it isn't part of the version.
+GRAPH_VERSION_QUERY = register(
+    "GRAPH_VERSION_QUERY",
+    """
+CALL { MATCH (p:Person) RETURN count(p) AS people }
+CALL { MATCH ()-[r:PARENT_OF]->() RETURN count(r) AS edges }
+CALL { OPTIONAL MATCH (v:GraphVersion) RETURN max(v.version) AS version }
+CALL {
+    OPTIONAL MATCH (p:Person) WHERE p.updated_at IS NOT NULL
+    RETURN p.updated_at AS updated_at ORDER BY updated_at DESC LIMIT 1
+}
+RETURN people, edges, version, updated_at, timestamp() AS now
+""",
+)
+
+NODE_QUERY = register(
+    "NODE_QUERY",
+    """
+CALL db.schema.nodeTypeProperties()
+YIELD nodeType, nodeLabels, propertyName, propertyTypes, mandatory
+RETURN collect({
+    type: nodeType,
+    labels: nodeLabels,
+    name: propertyName,
+    type: propertyTypes,
+    mandatory: mandatory
+}) AS nodes_schema
+""",
+)
+
+RELATIONSHIP_QUERY = register(
+    "RELATIONSHIP_QUERY",
+    """
+CALL db.schema.relTypeProperties()
+YIELD relType, propertyName, propertyTypes, mandatory
+RETURN collect({
+    type: relType,
+    name: propertyName,
+    types: propertyTypes,
+    mandatory: mandatory
+}) AS relationships_schema
+""",
+)
+
+SCHEMA_FINGERPRINT_QUERY = register(
+    "SCHEMA_FINGERPRINT_QUERY",
+    """
+CALL { CALL db.labels() YIELD label RETURN collect(label) AS labels }
+CALL { CALL db.relationshipTypes() YIELD relationshipType RETURN collect(relationshipType) AS types }
+CALL { CALL db.propertyKeys() YIELD propertyKey RETURN collect(propertyKey) AS keys }
+RETURN labels, types, keys
+""",
+)
+
+
+# One generation per round trip for lazily expanded subtrees: every lookup is a seek on
+# the person_id key index, whatever the size of the graph.
+CHILDREN_OF_QUERY = register(
+    "CHILDREN_OF_QUERY",
+    """
+UNWIND $ids AS id
+MATCH (p:Person {person_id: id})
+RETURN id, [(p)-[:PARENT_OF]->(child:Person) | [child.person_id, child.name]] AS relatives
+""",
+    example=dict(ids=[0]),
+)
+
+PARENTS_OF_QUERY = register(
+    "PARENTS_OF_QUERY",
+    """
+UNWIND $ids AS id
+MATCH (p:Person {person_id: id})
+RETURN id, [(parent:Person)-[:PARENT_OF]->(p) | [parent.person_id, parent.name]] AS relatives
+""",
+    example=dict(ids=[0]),
+)
+
+HAS_CHILDREN_QUERY = register(
+    "HAS_CHILDREN_QUERY",
+    """
+UNWIND $ids AS id
+MATCH (p:Person {person_id: id})
+RETURN id, EXISTS { (p)-[:PARENT_OF]->(:Person) } AS has_more
+""",
+    example=dict(ids=[0]),
+)
+
+HAS_PARENTS_QUERY = register(
+    "HAS_PARENTS_QUERY",
+    """
+UNWIND $ids AS id
+MATCH (p:Person {person_id: id})
+RETURN id, EXISTS { (:Person)-[:PARENT_OF]->(p) } AS has_more
+""",
+    example=dict(ids=[0]),
+)
+
+ROOT_PEOPLE_QUERY = register(
+    "ROOT_PEOPLE_QUERY",
+    """
+MATCH (p:Person)
+WHERE EXISTS { (p)-[:PARENT_OF]->(:Person) } AND NOT EXISTS { (:Person)-[:PARENT_OF]->(p) }
+RETURN p.person_id AS id, p.name AS name
+ORDER BY id
+SKIP $skip LIMIT $limit
+""",
+    example=dict(skip=0, limit=1),
+)
+
+
+PERSON_NAME_QUERY = register(
+    "PERSON_NAME_QUERY",
+    """
+MATCH (p:Person {person_id: $person_id})
+RETURN p.name AS name
+""",
+    example=dict(person_id=0),
+)
+
+# Full and incremental loads of the in-memory snapshot (vassar.graphcache).
+GRAPH_PEOPLE_QUERY = register(
+    "GRAPH_PEOPLE_QUERY",
+    """
+MATCH (p:Person)
+RETURN p.person_id AS id, p.name AS name
+""",
+)
+
+GRAPH_EDGES_QUERY = register(
+    "GRAPH_EDGES_QUERY",
+    """
+MATCH (p:Person)-[:PARENT_OF]->(child:Person)
+RETURN p.person_id AS parent, child.person_id AS child
+""",
+)
+
+CHANGED_PEOPLE_QUERY = register(
+    "CHANGED_PEOPLE_QUERY",
+    """
+MATCH (p:Person) WHERE p.updated_at >= $since
+RETURN p.person_id AS id, p.name AS name,
+       [(p)-[:PARENT_OF]->(child:Person) | child.person_id] AS children,
+       [(parent:Person)-[:PARENT_OF]->(p) | parent.person_id] AS parents
+""",
+    example=dict(since=0),
+)
+
+# Lucene syntax over the person_search full-text index (see vassar.schema).
+PERSON_SEARCH_QUERY = register(
+    "PERSON_SEARCH_QUERY",
+    """
+CALL db.index.fulltext.queryNodes('person_search', $query, {limit: $limit}) YIELD node, score
+RETURN node.person_id AS id, node.name AS name, node.birthplace AS birthplace, score
+""",
+    example=dict(query="a*", limit=10),
+)
+
+
+def warm_plan_cache(driver: Driver) -> int:
+    try:
+        driver.verify_connectivity()
+    except Exception as exc:
+        logger.warning("Skipping plan cache warm-up, database unavailable: %s", exc)
+        return 0
+    warmed = 0
+    for named in QUERIES.values():
+        try:
+            driver.execute_query("EXPLAIN " + named.text, named.example)
+            warmed += 1
+        except Exception as exc:
+            logger.warning("Could not warm plan for %s: %s", named.name, exc)
+    return warmed
+
+
+async def async_warm_plan_cache(driver: AsyncDriver) -> int:
+    try:
+        await driver.verify_connectivity()
+    except Exception as exc:
+        logger.warning("Skipping plan cache warm-up, database unavailable: %s", exc)
+        return 0
+    warmed = 0
+    for named in QUERIES.values():
+        try:
+            await driver.execute_query("EXPLAIN " + named.text, named.example)
+            warmed += 1
+        except Exception as exc:
+            logger.warning("Could not warm plan for %s: %s", named.name, exc)
+    return warmed
@@ -0,0 +1,181 @@
+"""
+In-process cache for serialized responses that only change when the graph changes.
+
+Each entry holds the encoded body and a content-hash ETag, stamped with the graph's
+data version. A request costs at most one cheap version query, and only once every
+``VASSAR_CACHE_VERSION_CHECK_SECONDS``. While the version is unchanged the cached bytes
+are served as is, and requests whose ``If-None-Match`` matches get a 304.
+
+The following environment variables are optional:
+- VASSAR_CACHE_VERSION_CHECK_SECONDS: Minimum seconds between data-version checks (default 5)
+- VASSAR_ADMIN_TOKEN: Bearer token for the cache invalidation endpoint (endpoint disabled when unset)
+"""
+
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse, Response
+
+from vassar.metrics import register_collector
+
+VERSION_CHECK_SECONDS = float(os.getenv("VASSAR_CACHE_VERSION_CHECK_SECONDS", "5"))
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    body: bytes
+    etag: str
+    media_type: str
+    version: Any
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _without_prefix(text: str, prefix: str) -> str:
+    # str.removeprefix is Python 3.9+.
+    return text[len(prefix):] if text.startswith(prefix) else text
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = {_without_prefix(candidate.strip(), "W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        name: str,
+        version_check_seconds: float = VERSION_CHECK_SECONDS,
+        max_entries: Optional[int] = None,
+    ):
+        self.name = name
+        self.version_check_seconds = version_check_seconds
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.stats = dict(hit=0, miss=0, not_modified=0, invalidated=0)
+        self._version: Any = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def version(self, fetch_version: Callable[[], Awaitable[Any]]) -> Any:
+        if self._version is None or time.monotonic() - self._checked_at >= self.version_check_seconds:
+            self._version = await fetch_version()
+            self._checked_at = time.monotonic()
+        return self._version
+
+    async def get(
+        self,
+        key: str,
+        fetch_version: Callable[[], Awaitable[Any]],
+        build: Callable[[], Awaitable[Tuple[bytes, str]]],
+    ) -> CachedResponse:
+        """Return the entry for ``key``; ``build()`` runs once per data version, not per request."""
+        version = await self.version(fetch_version)
+        entry = self.entries.get(key)
+        if entry is not None and entry.version == version:
+            self.stats["hit"] += 1
+            self.entries.move_to_end(key)
+            return entry
+        async with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry.version == version:
+                self.stats["hit"] += 1
+                return entry
+            self.stats["miss"] += 1
+            body, media_type = await build()
+            entry = self.entries[key] = CachedResponse(body, etag_for(body), media_type, version)
+            self.entries.move_to_end(key)
+            # Least recently used entries go first once the cache is bounded.
+            while self.max_entries is not None and len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            return entry
+
+    def respond(self, request, entry: CachedResponse) -> Response:
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache", "Vary": "Accept"}
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry.body, media_type=entry.media_type, headers=headers)
+
+    def invalidate(self) -> None:
+        self.entries.clear()
+        self._version = None
+        self._checked_at = 0.0
+        self.stats["invalidated"] += 1
+
+    def samples(self) -> Dict[str, List[str]]:
+        """Prometheus sample lines by metric name; ``cache_metrics`` adds HELP/TYPE once."""
+        label = f'cache="{self.name}"'
+        entries = list(self.entries.values())
+        return {
+            "vassar_response_cache_requests_total": [
+                f'vassar_response_cache_requests_total{{{label},outcome="{outcome}"}} {self.stats[outcome]}'
+                for outcome in ("hit", "miss", "not_modified")
+            ],
+            "vassar_response_cache_invalidations_total": [
+                f"vassar_response_cache_invalidations_total{{{label}}} {self.stats['invalidated']}"
+            ],
+            "vassar_response_cache_entries": [f"vassar_response_cache_entries{{{label}}} {len(entries)}"],
+            "vassar_response_cache_bytes": [
+                f"vassar_response_cache_bytes{{{label}}} {sum(len(entry.body) for entry in entries)}"
+            ],
+        }
+
+
+METRICS = (
+    ("vassar_response_cache_requests_total", "counter", "Cached response lookups by outcome."),
+    ("vassar_response_cache_invalidations_total", "counter", "Explicit cache invalidations."),
+    ("vassar_response_cache_entries", "gauge", "Cached response bodies."),
+    ("vassar_response_cache_bytes", "gauge", "Total size of cached response bodies."),
+)
+
+caches: Dict[str, ResponseCache] = {}
+
+
+def cache_metrics() -> List[str]:
+    samples = [cache.samples() for cache in list(caches.values())]
+    lines = []
+    for name, kind, help_text in METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for cache_samples in samples:
+            lines.extend(cache_samples[name])
+    return lines
+
+
+def response_cache(name: str, max_entries: Optional[int] = None) -> ResponseCache:
+    """Return the named cache, creating it on first use."""
+    if name not in caches:
+        if not caches:
+            register_collector(cache_metrics)
+        caches[name] = ResponseCache(name, max_entries=max_entries)
+    return caches[name]
+
+
+def authorized(request) -> bool:
+    """Whether ``request`` carries ``VASSAR_ADMIN_TOKEN`` as its bearer token."""
+    token = os.getenv("VASSAR_ADMIN_TOKEN")
+    supplied = _without_prefix(request.headers.get("authorization", ""), "Bearer ").strip()
+    return bool(token) and hmac.compare_digest(supplied, token)
+
+
+def cache_admin_routes(app):
+    rt = app.route
+
+    @rt("/admin/cache/invalidate", methods=["post"])
+    def invalidate(request, name: str = ""):
+        if not authorized(request):
+            return JSONResponse({"error": "forbidden"}, status_code=403)
+        targets = [caches[name]] if name in caches else list(caches.values()) if not name else []
+        for cache in targets:
+            cache.invalidate()
+        return JSONResponse({"invalidated": [cache.name for cache in targets]})
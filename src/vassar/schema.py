@@ -0,0 +1,132 @@
+"""
+Declarative schema for the graph: the key property of every label the loaders and the
+web app MATCH on, plus secondary and full-text indexes.
+
+Each key property gets a uniqueness constraint (which is backed by a RANGE index), so
+``MATCH (p:Person {person_id: ...})`` is an index seek instead of a label scan.
+Everything is created with ``IF NOT EXISTS`` so ``ensure_schema`` can run before every
+import.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+from neo4j import Driver
+
+
+@dataclass(frozen=True)
+class KeyProperty:
+    label: str
+    property: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.label.lower()}_{self.property}_key"
+
+    @property
+    def properties(self) -> tuple:
+        return (self.property,)
+
+    def create_statement(self) -> str:
+        return (
+            f"CREATE CONSTRAINT {self.name} IF NOT EXISTS "
+            f"FOR (n:{self.label}) REQUIRE n.{self.property} IS UNIQUE"
+        )
+
+
+@dataclass(frozen=True)
+class RangeIndex:
+    label: str
+    property: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.label.lower()}_{self.property}_index"
+
+    @property
+    def properties(self) -> tuple:
+        return (self.property,)
+
+    def create_statement(self) -> str:
+        return (
+            f"CREATE INDEX {self.name} IF NOT EXISTS "
+            f"FOR (n:{self.label}) ON (n.{self.property})"
+        )
+
+
+@dataclass(frozen=True)
+class FulltextIndex:
+    name: str
+    label: str
+    properties: tuple
+
+    def create_statement(self) -> str:
+        fields = ", ".join(f"n.{name}" for name in self.properties)
+        return (
+            f"CREATE FULLTEXT INDEX {self.name} IF NOT EXISTS "
+            f"FOR (n:{self.label}) ON EACH [{fields}]"
+        )
+
+
+KEY_PROPERTIES = (
+    KeyProperty("Person", "person_id"),
+    KeyProperty("Author", "author_id"),
+    KeyProperty("Book", "book_id"),
+    KeyProperty("Series", "series_id"),
+)
+
+INDEXES = (
+    RangeIndex("Person", "name"),
+    RangeIndex("Person", "updated_at"),
+    # Queried by vassar.search behind its in-process prefix index.
+    FulltextIndex("person_search", "Person", ("name", "birthplace")),
+)
+
+SCHEMA = KEY_PROPERTIES + INDEXES
+
+SHOW_INDEXES_QUERY = """
+SHOW INDEXES YIELD name, state, labelsOrTypes, properties
+RETURN name, state, labelsOrTypes, properties
+"""
+
+
+def schema_statements() -> List[str]:
+    return [item.create_statement() for item in SCHEMA]
+
+
+def create_schema(driver: Driver, database: Optional[str] = None) -> None:
+    for statement in schema_statements():
+        driver.execute_query(statement, database_=database)
+
+
+def await_schema(driver: Driver, database: Optional[str] = None, timeout: int = 300) -> None:
+    driver.execute_query(
+        "CALL db.awaitIndexes($timeout)", timeout=timeout, database_=database
+    )
+
+
+def missing_schema(driver: Driver, database: Optional[str] = None) -> List[str]:
+    """
+    Compare ``SHOW INDEXES`` with ``SCHEMA``. Returns one line per expected index that is
+    absent or not ONLINE.
+    """
+    result = driver.execute_query(SHOW_INDEXES_QUERY, database_=database)
+    indexes = {
+        (tuple(record["labelsOrTypes"] or ()), tuple(record["properties"] or ())): record
+        for record in result.records
+    }
+    missing = []
+    for item in SCHEMA:
+        index = indexes.get(((item.label,), item.properties))
+        if index is None:
+            missing.append(f"{item.name}: no index on :{item.label}({', '.join(item.properties)})")
+        elif index["state"] != "ONLINE":
+            missing.append(f"{item.name}: index {index['name']} is {index['state']}")
+    return missing
+
+
+def ensure_schema(driver: Driver, database: Optional[str] = None, timeout: int = 300) -> List[str]:
+    """Create every constraint and index, wait for them to come ONLINE and report gaps."""
+    create_schema(driver, database)
+    await_schema(driver, database, timeout)
+    return missing_schema(driver, database)
@@ -0,0 +1,278 @@
+"""
+Person search and autocomplete at /search?q=.
+
+Queries are answered from an in-process ``PrefixIndex``: every word of every normalized
+name (case, accents and punctuation folded) in one sorted array, searched with
+``bisect``. A query matches people having a word that starts with each query word, so
+"mar smi" finds "Mary Smith". Only the narrowest word's range is scanned, and at most
+``MAX_CANDIDATES`` matches are ranked: whole-name prefix matches first, then
+people matching more query words exactly, then shorter names.
+
+The index is built from the graph cache's snapshot on first use and then follows the
+cache's change events (new and renamed people), so refreshing it costs what changed;
+a ``resync`` rebuilds it in a worker thread while the old one keeps answering. When it
+finds fewer than ``limit`` people (misspellings, birthplaces, or no snapshot) the
+``person_search`` full-text index in Neo4j fills in the rest.
+
+The following environment variables are optional:
+- VASSAR_SEARCH_PREFIX_INDEX: Set to off to answer every query from the full-text index (default on)
+- VASSAR_SEARCH_FULLTEXT: Set to off to answer from the prefix index only (default on)
+- VASSAR_SEARCH_LIMIT: Results per query unless ``limit`` is given, at most 50 (default 10)
+"""
+
+import asyncio
+import heapq
+import logging
+import os
+import re
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from starlette.responses import JSONResponse
+
+from vassar.database import async_named_query, shared_async_driver
+from vassar.graphcache import GraphCache, Snapshot, graph_cache
+from vassar.metrics import register_collector
+
+logger = logging.getLogger("vassar.search")
+
+PREFIX_INDEX = os.getenv("VASSAR_SEARCH_PREFIX_INDEX", "on").lower() not in ("0", "false", "no", "off")
+FULLTEXT = os.getenv("VASSAR_SEARCH_FULLTEXT", "on").lower() not in ("0", "false", "no", "off")
+DEFAULT_LIMIT = int(os.getenv("VASSAR_SEARCH_LIMIT", "10"))
+MAX_LIMIT = 50
+
+MAX_CANDIDATES = 100
+# Bounds the scan when the narrowest word is common and the others rarely match.
+MAX_SCANNED = 20 * MAX_CANDIDATES
+
+_SEPARATORS = re.compile(r"[\W_]+")
+# Apostrophes are dropped rather than split on, so "obrien" and "o'bri" both find O'Brien.
+_APOSTROPHES = re.compile("['\u2019]")
+_PUNCTUATION = "!\"#$%&()*+,-./:;<=>?@[\\]^_`{|}~"
+_ASCII_SEPARATORS = str.maketrans(_PUNCTUATION, " " * len(_PUNCTUATION), "'")
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/&|])')
+
+
+def normalize(text: str) -> str:
+    """Lower-case words separated by single spaces, without accents or punctuation."""
+    if text.isascii():
+        return " ".join(text.translate(_ASCII_SEPARATORS).lower().split())
+    folded = unicodedata.normalize("NFKD", _APOSTROPHES.sub("", text).casefold())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return " ".join(_SEPARATORS.sub(" ", folded).split())
+
+
+def lucene_query(words: Sequence[str]) -> str:
+    """Every word required, the last one as a prefix, as the user is still typing it."""
+    escaped = [_LUCENE_SPECIAL.sub(r"\\\1", word) for word in words]
+    return " ".join([f"+{word}" for word in escaped[:-1]] + [f"+{escaped[-1]}*"])
+
+
+class PrefixIndex:
+    """
+    Sorted ``words`` with the person_id of each in ``ids``; a person appears once per
+    distinct word of their name. ``names`` holds the display names and ``folded`` the
+    normalized ones padded with spaces, so word-prefix tests are substring searches.
+    """
+
+    def __init__(self, words: List[str], ids: array, names: Dict[int, str], folded: Dict[int, str]):
+        self.words = words
+        self.ids = ids
+        self.names = names
+        self.folded = folded
+
+    @classmethod
+    def build(cls, snapshot: Snapshot) -> "PrefixIndex":
+        interned: Dict[str, str] = {}
+        pairs = []
+        names = {}
+        folded = {}
+        for person_id, name in zip(snapshot.ids, snapshot.names):
+            name = name or ""
+            names[person_id] = name
+            normalized = normalize(name)
+            folded[person_id] = f" {normalized} "
+            for word in set(normalized.split()):
+                pairs.append((interned.setdefault(word, word), person_id))
+        pairs.sort()
+        return cls([word for word, _ in pairs], array("q", [person_id for _, person_id in pairs]), names, folded)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _range(self, word: str) -> Tuple[int, int]:
+        return bisect_left(self.words, word), bisect_left(self.words, word + "\uffff")
+
+    def _remove(self, person_id: int) -> None:
+        del self.names[person_id]
+        for word in set(self.folded.pop(person_id).split()):
+            start, stop = bisect_left(self.words, word), bisect_left(self.words, word + "\x00")
+            for position in range(start, stop):
+                if self.ids[position] == person_id:
+                    del self.words[position]
+                    del self.ids[position]
+                    break
+
+    def put(self, person_id: int, name: str) -> None:
+        """Add or rename a person in place."""
+        name = name or ""
+        if person_id in self.names:
+            self._remove(person_id)
+        self.names[person_id] = name
+        normalized = normalize(name)
+        self.folded[person_id] = f" {normalized} "
+        for word in set(normalized.split()):
+            position = bisect_left(self.words, word)
+            self.words.insert(position, word)
+            self.ids.insert(position, person_id)
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[dict]:
+        normalized = normalize(query)
+        words = normalized.split()
+        if not words:
+            return []
+        start, stop = min((self._range(word) for word in words), key=lambda bounds: bounds[1] - bounds[0])
+        prefixes = [f" {word}" for word in words]
+        whole = [f" {word} " for word in words]
+        leading = f" {normalized}"
+        seen = set()
+        candidates = []
+        for position in range(start, min(stop, start + MAX_SCANNED)):
+            person_id = self.ids[position]
+            if person_id in seen:
+                continue
+            seen.add(person_id)
+            folded = self.folded[person_id]
+            if all(prefix in folded for prefix in prefixes):
+                exact = sum(1 for word in whole if word in folded)
+                rank = (not folded.startswith(leading), -exact, len(folded), folded)
+                candidates.append((rank, person_id))
+                if len(candidates) >= MAX_CANDIDATES:
+                    break
+        return [
+            dict(id=person_id, name=self.names[person_id], source="prefix")
+            for _, person_id in heapq.nsmallest(limit, candidates)
+        ]
+
+
+class PersonSearch:
+    def __init__(self, cache: GraphCache = graph_cache, prefix_index: bool = PREFIX_INDEX, fulltext: bool = FULLTEXT):
+        self.cache = cache
+        self.prefix_index = prefix_index
+        self.fulltext = fulltext
+        self.index: Optional[PrefixIndex] = None
+        self.stats = dict(prefix=0, fulltext=0, builds=0, updates=0, errors=0)
+        self.build_seconds = 0.0
+        self._stale = True
+        self._building: Optional[asyncio.Task] = None
+        self._subscribed = False
+
+    def on_changes(self, events: List[dict]) -> None:
+        """Graph cache listener: apply new and renamed people, rebuild after a resync."""
+        index = self.index
+        if index is None or self._stale:
+            return
+        for event in events:
+            if event["op"] == "resync":
+                self._stale = True
+                return
+            if event["op"] in ("node_added", "node_updated"):
+                index.put(event["id"], event["name"])
+                self.stats["updates"] += 1
+
+    async def _build(self, driver) -> PrefixIndex:
+        snapshot = self.cache.live or await self.cache.current(driver)
+        self._stale = False
+        started = time.perf_counter()
+        index = await asyncio.get_running_loop().run_in_executor(None, PrefixIndex.build, snapshot)
+        self.build_seconds = time.perf_counter() - started
+        self.stats["builds"] += 1
+        # Changes published while building went to the old index; build again from the newer snapshot.
+        if self.cache.snapshot is not snapshot:
+            self._stale = True
+        self.index = index
+        logger.info("Built person search index: %d people in %.2fs", len(index), self.build_seconds)
+        return index
+
+    async def current_index(self, driver) -> Optional[PrefixIndex]:
+        if not self._subscribed:
+            self.cache.subscribe(self.on_changes)
+            self._subscribed = True
+        if self._stale and (self._building is None or self._building.done()):
+            self._building = asyncio.create_task(self._build(driver))
+        if self.index is None:
+            await asyncio.shield(self._building)
+        elif self.cache.live is None:
+            # Without the background refresh, searches drive the snapshot's change polls.
+            await self.cache.current(driver)
+        return self.index
+
+    async def search(self, query: str, limit: int = DEFAULT_LIMIT) -> List[dict]:
+        limit = max(1, min(limit, MAX_LIMIT))
+        words = normalize(query).split()
+        if not words:
+            return []
+        driver = shared_async_driver()
+        results: List[dict] = []
+        if self.prefix_index:
+            try:
+                index = await self.current_index(driver)
+                results = index.search(query, limit)
+                self.stats["prefix"] += 1
+            except Exception as exc:
+                self.stats["errors"] += 1
+                logger.warning("Person search index unavailable, using the full-text index: %s", exc)
+        if len(results) < limit and self.fulltext:
+            try:
+                found = await async_named_query(
+                    driver, "PERSON_SEARCH_QUERY", {"query": lucene_query(words), "limit": limit}
+                )
+            except Exception as exc:
+                # The person_search index is created by load_data; without it, keep the prefix matches.
+                self.stats["errors"] += 1
+                logger.warning("Person full-text search failed: %s", exc)
+                return results
+            self.stats["fulltext"] += 1
+            seen = {result["id"] for result in results}
+            for record in found.records:
+                if record["id"] not in seen and len(results) < limit:
+                    seen.add(record["id"])
+                    results.append(
+                        dict(id=record["id"], name=record["name"], birthplace=record["birthplace"], source="fulltext")
+                    )
+        return results
+
+    def metrics(self) -> List[str]:
+        lines = [
+            "# HELP vassar_search_total Person searches by the index that answered, index builds and updates.",
+            "# TYPE vassar_search_total counter",
+        ]
+        for kind, count in self.stats.items():
+            lines.append(f'vassar_search_total{{kind="{kind}"}} {count}')
+        if self.index is not None:
+            lines += [
+                "# HELP vassar_search_index_people People in the person search prefix index.",
+                "# TYPE vassar_search_index_people gauge",
+                f"vassar_search_index_people {len(self.index)}",
+                "# HELP vassar_search_index_build_seconds Duration of the last full index build.",
+                "# TYPE vassar_search_index_build_seconds gauge",
+                f"vassar_search_index_build_seconds {self.build_seconds:.3f}",
+            ]
+        return lines
+
+
+person_search = PersonSearch()
+register_collector(person_search.metrics)
+
+
+def search_routes(app):
+    rt = app.route
+
+    @rt("/search")
+    async def get(q: str = "", limit: int = DEFAULT_LIMIT):
+        """Ranked people whose name starts with the words in ``q``, for autocomplete."""
+        results = await person_search.search(q, limit)
+        return JSONResponse(dict(query=q, results=results))
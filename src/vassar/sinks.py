@@ -0,0 +1,218 @@
+"""
+Streaming result sinks for ad-hoc queries.
+
+``stream_query`` pulls records from a session cursor ``fetch_size`` at a time and hands
+each one to a sink as it arrives, so memory stays flat and the first rows are written
+immediately instead of after the whole ``EagerResult`` has been materialized.
+
+Arrow IPC output needs the optional ``pyarrow`` package.
+"""
+
+import csv
+import io
+import json
+import time
+from abc import ABC, abstractmethod
+from typing import IO, Any, Iterable, List, Optional
+
+from neo4j import Driver, Query
+from neo4j.graph import Node, Path, Relationship
+
+from vassar.metrics import log_query, query_metrics
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+
+class ArrowSchemaError(ValueError):
+    """Rows of an Arrow export whose types can't share the stream's one schema."""
+
+
+def to_plain(value: Any) -> Any:
+    """Convert driver values (nodes, relationships, paths, temporal types) to JSON-able ones."""
+    if isinstance(value, Node):
+        return dict(value, _labels=sorted(value.labels))
+    if isinstance(value, Relationship):
+        return dict(value, _type=value.type)
+    if isinstance(value, Path):
+        return [to_plain(node) for node in value.nodes]
+    if isinstance(value, (list, tuple)):
+        return [to_plain(item) for item in value]
+    if isinstance(value, dict):
+        return {key: to_plain(item) for key, item in value.items()}
+    if hasattr(value, "iso_format"):
+        return value.iso_format()
+    return value
+
+
+class _TextSink(ABC):
+    binary = False
+    # Flush the first row at once so output starts immediately, then in chunks.
+    flush_every = 256
+
+    def __init__(self, stream: IO[str]):
+        self.stream = stream
+        self.keys: List[str] = []
+        self.rows = 0
+
+    def begin(self, keys: Iterable[str]) -> None:
+        self.keys = list(keys)
+
+    def write(self, values: List[Any]) -> None:
+        self._write_row([to_plain(value) for value in values])
+        self.rows += 1
+        if self.rows == 1 or self.rows % self.flush_every == 0:
+            self.stream.flush()
+
+    @abstractmethod
+    def _write_row(self, values: List[Any]) -> None:
+        """Write one row of plain values to ``stream``."""
+
+    def close(self) -> None:
+        self.stream.flush()
+
+
+class JsonlSink(_TextSink):
+    def _write_row(self, values: List[Any]) -> None:
+        self.stream.write(json.dumps(dict(zip(self.keys, values)), default=str) + "\n")
+
+
+class CsvSink(_TextSink):
+    def __init__(self, stream: IO[str]):
+        super().__init__(stream)
+        self.writer = csv.writer(stream)
+
+    def begin(self, keys: Iterable[str]) -> None:
+        super().begin(keys)
+        self.writer.writerow(self.keys)
+
+    def _write_row(self, values: List[Any]) -> None:
+        self.writer.writerow(
+            [json.dumps(value, default=str) if isinstance(value, (dict, list)) else value for value in values]
+        )
+
+
+class ArrowSink:
+    """
+    Arrow IPC stream; rows are buffered into record batches of ``batch_size``.
+
+    Every batch's types are inferred from its own rows. An IPC stream has one schema, so
+    the first ``max_pending`` batches are held back and their schemas unified, widening
+    where needed (null to any type, int64 to double). Later batches are cast to that
+    schema only when no value changes; anything else, such as a double in an int64
+    column, or a string where numbers were, raises ``ArrowSchemaError`` before the batch
+    is written.
+    """
+
+    binary = True
+
+    def __init__(self, stream: IO[bytes], batch_size: int = 1000, max_pending: int = 10):
+        if pyarrow is None:
+            raise RuntimeError("Arrow output needs pyarrow: pip install pyarrow")
+        self.stream = stream
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.keys: List[str] = []
+        self.rows: List[dict] = []
+        self.schema = None
+        self.writer = None
+        self.pending: List = []
+
+    def begin(self, keys: Iterable[str]) -> None:
+        self.keys = list(keys)
+
+    def write(self, values: List[Any]) -> None:
+        row = {}
+        for key, value in zip(self.keys, map(to_plain, values)):
+            row[key] = json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self.rows:
+            return
+        batch = pyarrow.RecordBatch.from_pylist(self.rows)
+        self.rows = []
+        if self.writer is not None:
+            self.writer.write_batch(self._conform(batch))
+            self.stream.flush()
+            return
+        self.pending.append(batch)
+        try:
+            self.schema = pyarrow.unify_schemas(
+                [pending.schema for pending in self.pending], promote_options="permissive"
+            )
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError) as exc:
+            raise ArrowSchemaError(f"Columns change type between batches: {exc}") from exc
+        if len(self.pending) >= self.max_pending:
+            self._open()
+
+    def _conform(self, batch):
+        """``batch`` cast to the stream's schema, refusing any cast that would change a value."""
+        if batch.schema.equals(self.schema):
+            return batch
+        try:
+            return batch.cast(self.schema, safe=True)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, pyarrow.ArrowNotImplementedError) as exc:
+            raise ArrowSchemaError(
+                f"Rows don't fit the Arrow stream's schema ({self.schema.to_string(show_schema_metadata=False)}), "
+                f"fixed by the first {self.max_pending} batches: {exc}"
+            ) from exc
+
+    def _open(self) -> None:
+        if self.schema is None:
+            self.schema = pyarrow.schema([(key, pyarrow.null()) for key in self.keys])
+        pending = [self._conform(batch) for batch in self.pending]
+        self.writer = pyarrow.ipc.new_stream(self.stream, self.schema)
+        for batch in pending:
+            self.writer.write_batch(batch)
+        self.pending = []
+        self.stream.flush()
+
+    def close(self) -> None:
+        self._flush()
+        if self.writer is None:
+            self._open()
+        self.writer.close()
+
+
+SINKS = {"jsonl": JsonlSink, "csv": CsvSink, "arrow": ArrowSink}
+
+
+def make_sink(output_format: str, stream: IO):
+    sink_class = SINKS[output_format]
+    if sink_class.binary and isinstance(stream, io.TextIOBase):
+        stream = stream.buffer
+    return sink_class(stream)
+
+
+def stream_query(
+    driver: Driver,
+    query: str,
+    sink,
+    parameters: Optional[dict] = None,
+    fetch_size: int = 1000,
+    timeout: Optional[float] = None,
+) -> int:
+    """Run ``query`` and write every record to ``sink`` as it arrives. Returns the row count."""
+    log_query(query)
+    started = time.perf_counter()
+    rows = 0
+    try:
+        with driver.session(fetch_size=fetch_size) as session:
+            result = session.run(Query(query, timeout=timeout), parameters)
+            sink.begin(result.keys())
+            for record in result:
+                sink.write(record.values())
+                rows += 1
+            summary = result.consume()
+        sink.close()
+    except Exception:
+        query_metrics.record(query, time.perf_counter() - started, error=True)
+        raise
+    query_metrics.record(query, time.perf_counter() - started, summary=summary, records=rows)
+    return rows
@@ -0,0 +1,190 @@
+"""
+Lazily expanded subtrees for the family tree page.
+
+Instead of the whole graph, ``fetch_subtree`` returns one person with ``depth``
+generations of descendants (and optionally ``ancestors`` generations of parents). It
+walks one generation per round trip with ``UNWIND $ids`` over the ``person_id`` key
+index, so the cost follows the size of the answer, not the size of the graph. Nodes on
+the frontier carry ``has_more`` so the client knows which branches it can fetch next.
+With the graph cache enabled the same walks are answered from memory.
+
+The following environment variables are optional:
+- VASSAR_SUBTREE_MAX_DEPTH: Largest depth/ancestors a request may ask for (default 6)
+- VASSAR_SUBTREE_MAX_NODES: Stop expanding once a subtree holds this many people (default 2000)
+- VASSAR_SUBTREE_ROOT_PAGE: Root people returned per page of /tree/root (default 200)
+"""
+
+import os
+from typing import Dict, Iterable, List, Optional
+
+from neo4j import AsyncDriver
+
+from vassar.graphcache import cached_named_query
+
+MAX_DEPTH = int(os.getenv("VASSAR_SUBTREE_MAX_DEPTH", "6"))
+MAX_NODES = int(os.getenv("VASSAR_SUBTREE_MAX_NODES", "2000"))
+ROOT_PAGE = int(os.getenv("VASSAR_SUBTREE_ROOT_PAGE", "200"))
+
+SYNTHETIC_ROOT_NAME = "Tree"
+
+# (relatives query, frontier query) per direction
+DIRECTIONS = {
+    "children": ("CHILDREN_OF_QUERY", "HAS_CHILDREN_QUERY"),
+    "parents": ("PARENTS_OF_QUERY", "HAS_PARENTS_QUERY"),
+}
+
+
+class PersonNotFound(LookupError):
+    pass
+
+
+def clamp_depth(depth: int) -> int:
+    return max(0, min(depth, MAX_DEPTH))
+
+
+def _node(person_id, name, key: str = "children") -> dict:
+    return {"id": person_id, "name": name, key: [], "has_more": False}
+
+
+async def _expand(
+    driver: AsyncDriver,
+    frontier: Dict[int, List[dict]],
+    depth: int,
+    key: str,
+    budget: int,
+) -> int:
+    """
+    Grow every node in ``frontier`` (``person_id`` -> nodes for that person) by ``depth``
+    generations along ``key`` and mark what is left on the frontier with ``has_more``.
+    Returns the number of people added.
+    """
+    relatives_query, frontier_query = DIRECTIONS[key]
+    added = 0
+    for _ in range(depth):
+        if not frontier or added >= budget:
+            break
+        result = await cached_named_query(driver, relatives_query, {"ids": list(frontier)})
+        next_frontier: Dict[int, List[dict]] = {}
+        for person_id, relatives in result.records:
+            for node in frontier[person_id]:
+                branch = node[key]
+                for relative_id, relative_name in relatives:
+                    relative = _node(relative_id, relative_name, key)
+                    branch.append(relative)
+                    next_frontier.setdefault(relative_id, []).append(relative)
+        added += len(next_frontier)
+        frontier = next_frontier
+    if frontier:
+        result = await cached_named_query(driver, frontier_query, {"ids": list(frontier)})
+        for person_id, has_more in result.records:
+            for node in frontier[person_id]:
+                node["has_more"] = has_more
+    return added
+
+
+async def fetch_subtree(
+    driver: AsyncDriver,
+    person_id: int,
+    depth: int = 2,
+    ancestors: int = 0,
+    max_nodes: int = MAX_NODES,
+) -> dict:
+    """
+    Return ``{"id", "name", "children", "has_more"}`` for ``person_id`` with ``depth``
+    generations of descendants; with ``ancestors`` the root also gets a ``parents`` list
+    built the same way. Raises ``PersonNotFound`` for an unknown id.
+    """
+    result = await cached_named_query(driver, "PERSON_NAME_QUERY", {"person_id": person_id})
+    if not result.records:
+        raise PersonNotFound(person_id)
+    root = _node(person_id, result.records[0][0])
+    added = await _expand(driver, {person_id: [root]}, clamp_depth(depth), "children", max_nodes)
+    if ancestors > 0:
+        root["parents"] = []
+        # The root's own has_more describes its children; keep it when walking upwards.
+        has_more = root["has_more"]
+        await _expand(driver, {person_id: [root]}, clamp_depth(ancestors), "parents", max_nodes - added)
+        root["has_more"] = has_more
+    return root
+
+
+async def fetch_roots(
+    driver: AsyncDriver,
+    depth: int = 1,
+    offset: int = 0,
+    limit: int = ROOT_PAGE,
+    max_nodes: int = MAX_NODES,
+) -> dict:
+    """
+    Return the people with children but no parents, each with ``depth`` generations of
+    descendants. Like ``format_graph_data``, a single root is returned as is and several
+    hang off a synthetic root; the synthetic root's ``next_offset`` pages through the rest.
+    """
+    limit = max(1, min(limit, ROOT_PAGE))
+    result = await cached_named_query(
+        driver, "ROOT_PEOPLE_QUERY", {"skip": max(0, offset), "limit": limit + 1}
+    )
+    rows = result.records
+    roots = [_node(person_id, name) for person_id, name in rows[:limit]]
+    frontier: Dict[int, List[dict]] = {}
+    for root in roots:
+        frontier.setdefault(root["id"], []).append(root)
+    await _expand(driver, frontier, clamp_depth(depth), "children", max_nodes)
+
+    next_offset: Optional[int] = offset + limit if len(rows) > limit else None
+    if len(roots) == 1 and offset == 0 and next_offset is None:
+        return roots[0]
+    return {
+        "id": None,
+        "name": SYNTHETIC_ROOT_NAME,
+        "children": roots,
+        "has_more": False,
+        "next_offset": next_offset,
+    }
+
+
+async def fetch_expanded(
+    driver: AsyncDriver,
+    person_id: Optional[int],
+    expanded: Iterable[int],
+    max_nodes: int = MAX_NODES,
+) -> dict:
+    """
+    The tree as the page shows it: ``person_id`` (or the roots, when ``None``) with the
+    children of every person in ``expanded``, one round trip per visible generation.
+    Everyone else is collapsed, with ``has_more`` telling whether they have children.
+    """
+    expanded = set(expanded)
+    if person_id is None:
+        root = await fetch_roots(driver, depth=0, max_nodes=max_nodes)
+    else:
+        root = await fetch_subtree(driver, person_id, depth=0, max_nodes=max_nodes)
+    frontier: Dict[int, List[dict]] = {}
+    for node in root["children"] if root["id"] is None else [root]:
+        frontier.setdefault(node["id"], []).append(node)
+    collapsed: Dict[int, List[dict]] = {}
+    added = 0
+    while frontier:
+        ids = [person_id for person_id in frontier if person_id in expanded]
+        for person_id, nodes in frontier.items():
+            if person_id not in expanded or added >= max_nodes:
+                collapsed.setdefault(person_id, []).extend(nodes)
+        if not ids or added >= max_nodes:
+            break
+        result = await cached_named_query(driver, "CHILDREN_OF_QUERY", {"ids": ids})
+        next_frontier: Dict[int, List[dict]] = {}
+        for person_id, relatives in result.records:
+            for node in frontier[person_id]:
+                node["has_more"] = False
+                for relative_id, relative_name in relatives:
+                    relative = _node(relative_id, relative_name)
+                    node["children"].append(relative)
+                    next_frontier.setdefault(relative_id, []).append(relative)
+        added += len(next_frontier)
+        frontier = next_frontier
+    if collapsed:
+        result = await cached_named_query(driver, "HAS_CHILDREN_QUERY", {"ids": list(collapsed)})
+        for person_id, has_more in result.records:
+            for node in collapsed[person_id]:
+                node["has_more"] = has_more
+    return root
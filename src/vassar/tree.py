@@ -1,3 +1,6 @@
+import hashlib
+import json
+
 from fasthtml.components import (
     Nav,
     A,
@@ -11,135 +14,296 @@ from fasthtml.components import (
     I,
     Ul,
     Li,
+    Input,
     Button,
     P,
     H2,
 )
-from fasthtml.fastapp import fast_app, serve
 from neo4j import EagerResult
-from rich.console import Console
-from starlette.responses import FileResponse, JSONResponse
+from starlette.responses import JSONResponse
 
-from vassar.database import async_query, get_async_driver
+from vassar.assets import asset_url
+from vassar.columnar import (
+    BINARY_MEDIA_TYPE,
+    COLUMNAR_MEDIA_TYPE,
+    columnar_graph,
+    encode_binary,
+    encode_columnar,
+    negotiate_format,
+)
+from vassar.database import async_named_query, shared_async_driver
+from vassar.events import broadcaster
+from vassar.graphcache import cached_named_query, graph_cache, graph_version_of
+from vassar.layout import LAYOUT_CACHE_SIZE, tidy_layout
+from vassar.pages import static_page
+from vassar.response_cache import response_cache
+from vassar.subtree import (
+    SYNTHETIC_ROOT_NAME,
+    PersonNotFound,
+    clamp_depth,
+    fetch_expanded,
+    fetch_roots,
+    fetch_subtree,
+)
 
-console = Console()
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
 
-app, rt = fast_app(live=True, debug=True)
 
-GRAPH_DATA_QUERY = """
-MATCH (p:Person)-[:PARENT_OF]->(descendant:Person)
-RETURN p, descendant;
-"""
+_encode = json.JSONEncoder(ensure_ascii=False).encode
+_CLOSE = object()
+_COMMA = object()
 
-DATABASE = "neo4j"
 
+def format_graph_data(data: EagerResult):
+    """
+    Build the nested family tree from ``GRAPH_DATA_QUERY`` rows (one row per parent with
+    its ``[person_id, name]`` children collected) in a single pass.
 
-@rt("/{fname:path}.{ext:static}")
-async def get(fname: str, ext: str):
-    return FileResponse(f"public/{fname}.{ext}")
+    People are keyed on ``person_id``, so relatives sharing a name stay separate. A
+    person is a root candidate when first seen as a parent and stops being one as soon
+    as they appear as someone's child. A child with two parents is shared by both
+    parents' ``children`` lists.
+    """
+    nodes = {}
+    roots = {}
+    find = nodes.get
+    for parent_id, parent_name, children in data.records:
+        parent = find(parent_id)
+        if parent is None:
+            parent = nodes[parent_id] = {"id": parent_id, "name": parent_name, "children": []}
+            roots[parent_id] = parent
+        siblings = parent["children"]
+        for child_id, child_name in children:
+            child = find(child_id)
+            if child is None:
+                child = nodes[child_id] = {"id": child_id, "name": child_name, "children": []}
+            elif child_id in roots:
+                del roots[child_id]
+            siblings.append(child)
 
+    # One root is returned as is; none (empty graph) or several hang off a synthetic root.
+    if len(roots) == 1:
+        return next(iter(roots.values()))
+    return {"id": None, "name": SYNTHETIC_ROOT_NAME, "children": list(roots.values())}
 
-def format_graph_data(data: EagerResult):
-    nodes = {}
-    for record in data.records:
-        parent = record["p"]
-        descendant = record["descendant"]
 
-        # Ensure parent node exists
-        if parent["name"] not in nodes:
-            nodes[parent["name"]] = {"name": parent["name"], "children": []}
+def dumps_tree(root: dict) -> str:
+    """
+    Serialize a tree from ``format_graph_data`` to JSON with an explicit stack, so deep
+    lineages don't hit the recursion limit of ``json.dumps``.
 
-        # Ensure descendant node exists
-        if descendant["name"] not in nodes:
-            nodes[descendant["name"]] = {"name": descendant["name"], "children": []}
+    A person met again below themselves, in a ``PARENT_OF`` cycle that a family should
+    never have, is written once more without children and with ``"cycle":true``, so the
+    output stays finite.
+    """
+    parts = []
+    stack = [root]
+    path = []
+    on_path = set()
+    while stack:
+        node = stack.pop()
+        if node is _CLOSE:
+            parts.append("]}")
+            on_path.discard(path.pop())
+        elif node is _COMMA:
+            parts.append(",")
+        elif node["id"] in on_path:
+            parts.append(f'{{"id":{_encode(node["id"])},"name":{_encode(node["name"])},"children":[],"cycle":true}}')
+        else:
+            parts.append(f'{{"id":{_encode(node["id"])},"name":{_encode(node["name"])},"children":[')
+            stack.append(_CLOSE)
+            path.append(node["id"])
+            on_path.add(node["id"])
+            children = node["children"]
+            for index in range(len(children) - 1, -1, -1):
+                stack.append(children[index])
+                if index:
+                    stack.append(_COMMA)
+    return "".join(parts)
 
-        # Append the descendant to the parent's children
-        nodes[parent["name"]]["children"].append(nodes[descendant["name"]])
 
-    # Find the root nodes (nodes without parents)
-    root_candidates = set(nodes.keys()) - {
-        record["descendant"]["name"] for record in data.records
-    }
-    roots = [nodes[name] for name in root_candidates]
+def encode_tree(root: dict) -> bytes:
+    if orjson is not None:
+        try:
+            return orjson.dumps(root)
+        except orjson.JSONEncodeError:
+            pass  # nested deeper than orjson's limit, or a cycle; fall back to the iterative writer
+    return dumps_tree(root).encode()
 
-    # If there's only one root, return it; otherwise, create a single root node for all
-    if len(roots) == 1:
-        return roots[0]
-    else:
-        return {"name": "Tree", "children": roots}
-
-
-@rt("/tree")
-async def get(request):
-    async with get_async_driver() as driver:
-        data = await async_query(driver, GRAPH_DATA_QUERY)
-        root = format_graph_data(data)
-        return JSONResponse(root)
-
-
-@rt("/")
-def get():
-    return (
-        Title("Family Tree Visualization"),
-        Head(
-            Link(
-                rel="stylesheet",
-                href="https://cdnjs.cloudflare.com/ajax/libs/tachyons/4.11.1/tachyons.min.css",
-                type="text/css",
-            ),
-            Link(
-                rel="stylesheet",
-                href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css",
-            ),
-        ),
-        Nav(
-            A(
-                "Graph DB Fundamentals",
-                href="/",
-                cls="link dim white b f6 f5-ns dib mr3",
+
+def encode_json(value) -> bytes:
+    """Encode a depth-bounded document such as a subtree."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encode(value).encode()
+
+
+tree_cache = response_cache("tree")
+subtree_cache = response_cache("subtree", max_entries=4096)
+layout_cache = response_cache("layout", max_entries=LAYOUT_CACHE_SIZE)
+
+
+async def graph_version():
+    # With the graph cache on, responses follow the snapshot, which polls for changes itself.
+    snapshot = graph_cache.live
+    if snapshot is not None:
+        return snapshot.version
+    result = await async_named_query(shared_async_driver(), "GRAPH_VERSION_QUERY")
+    return graph_version_of(result.records[0])
+
+
+async def build_tree(output_format: str = "json"):
+    data = await cached_named_query(shared_async_driver(), "GRAPH_DATA_QUERY")
+    if output_format == "columnar":
+        return encode_columnar(columnar_graph(data)), COLUMNAR_MEDIA_TYPE
+    if output_format == "binary":
+        return encode_binary(columnar_graph(data)), BINARY_MEDIA_TYPE
+    return encode_tree(format_graph_data(data)), "application/json"
+
+
+def tree_routes(app, page_path: str = "/"):
+    """The family tree page at ``page_path`` and the /tree JSON API."""
+    rt = app.route
+
+    @rt("/tree")
+    async def get(request, format: str = ""):
+        """
+        The whole tree, nested by default. ``?format=columnar|binary`` or an ``Accept`` of
+        ``application/vnd.vassar.columnar+json`` / ``application/vnd.vassar.columnar``
+        selects the flat encodings from ``vassar.columnar``.
+        """
+        try:
+            output_format = negotiate_format(format, request.headers.get("accept"))
+        except ValueError as exc:
+            return JSONResponse({"error": str(exc)}, status_code=400)
+        entry = await tree_cache.get(output_format, graph_version, lambda: build_tree(output_format))
+        return tree_cache.respond(request, entry)
+
+    @rt("/tree/events")
+    async def get(request):
+        """Server-sent change events for open tree pages, see ``vassar.events``."""
+        return broadcaster.respond(request)
+
+    @rt("/tree/root")
+    async def get(request, depth: int = 1, offset: int = 0):
+        depth = clamp_depth(depth)
+
+        async def build():
+            return encode_json(await fetch_roots(shared_async_driver(), depth, offset)), "application/json"
+
+        entry = await subtree_cache.get(f"root:{depth}:{offset}", graph_version, build)
+        return subtree_cache.respond(request, entry)
+
+    @rt("/tree/layout")
+    async def get(request, root: str = "", expanded: str = ""):
+        """
+        Visible nodes with their tidy-tree coordinates for ``root`` (a person_id, or the
+        family roots when empty) with the comma-separated ``expanded`` person_ids open.
+        """
+        try:
+            person_id = int(root) if root else None
+            expanded_ids = sorted({int(value) for value in expanded.split(",") if value.strip()})
+        except ValueError:
+            return JSONResponse({"error": "root and expanded must be person ids"}, status_code=400)
+        key = hashlib.blake2b(f"{person_id}:{expanded_ids}".encode(), digest_size=12).hexdigest()
+
+        async def build():
+            tree = await fetch_expanded(shared_async_driver(), person_id, expanded_ids)
+            return encode_json(tidy_layout(tree).as_dict()), "application/json"
+
+        try:
+            entry = await layout_cache.get(key, graph_version, build)
+        except PersonNotFound:
+            return JSONResponse({"error": f"no person with id {person_id}"}, status_code=404)
+        return layout_cache.respond(request, entry)
+
+    @rt("/tree/{person_id:int}")
+    async def get(request, person_id: int, depth: int = 2, ancestors: int = 0):
+        depth, ancestors = clamp_depth(depth), clamp_depth(ancestors)
+
+        async def build():
+            subtree = await fetch_subtree(shared_async_driver(), person_id, depth, ancestors)
+            return encode_json(subtree), "application/json"
+
+        try:
+            entry = await subtree_cache.get(f"{person_id}:{depth}:{ancestors}", graph_version, build)
+        except PersonNotFound:
+            return JSONResponse({"error": f"no person with id {person_id}"}, status_code=404)
+        return subtree_cache.respond(request, entry)
+
+    @static_page(app, page_path)
+    def tree_page():
+        return (
+            Title("Family Tree Visualization"),
+            Head(
+                Link(
+                    rel="stylesheet",
+                    href=asset_url("vendor/tachyons/tachyons.min.css"),
+                    type="text/css",
+                ),
+                Link(
+                    rel="stylesheet",
+                    href=asset_url("vendor/font-awesome/css/all.min.css"),
+                ),
             ),
-            A("Home", href="/", cls="link dim light-gray f6 f5-ns dib mr3"),
-            cls="pa3 pa4-ns",
-        ),
-        Main(
-            Div(
-                Span(
-                    I(cls="fas fa-question-circle light-purple mb3"),
-                    P("Help", cls="ml2"),
-                    cls="flex pointer info-icon",
+            Nav(
+                A(
+                    "Graph DB Fundamentals",
+                    href="/",
+                    cls="link dim white b f6 f5-ns dib mr3",
                 ),
+                A("Home", href="/", cls="link dim light-gray f6 f5-ns dib mr3"),
+                cls="pa3 pa4-ns",
+            ),
+            Main(
                 Div(
+                    Span(
+                        I(cls="fas fa-question-circle light-purple mb3"),
+                        P("Help", cls="ml2"),
+                        cls="flex pointer info-icon",
+                    ),
                     Div(
-                        Span("close X", cls="close-btn mb2 f6 light-purple pointer"),
-                        cls="flex justify-end items-center",
+                        Div(
+                            Span("close X", cls="close-btn mb2 f6 light-purple pointer"),
+                            cls="flex justify-end items-center",
+                        ),
+                        Ul(
+                            Li("Zoom: Mouse wheel / touchpad scroll"),
+                            Li("Pan: Click and drag."),
+                            cls="pl3",
+                        ),
+                        cls="info-banner bg-navy pa3 ba br-rounded b--light-silver br2 shadow-1 dn",
                     ),
-                    Ul(
-                        Li("Zoom: Mouse wheel / touchpad scroll"),
-                        Li("Pan: Click and drag."),
-                        cls="pl3",
+                    cls="info-container fixed bottom-2 right-2",
+                ),
+                H2("Family Tree Visualization", cls="tc"),
+                Div(
+                    Input(
+                        id="person-search",
+                        type="search",
+                        placeholder="Find a person",
+                        autocomplete="off",
+                        cls="input-reset ba b--light-silver br2 pa2 w5",
                     ),
-                    cls="info-banner bg-navy pa3 ba br-rounded b--light-silver br2 shadow-1 dn",
+                    Ul(id="search-results", cls="list pl0 mt1 absolute bg-navy z-1 w5"),
+                    cls="relative mb3",
                 ),
-                cls="info-container fixed bottom-2 right-2",
-            ),
-            H2("Family Tree Visualization", cls="tc"),
-            Button(
-                "Expand All",
-                id="expand-all",
-                cls="f6 link dim br-rounded ph3 pv2 mb4 mt2 dib white bg-dark-blue",
-            ),
-            Button(
-                "Collapse All",
-                id="collapse-all",
-                cls="dn f6 link dim br-rounded ph3 pv2 mb4 mt2  white bg-dark-blue",
+                Button(
+                    "Expand All",
+                    id="expand-all",
+                    cls="f6 link dim br-rounded ph3 pv2 mb4 mt2 dib white bg-dark-blue",
+                ),
+                Button(
+                    "Collapse All",
+                    id="collapse-all",
+                    cls="dn f6 link dim br-rounded ph3 pv2 mb4 mt2  white bg-dark-blue",
+                ),
+                Div(id="family-tree"),
+                cls="container",
             ),
-            Div(id="family-tree"),
-            cls="container",
-        ),
-        Script(src="https://d3js.org/d3.v6.min.js"),
-        Script(src="/public/js/tree.js"),
-    )
-
-
-if __name__ == "__main__":
-    serve(port=8001, reload=True)
+            Script(src=asset_url("vendor/d3/d3.v6.min.js")),
+            Script(src=asset_url("js/tree.js")),
+        )